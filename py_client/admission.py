@@ -0,0 +1,217 @@
+import os
+import math
+import time
+import asyncio
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from temporalio.api.enums.v1 import TaskQueueType
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.api.workflowservice.v1 import DescribeTaskQueueRequest
+from temporalio.client import Client
+
+from client import get_client_pool, resolve_task_queue
+from structured_logging import get_logger
+
+DEFAULT_MAX_ACCOUNTS = 10000 # per-account buckets kept; the least recently used are dropped
+DEFAULT_BACKLOG_CHECK_INTERVAL = 2.0 # seconds a task queue's backlog reading is reused
+DEFAULT_TASK_QUEUE_PARTITIONS = 4 # Temporal's default partitions per task queue
+
+log = get_logger("admission")
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Takes `tokens` and returns 0, or takes nothing and returns the seconds until they are available.
+        Callers must not ask for more than `burst`, which never becomes available.
+        """
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def give_back(self, tokens: float = 1.0) -> None:
+        self.tokens = min(self.burst, self.tokens + tokens)
+
+@dataclass
+class AdmissionDecision:
+    admitted: bool
+    retry_after: float = 0.0 # seconds
+    reason: str = ""
+
+    @property
+    def retry_after_header(self) -> str:
+        # Retry-After takes whole seconds
+        return str(max(1, math.ceil(self.retry_after)))
+
+ADMITTED = AdmissionDecision(admitted=True)
+
+class AdmissionController:
+    """
+    Decides whether a workflow start may go ahead now.
+
+    Three independent limits, each off when its setting is 0:
+      - a global token bucket shared by every start,
+      - a token bucket per source account, so one account can't take all the capacity,
+      - the backlog of the target task queue (workflow and activity tasks waiting for a
+        worker), read from Temporal's task queue description at most once per interval.
+        The task queue is only resolved from the routing key when this limit is on.
+    Rejections carry the time after which a retry could succeed, except for requests
+    larger than a bucket's burst, which are rejected as "too_large" and never succeed.
+    """
+
+    def __init__(self, client_factory, task_queue_resolver: Callable[[Optional[str]], Awaitable[str]],
+                 rate: float = 0.0, burst: float = 0.0, account_rate: float = 0.0,
+                 account_burst: float = 0.0, max_backlog: int = 0,
+                 backlog_check_interval: float = DEFAULT_BACKLOG_CHECK_INTERVAL, max_accounts: int = DEFAULT_MAX_ACCOUNTS,
+                 task_queue_partitions: int = DEFAULT_TASK_QUEUE_PARTITIONS):
+        self._client_factory = client_factory # async () -> Client
+        self._task_queue_resolver = task_queue_resolver # async (routing key) -> task queue
+        self.global_bucket = TokenBucket(rate, burst or rate) if rate > 0 else None
+        self.account_rate = account_rate
+        self.account_burst = account_burst or account_rate
+        self.max_accounts = max_accounts
+        self._account_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.max_backlog = max_backlog
+        self.backlog_check_interval = backlog_check_interval
+        self.task_queue_partitions = max(1, task_queue_partitions)
+        self._backlogs: Dict[str, Tuple[float, int]] = {} # task queue -> (time.monotonic() read, backlog or -1)
+        self._backlog_locks: Dict[str, asyncio.Lock] = {}
+        self.counters: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.global_bucket is not None or self.account_rate > 0 or self.max_backlog > 0
+
+    def _account_bucket(self, account: str) -> TokenBucket:
+        bucket = self._account_buckets.get(account)
+        if bucket is None:
+            bucket = self._account_buckets[account] = TokenBucket(self.account_rate, self.account_burst)
+            if len(self._account_buckets) > self.max_accounts:
+                self._account_buckets.popitem(last=False)
+        else:
+            self._account_buckets.move_to_end(account)
+        return bucket
+
+    async def _read_backlog(self, client: Client, task_queue: str) -> int:
+        backlog = 0
+        for queue_type in (TaskQueueType.TASK_QUEUE_TYPE_WORKFLOW, TaskQueueType.TASK_QUEUE_TYPE_ACTIVITY):
+            response = await client.workflow_service.describe_task_queue(DescribeTaskQueueRequest(
+                namespace=client.namespace,
+                task_queue=TaskQueue(name=task_queue),
+                task_queue_type=queue_type,
+                include_task_queue_status=True,
+            ))
+            backlog += response.task_queue_status.backlog_count_hint
+        # The status describes the root partition only; tasks spread evenly over the
+        # partitions, so scaling it gives an estimate of the whole queue
+        return backlog * self.task_queue_partitions
+
+    async def backlog(self, task_queue: str) -> Optional[int]:
+        """Latest backlog reading of `task_queue`, refreshed by one caller per interval; None if it can't be read."""
+        cached = self._backlogs.get(task_queue)
+        if cached is not None and time.monotonic() - cached[0] < self.backlog_check_interval:
+            return cached[1] if cached[1] >= 0 else None
+        lock = self._backlog_locks.setdefault(task_queue, asyncio.Lock())
+        async with lock:
+            cached = self._backlogs.get(task_queue)
+            if cached is not None and time.monotonic() - cached[0] < self.backlog_check_interval:
+                return cached[1] if cached[1] >= 0 else None
+            try:
+                backlog = await self._read_backlog(await self._client_factory(), task_queue)
+            except Exception as e:
+                # Admission must not depend on Temporal answering; fall back to the token buckets
+                log.warning("Could not read task queue backlog", event="admission.backlog_error",
+                            task_queue=task_queue, error=str(e))
+                self._backlogs[task_queue] = (time.monotonic(), -1)
+                return None
+            self._backlogs[task_queue] = (time.monotonic(), backlog)
+            return backlog
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionDecision:
+        self.counters[f"rejected_{reason}"] += 1
+        log.debug("Workflow start rejected", event="admission.rejected", reason=reason, retry_after=round(retry_after, 3))
+        return AdmissionDecision(admitted=False, retry_after=retry_after, reason=reason)
+
+    async def admit(self, account: Optional[str], routing_key: Optional[str], tokens: float = 1.0) -> AdmissionDecision:
+        """Admits a request that starts `tokens` workflows, e.g. the transfers of a batch."""
+        if not self.enabled:
+            return ADMITTED
+        if self.max_backlog > 0:
+            backlog = await self.backlog(await self._task_queue_resolver(routing_key))
+            if backlog is not None and backlog >= self.max_backlog:
+                return self._reject("backlog", self.backlog_check_interval)
+        account_bucket = self._account_bucket(account) if account and self.account_rate > 0 else None
+        if any(bucket is not None and tokens > bucket.burst for bucket in (account_bucket, self.global_bucket)):
+            return self._reject("too_large", 0.0)
+        if account_bucket is not None:
+            wait = account_bucket.try_acquire(tokens)
+            if wait > 0:
+                return self._reject("account_rate", wait)
+        if self.global_bucket is not None:
+            wait = self.global_bucket.try_acquire(tokens)
+            if wait > 0:
+                if account_bucket is not None:
+                    account_bucket.give_back(tokens)
+                return self._reject("rate", wait)
+        self.counters["admitted"] += 1
+        return ADMITTED
+
+    async def wait_admitted(self, account: Optional[str], routing_key: Optional[str]) -> None:
+        """Waits until a start is admitted, for callers such as bulk submissions that queue instead of failing."""
+        while True:
+            decision = await self.admit(account, routing_key)
+            if decision.admitted:
+                return
+            self.counters["waited"] += 1
+            await asyncio.sleep(decision.retry_after)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "counters": dict(self.counters),
+            "tracked_accounts": len(self._account_buckets),
+            "backlogs": {queue: backlog for queue, (_, backlog) in self._backlogs.items()},
+        }
+
+_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Returns the process-wide controller, configured from the environment:
+      ADMISSION_RATE / ADMISSION_BURST                  global starts per second and burst
+      ADMISSION_ACCOUNT_RATE / ADMISSION_ACCOUNT_BURST  the same per source account
+      ADMISSION_MAX_BACKLOG                             task queue backlog at which starts are rejected
+      ADMISSION_BACKLOG_CHECK_SECONDS                   how long a backlog reading is reused (default 2)
+      ADMISSION_TASK_QUEUE_PARTITIONS                   partitions per task queue, to scale the backlog reading (default 4)
+    Every limit is off (0) by default.
+    """
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            client_factory=lambda: get_client_pool().get(),
+            task_queue_resolver=resolve_task_queue,
+            rate=float(os.getenv("ADMISSION_RATE", "0")),
+            burst=float(os.getenv("ADMISSION_BURST", "0")),
+            account_rate=float(os.getenv("ADMISSION_ACCOUNT_RATE", "0")),
+            account_burst=float(os.getenv("ADMISSION_ACCOUNT_BURST", "0")),
+            max_backlog=int(os.getenv("ADMISSION_MAX_BACKLOG", "0")),
+            backlog_check_interval=float(os.getenv("ADMISSION_BACKLOG_CHECK_SECONDS", str(DEFAULT_BACKLOG_CHECK_INTERVAL))),
+            task_queue_partitions=int(os.getenv("ADMISSION_TASK_QUEUE_PARTITIONS", str(DEFAULT_TASK_QUEUE_PARTITIONS))),
+        )
+    return _controller
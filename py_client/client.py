@@ -1,64 +1,232 @@
 import os
 import asyncio
+import itertools
 import uuid
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from temporalio.client import Client, Interceptor, OutboundInterceptor
 from temporalio.client import StartWorkflowInput
 from temporalio.api.common.v1 import Payload
-from models import PaymentDetails # Ensure models.py is accessible
-from baggage import Baggage
+from models import PaymentDetails, BatchTransferRequest # Ensure models.py is accessible
+from baggage import extract_routing_key
+from payload_codec import data_converter_from_env
+from routing import get_task_queue_resolver, routing_mode_from_env
+from structured_logging import get_logger
+from tracing import get_tracer, tracing_interceptors
+
+DEFAULT_TEMPORAL_SERVER_URL = "temporal-server:7233"
+DEFAULT_TASK_QUEUE = "money-transfer"
+DEFAULT_CLIENT_POOL_SIZE = 1
+DEFAULT_BULK_CONCURRENCY = 64
+
+log = get_logger("client")
+routing_log = get_logger("client.routing") # per-start header traces; LOG_ROUTING_TRACE logs them
+tracer = get_tracer("client")
+
+# Headers for the workflow start currently in flight on this task. Each FastAPI
+# request runs in its own task, so concurrent requests never see each other's baggage.
+_request_headers: ContextVar[Dict[str, str]] = ContextVar("request_headers", default={})
 
 class HeaderInterceptor(Interceptor):
-    def __init__(self, headers: dict):
-        self.headers = headers
-    
+
     def intercept_client(self, next: OutboundInterceptor) -> OutboundInterceptor:
-        return HeaderOutboundInterceptor(next, self.headers)
+        return HeaderOutboundInterceptor(next)
 
 class HeaderOutboundInterceptor(OutboundInterceptor):
-    def __init__(self, next: OutboundInterceptor, headers: dict):
-        super().__init__(next)
-        self.headers = headers
-    
+
     async def start_workflow(self, input: StartWorkflowInput) -> str:
-        # Add our headers to the workflow
-        if self.headers:
-            for key, value in self.headers.items():
+        # Add the headers of the current request to the workflow
+        headers = _request_headers.get()
+        if headers:
+            for key, value in headers.items():
                 if isinstance(value, str):
                     # Headers must be Payload objects
-                    print(f"{value.encode('utf-8')} is utf 8 encodeing of original {value}")
+                    routing_log.debug("Adding workflow header", event="routing.header", header=key, value=value)
                     input.headers[key] = Payload(data=value.encode('utf-8'))
-        
+
         # Continue with the workflow start
         return await self.next.start_workflow(input)
 
+class TemporalClientPool:
+    """Process-wide pool of long-lived Temporal clients, handed out round-robin."""
+
+    def __init__(self, target_url: str, size: int = DEFAULT_CLIENT_POOL_SIZE):
+        self.target_url = target_url
+        self.size = max(1, size)
+        self._clients: List[Client] = []
+        self._next_index = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self._clients:
+                return
+            # Every client gets its own gRPC channel; the header interceptor is stateless
+            # so the same clients serve requests with any routing baggage. Tracing, when on,
+            # wraps it and adds the trace context to the same start request headers.
+            self._clients = list(await asyncio.gather(*[
+                Client.connect(self.target_url, interceptors=tracing_interceptors() + [HeaderInterceptor()],
+                               data_converter=data_converter_from_env())
+                for _ in range(self.size)
+            ]))
+            log.info("Connected Temporal client pool", event="client.pool_connected",
+                     size=self.size, target_url=self.target_url)
+
+    async def get(self) -> Client:
+        if not self._clients:
+            await self.connect()
+        return self._clients[next(self._next_index) % len(self._clients)]
+
+    def close(self) -> None:
+        # temporalio clients have no explicit close; dropping them releases the channels.
+        self._clients = []
+
+_client_pool: Optional[TemporalClientPool] = None
+
+def get_client_pool() -> TemporalClientPool:
+    """Returns the process-wide client pool, creating it from the environment on first use."""
+    global _client_pool
+    if _client_pool is None:
+        _client_pool = TemporalClientPool(
+            target_url=os.getenv("TEMPORAL_SERVER_URL", DEFAULT_TEMPORAL_SERVER_URL),
+            size=int(os.getenv("TEMPORAL_CLIENT_POOL_SIZE", str(DEFAULT_CLIENT_POOL_SIZE))),
+        )
+    return _client_pool
+
+async def resolve_task_queue(routing_key: Optional[str]) -> str:
+    """
+    Task queue to start a workflow on. In sandbox-queue routing mode, keys routed
+    to a sandbox go to that sandbox's queue; everything else goes to TASK_QUEUE.
+    """
+    task_queue = os.getenv("TASK_QUEUE", DEFAULT_TASK_QUEUE)
+    if routing_mode_from_env() != "sandbox-queue":
+        return task_queue
+    with tracer.start_as_current_span("ResolveTaskQueue") as span:
+        resolved = await get_task_queue_resolver().resolve(task_queue, extract_routing_key(routing_key))
+        span.set_attribute("temporal.task_queue", resolved)
+    return resolved
+
 async def start_workflow_with_routing(payment_details: PaymentDetails, routing_key: str = None):
     """
     Starts the MoneyTransferWorkflow with optional routing.
     """
-    temporal_server_url = os.getenv("TEMPORAL_SERVER_URL", "temporal-server:7233")
-    task_queue = os.getenv("TASK_QUEUE", "money-transfer")
-    
+    task_queue = await resolve_task_queue(routing_key)
+
     # Prepare headers
-    headers = {} # Corrected variable name from headers_dict to headers
+    headers = {}
     if routing_key:
         headers["baggage"] = routing_key
 
-    client = await Client.connect(temporal_server_url, interceptors=[HeaderInterceptor(headers)] if headers else [])    
+    client = await get_client_pool().get()
 
     workflow_id = f"money-transfer-{uuid.uuid4()}"
 
-    handle = await client.start_workflow(
-        "MoneyTransferWorkflow",
-        payment_details,
-        id=workflow_id,
-        task_queue=task_queue
-    )
-    
-    result_message = f"Started workflow with ID: {handle.id}, Run ID: {handle.result_run_id}, Routing Key: {Baggage().extract_routing_key_from_baggage(headers) or 'None (baseline)'}"
-    print(result_message)
+    token = _request_headers.set(headers)
+    try:
+        handle = await client.start_workflow(
+            "MoneyTransferWorkflow",
+            payment_details,
+            id=workflow_id,
+            task_queue=task_queue
+        )
+    finally:
+        _request_headers.reset(token)
+
+    effective_key = extract_routing_key(routing_key)
+    result_message = f"Started workflow with ID: {handle.id}, Run ID: {handle.result_run_id}, Routing Key: {effective_key or 'None (baseline)'}"
+    log.info("Started workflow", event="client.workflow_started", workflow_id=handle.id,
+             run_id=handle.result_run_id, routing_key=effective_key, task_queue=task_queue)
     return {
         "message": result_message,
         "workflow_id": handle.id,
         "run_id": handle.result_run_id,
         "routing_key_used": routing_key or "baseline"
     }
+
+async def start_batch_transfer(batch: BatchTransferRequest, routing_key: str = None):
+    """
+    Starts a BatchTransferWorkflow: one workflow that runs every transfer in the
+    batch as a child workflow, instead of one client start per transfer.
+    """
+    task_queue = await resolve_task_queue(routing_key)
+    headers = {"baggage": routing_key} if routing_key else {}
+    client = await get_client_pool().get()
+
+    token = _request_headers.set(headers)
+    try:
+        handle = await client.start_workflow(
+            "BatchTransferWorkflow",
+            batch,
+            id=f"batch-transfer-{uuid.uuid4()}",
+            task_queue=task_queue
+        )
+    finally:
+        _request_headers.reset(token)
+
+    log.info("Started batch workflow", event="client.batch_started", workflow_id=handle.id,
+             transfers=len(batch.transfers), transfers_ref=batch.transfers_ref,
+             routing_key=extract_routing_key(routing_key), task_queue=task_queue)
+    return {
+        "workflow_id": handle.id,
+        "run_id": handle.result_run_id,
+        "transfers": len(batch.transfers) if not batch.transfers_ref else None,
+        "routing_key_used": routing_key or "baseline"
+    }
+
+async def start_workflows_bulk(
+    items: AsyncIterator[Tuple[int, Union[PaymentDetails, str]]],
+    routing_key: str = None,
+    concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    before_start: Optional[Callable[[PaymentDetails], Awaitable[None]]] = None,
+) -> AsyncIterator[dict]:
+    """
+    Starts a MoneyTransferWorkflow for every valid item with at most `concurrency`
+    starts in flight, yielding per-item results in completion order. `before_start`,
+    if given, is awaited before each start, e.g. to wait for admission.
+
+    `items` yields (index, PaymentDetails) pairs, or (index, error message) for
+    items that failed validation; those are reported without touching Temporal.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: asyncio.Queue = asyncio.Queue()
+    pending = set()
+
+    async def start_one(index: int, payment: PaymentDetails) -> None:
+        try:
+            if before_start is not None:
+                await before_start(payment)
+            started = await start_workflow_with_routing(payment, routing_key)
+            results.put_nowait({"index": index, "workflow_id": started["workflow_id"], "run_id": started["run_id"]})
+        except Exception as e:
+            results.put_nowait({"index": index, "error": str(e)})
+        finally:
+            semaphore.release()
+
+    async def feed() -> None:
+        try:
+            async for index, item in items:
+                if isinstance(item, str):
+                    results.put_nowait({"index": index, "error": item})
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(start_one(index, item))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            results.put_nowait(None)
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+        # Surface errors from reading the input (e.g. a malformed stream)
+        await feeder
+    finally:
+        feeder.cancel()
+        for task in list(pending):
+            task.cancel()
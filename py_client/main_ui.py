@@ -1,17 +1,32 @@
 import os
 import asyncio
+import json
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from decimal import Decimal, InvalidOperation
+from temporalio.service import RPCError, RPCStatusCode
+from typing import Union
 
 # Assuming client.py and models.py are in the same directory or accessible
 # Ensure this import path is correct based on your project structure
-from client import start_workflow_with_routing
-from models import PaymentDetails
+from client import (
+    start_workflow_with_routing, start_workflows_bulk, start_batch_transfer, get_client_pool,
+    DEFAULT_BULK_CONCURRENCY,
+)
+from admission import AdmissionDecision, get_admission_controller
+from models import PaymentDetails, BatchTransferRequest
+from routing import get_task_queue_resolver
+from workflow_status import get_status_hub
+from structured_logging import configure_logging, get_logger, shutdown_logging
+from tracing import configure_tracing, get_tracer, shutdown_tracing
+from opentelemetry import propagate, trace
 
 app = FastAPI()
 
+log = get_logger("main_ui")
+tracer = get_tracer("main_ui")
+
 # Create a 'templates' directory in the same location as main_ui.py
 # and place your index.html file there.
 templates = Jinja2Templates(directory="templates")
@@ -19,6 +34,116 @@ templates = Jinja2Templates(directory="templates")
 # Mock account data for dropdowns - in a real app, this might come from a database
 MOCK_ACCOUNTS = ["acc_001", "acc_002", "acc_003", "acc_004", "acc_005_large_balance"]
 
+# Upper bound for the per-request `concurrency` of the bulk endpoint
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "256"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Seconds between keep-alive comments on idle status streams
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Upper bound for the per-request `transfers_per_run` of a batch, which also caps inline batches
+BATCH_MAX_TRANSFERS_PER_RUN = int(os.getenv("BATCH_MAX_TRANSFERS_PER_RUN", "1000"))
+# Upper bound for the per-request `timeout` of the result endpoint
+RESULT_MAX_WAIT_SECONDS = float(os.getenv("RESULT_MAX_WAIT_SECONDS", "30"))
+# Must match the worker's activities.py
+ACCOUNT_WORKFLOW_ID_PREFIX = "account-"
+
+def build_payment_details(from_account: str, to_account: str, amount: str, reference: str = "") -> PaymentDetails:
+    """Validates transfer input, raising ValueError with a user-facing message."""
+    if from_account == to_account:
+        raise ValueError("From and To accounts cannot be the same.")
+    try:
+        parsed_amount = Decimal(amount)
+        is_positive = parsed_amount > 0
+    except InvalidOperation:
+        raise ValueError("Invalid amount format.")
+    if not is_positive:
+        raise ValueError("Amount must be a positive number.")
+
+    return PaymentDetails(
+        from_account=from_account,
+        to_account=to_account,
+        amount=str(parsed_amount), # PaymentDetails expects string, validates internally
+        reference=reference
+    )
+
+def _too_many_requests(decision: AdmissionDecision) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": decision.retry_after_header},
+        content={
+            "error": "Too many transfers right now, retry later.",
+            "reason": decision.reason,
+            "retry_after_seconds": round(decision.retry_after, 3),
+        },
+    )
+
+def _validate_bulk_item(item) -> Union[PaymentDetails, str]:
+    """Returns PaymentDetails for a valid bulk item, or the validation error message."""
+    if not isinstance(item, dict):
+        return "Item must be a JSON object."
+    try:
+        return build_payment_details(
+            from_account=str(item.get("from_account") or ""),
+            to_account=str(item.get("to_account") or ""),
+            amount=str(item.get("amount") or ""),
+            reference=str(item.get("reference") or ""),
+        )
+    except ValueError as ve:
+        return str(ve)
+
+async def _iter_json_array(items: list):
+    for index, item in enumerate(items):
+        yield index, _validate_bulk_item(item)
+
+async def _iter_ndjson(body: bytes):
+    """Parses an NDJSON body, one transfer per non-blank line."""
+    index = 0
+    for line in body.split(b"\n"):
+        if not line.strip():
+            continue
+        try:
+            item = _validate_bulk_item(json.loads(line))
+        except ValueError:
+            item = "Invalid JSON."
+        yield index, item
+        index += 1
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span of each request; continues a trace from an incoming traceparent header."""
+    with tracer.start_as_current_span(f"{request.method} {request.url.path}", kind=trace.SpanKind.SERVER,
+                                      context=propagate.extract(request.headers),
+                                      attributes={"http.method": request.method, "http.target": request.url.path}) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            # Name by route template so every workflow's events share one span name
+            span.update_name(f"{request.method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(trace.StatusCode.ERROR)
+        return response
+
+@app.on_event("startup")
+async def connect_temporal_clients():
+    """Opens the shared Temporal client pool once, before the first request is served."""
+    configure_logging("py-client")
+    # Before the pool connects, so its clients get the tracing interceptor
+    configure_tracing("py-client")
+    try:
+        await get_client_pool().connect()
+    except Exception as e:
+        # Not fatal: the pool connects lazily on the first workflow start instead.
+        log.warning("Could not connect to Temporal at startup", event="client.pool_connect_failed", error=str(e))
+
+@app.on_event("shutdown")
+async def close_temporal_clients():
+    get_client_pool().close()
+    await get_task_queue_resolver().close()
+    await get_status_hub().close()
+    shutdown_tracing()
+    shutdown_logging()
+
 @app.get("/", response_class=HTMLResponse)
 async def get_workflow_form(request: Request):
     """Serves the HTML form."""
@@ -37,38 +162,201 @@ async def handle_start_workflow(
     try:
 
         # Basic validation
-        if from_account == to_account:
-            return JSONResponse(status_code=400, content={"error": "From and To accounts cannot be the same."})
-        
-        try:
-            parsed_amount = Decimal(amount)
-            if parsed_amount <= 0:
-                return JSONResponse(status_code=400, content={"error": "Amount must be a positive number."})
-        except InvalidOperation:
-            return JSONResponse(status_code=400, content={"error": "Invalid amount format."})
-
-        payment = PaymentDetails(
-            from_account=from_account,
-            to_account=to_account,
-            amount=str(parsed_amount), # PaymentDetails expects string, validates internally
-            reference=reference
-        )
+        payment = build_payment_details(from_account, to_account, amount, reference)
         
         # Use None if routing_key is empty string, otherwise pass the baggage header
         effective_routing_key = request.headers.get('baggage') if request.headers.get('baggage') else None     
 
+        decision = await get_admission_controller().admit(payment.from_account, effective_routing_key)
+        if not decision.admitted:
+            return _too_many_requests(decision)
+
         result = await start_workflow_with_routing(
             payment_details=payment,
             routing_key=effective_routing_key
         )
+        result["events_url"] = f"/api/workflows/{result['workflow_id']}/events"
         return JSONResponse(content=result)
         
     except ValueError as ve: # Catch validation errors from PaymentDetails
         return JSONResponse(status_code=400, content={"error": str(ve)})
     except Exception as e:
         # Log the full error for debugging on the server
-        print(f"Error starting workflow: {e}")
+        log.exception("Error starting workflow", event="client.workflow_start_failed")
+        return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred: {str(e)}"})
+
+@app.post("/api/start-workflows")
+async def handle_start_workflows_bulk(request: Request, concurrency: int = DEFAULT_BULK_CONCURRENCY):
+    """
+    Bulk variant of /api/start-workflow. Accepts a JSON array of transfers, or an
+    NDJSON stream (Content-Type: application/x-ndjson) with one transfer per line.
+
+    Workflows are started concurrently, at most `concurrency` at a time. A JSON array
+    gets a single JSON response with per-item results ordered by index; an NDJSON
+    request gets NDJSON results streamed back as each start completes.
+    """
+    concurrency = max(1, min(concurrency, BULK_MAX_CONCURRENCY))
+    effective_routing_key = request.headers.get('baggage') if request.headers.get('baggage') else None
+
+    # Bulk submissions wait for admission item by item instead of failing part-way through
+    admission = get_admission_controller()
+    before_start = None
+    if admission.enabled:
+        before_start = lambda payment: admission.wait_admitted(payment.from_account, effective_routing_key)
+
+    if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+        # Read before responding: while a StreamingResponse runs, Starlette listens for the
+        # disconnect on the same receive channel, and would take body chunks from the reader
+        body = await request.body()
+
+        async def stream_results():
+            async for result in start_workflows_bulk(_iter_ndjson(body), effective_routing_key, concurrency, before_start):
+                yield json.dumps(result) + "\n"
+
+        return StreamingResponse(stream_results(), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        items = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Body must be a JSON array or NDJSON."})
+    if not isinstance(items, list):
+        return JSONResponse(status_code=400, content={"error": "Body must be a JSON array of transfers."})
+
+    results = [result async for result in start_workflows_bulk(_iter_json_array(items), effective_routing_key, concurrency, before_start)]
+    results.sort(key=lambda result: result["index"])
+    failed = sum(1 for result in results if "error" in result)
+    return JSONResponse(content={
+        "started": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    })
+
+@app.post("/api/start-batch-transfer")
+async def handle_start_batch_transfer(request: Request, max_parallel: int = 20, transfers_per_run: int = 500):
+    """
+    Starts one BatchTransferWorkflow for many transfers. The body is either a JSON
+    array of at most `transfers_per_run` transfers, which run in one workflow run,
+    or {"transfers_ref": "<path>"} naming an NDJSON file under the workers'
+    BATCH_TRANSFERS_DIR, for larger batches.
+    """
+    transfers_per_run = max(1, min(transfers_per_run, BATCH_MAX_TRANSFERS_PER_RUN))
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Body must be JSON."})
+
+    if isinstance(body, dict) and body.get("transfers_ref"):
+        transfers_ref = str(body["transfers_ref"])
+        # The workers reject anything outside BATCH_TRANSFERS_DIR too; this fails fast
+        if os.path.isabs(transfers_ref) or ".." in transfers_ref.replace("\\", "/").split("/"):
+            return JSONResponse(status_code=400, content={"error": "transfers_ref must be a relative path."})
+        batch = BatchTransferRequest(transfers_ref=transfers_ref)
+    elif isinstance(body, list):
+        validated = [_validate_bulk_item(item) for item in body]
+        errors = [{"index": index, "error": item} for index, item in enumerate(validated) if isinstance(item, str)]
+        if errors:
+            # The batch runs as one workflow, so it is accepted or rejected as a whole
+            return JSONResponse(status_code=400, content={"error": "Invalid transfers.", "results": errors})
+        if not validated:
+            return JSONResponse(status_code=400, content={"error": "Batch is empty."})
+        if len(validated) > transfers_per_run:
+            # Inline transfers sit in the workflow's input and history, so they must fit one run
+            return JSONResponse(status_code=400, content={
+                "error": f"Inline batches are limited to {transfers_per_run} transfers; send larger batches as a transfers_ref."})
+        batch = BatchTransferRequest(transfers=validated)
+    else:
+        return JSONResponse(status_code=400, content={"error": "Body must be a JSON array of transfers or a transfers_ref."})
+    batch.max_parallel = max(1, max_parallel)
+    batch.transfers_per_run = transfers_per_run
+
+    effective_routing_key = request.headers.get('baggage') if request.headers.get('baggage') else None
+    # Charged for the child workflows of its first run. A transfers_ref batch's size is only known
+    # to the workers, so its later runs are paced at the admission rate instead
+    transfers = len(batch.transfers) if batch.transfers else batch.transfers_per_run
+    admission = get_admission_controller()
+    decision = await admission.admit(None, effective_routing_key, tokens=transfers)
+    if not decision.admitted:
+        if decision.reason == "too_large":
+            return JSONResponse(status_code=413, content={
+                "error": f"A run of {transfers} transfers is more than admission allows at once; lower transfers_per_run.",
+                "reason": decision.reason})
+        return _too_many_requests(decision)
+    if admission.global_bucket is not None:
+        batch.min_run_seconds = batch.transfers_per_run / admission.global_bucket.rate
+    try:
+        result = await start_batch_transfer(batch, effective_routing_key)
+    except Exception as e:
+        log.exception("Error starting batch workflow", event="client.batch_start_failed")
         return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred: {str(e)}"})
+    return JSONResponse(content=result)
+
+async def _status_events(workflow_id: str):
+    """Server-sent events for a workflow's updates, with heartbeat comments while it is idle."""
+    updates = get_status_hub().subscribe(workflow_id)
+    next_update = asyncio.ensure_future(updates.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_update}, timeout=SSE_HEARTBEAT_SECONDS)
+            if not done:
+                yield ": heartbeat\n\n"
+                continue
+            try:
+                update = next_update.result()
+            except StopAsyncIteration:
+                return
+            yield f"event: {update['event']}\ndata: {json.dumps(update, default=str)}\n\n"
+            next_update = asyncio.ensure_future(updates.__anext__())
+    finally:
+        # Runs when the client disconnects too, releasing its share of the watch
+        next_update.cancel()
+        await asyncio.gather(next_update, return_exceptions=True)
+        await updates.aclose()
+
+@app.get("/api/workflows/{workflow_id}/events")
+async def stream_workflow_status(workflow_id: str):
+    """
+    Streams a workflow's progress as server-sent events: started, withdraw_completed,
+    deposit_completed (or *_failed), then a final event such as completed, carrying
+    the workflow's result. Subscribers of the same workflow share one Temporal watch.
+    """
+    return StreamingResponse(_status_events(workflow_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/workflows/{workflow_id}/result")
+async def get_workflow_result(workflow_id: str, timeout: float = RESULT_MAX_WAIT_SECONDS):
+    """
+    Waits up to `timeout` seconds for a workflow to finish and returns its final
+    update, or 202 if it is still running, so the caller can ask again.
+    """
+    try:
+        final = await asyncio.wait_for(get_status_hub().result(workflow_id),
+                                       timeout=min(max(0.0, timeout), RESULT_MAX_WAIT_SECONDS))
+    except asyncio.TimeoutError:
+        return JSONResponse(status_code=202, content={"workflow_id": workflow_id, "event": "running"})
+    status_code = 404 if final.get("error") == "Workflow not found" else 200
+    return JSONResponse(status_code=status_code, content=json.loads(json.dumps(final, default=str)))
+
+@app.get("/api/accounts/{account_id}/balance")
+async def get_account_balance(account_id: str):
+    """Balance held by the account's AccountWorkflow (BANKING_ACTIVITY_MODE=actor), read with a query."""
+    client = await get_client_pool().get()
+    handle = client.get_workflow_handle(f"{ACCOUNT_WORKFLOW_ID_PREFIX}{account_id}")
+    try:
+        balance = await handle.query("balance")
+    except RPCError as e:
+        if e.status != RPCStatusCode.NOT_FOUND:
+            raise
+        return JSONResponse(status_code=404, content={"error": f"No account workflow for {account_id}"})
+    return JSONResponse(content={"account_id": account_id, "balance": balance})
+
+@app.get("/api/workflow-status/stats")
+async def get_workflow_status_stats():
+    return JSONResponse(content=get_status_hub().stats())
+
+@app.get("/api/admission/stats")
+async def get_admission_stats():
+    """Admitted, rejected (by reason) and waited workflow starts, and the latest backlog readings."""
+    return JSONResponse(content=get_admission_controller().stats())
 
 # To run this application:
 # 1. Make sure FastAPI and Uvicorn are installed: pip install fastapi uvicorn python-multipart jinja2
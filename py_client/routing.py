@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional
+from urllib.parse import urlencode, urljoin
+
+import aiohttp
+
+from structured_logging import get_logger
+
+# Mirrors the worker's ROUTES_API_* settings so both sides query the same routing rules
+DEFAULT_ROUTE_SERVER_ADDR = "http://localhost"
+DEFAULT_BASELINE_KIND = "Deployment"
+DEFAULT_BASELINE_NAMESPACE = "temporal"
+DEFAULT_BASELINE_NAME = "temporal-worker-baseline"
+DEFAULT_REFRESH_INTERVAL = 5 # seconds a fetched rule set is used before it is refreshed
+DEFAULT_REQUEST_TIMEOUT = 10 # seconds
+ROUTING_RULES_PATH = "/api/v1/workloads/routing-rules"
+
+# "selective": every worker polls TASK_QUEUE and skips tasks that aren't theirs.
+# "sandbox-queue": sandbox workers poll TASK_QUEUE@<sandbox> and the client starts workflows there.
+ROUTING_MODES = ("selective", "sandbox-queue")
+SANDBOX_QUEUE_SEPARATOR = "@"
+
+log = get_logger("client.routing")
+
+def routing_mode_from_env() -> str:
+    mode = os.getenv("ROUTING_MODE", "selective").lower()
+    if mode not in ROUTING_MODES:
+        raise ValueError(f"unknown ROUTING_MODE '{mode}', expected 'selective' or 'sandbox-queue'")
+    return mode
+
+def sandbox_task_queue(task_queue: str, sandbox_name: str) -> str:
+    """Task queue polled by a sandbox's workers in sandbox-queue mode. Must match the worker's platform_sdk."""
+    return f"{task_queue}{SANDBOX_QUEUE_SEPARATOR}{sandbox_name}" if sandbox_name else task_queue
+
+class TaskQueueResolver:
+    """
+    Resolves routing keys to task queues from the route server's routing rules.
+
+    The routing key -> sandbox map is fetched at most once per refresh interval,
+    by whichever start needs it first. While the route server is unreachable the
+    last map keeps being used; before any fetch has succeeded every key resolves
+    to the baseline queue.
+    """
+
+    def __init__(self, route_server_addr: Optional[str] = None):
+        self.route_server_addr = route_server_addr or os.getenv("ROUTES_API_ROUTE_SERVER_ADDR", DEFAULT_ROUTE_SERVER_ADDR)
+        self.refresh_interval = float(os.getenv("ROUTES_API_REFRESH_INTERVAL_SECONDS", str(DEFAULT_REFRESH_INTERVAL)))
+        self.request_timeout = float(os.getenv("ROUTES_API_REQUEST_TIMEOUT_SECONDS", str(DEFAULT_REQUEST_TIMEOUT)))
+        self.query = urlencode({
+            "baselineKind": os.getenv("ROUTES_API_BASELINE_KIND", DEFAULT_BASELINE_KIND),
+            "baselineNamespace": os.getenv("ROUTES_API_BASELINE_NAMESPACE", DEFAULT_BASELINE_NAMESPACE),
+            "baselineName": os.getenv("ROUTES_API_BASELINE_NAME", DEFAULT_BASELINE_NAME),
+        })
+        self._sandboxes: Dict[str, str] = {} # routing key -> destination sandbox name
+        self._etag: Optional[str] = None
+        self._fetched_at: Optional[float] = None # time.monotonic() of the last fetch attempt
+        self._refresh_lock = asyncio.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.refresh_interval
+
+    async def _refresh(self) -> None:
+        url = f"{urljoin(self.route_server_addr, ROUTING_RULES_PATH)}?{self.query}"
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            async with self._get_session().get(url, headers=headers) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    self._sandboxes = {
+                        str(rule["routingKey"]): str(rule["destinationSandboxName"])
+                        for rule in data.get("routingRules") or []
+                        if rule.get("routingKey") is not None and rule.get("destinationSandboxName")
+                    }
+                    self._etag = response.headers.get("ETag")
+                    log.info("Routing rules updated", event="routing.rules_updated", rule_count=len(self._sandboxes))
+                elif response.status != 304:
+                    log.warning("Error fetching routing rules", event="routing.rules_error", status=response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            log.warning("Error fetching routing rules", event="routing.rules_error", error=str(e) or type(e).__name__)
+        # Failures also wait out the interval, so an unreachable route server doesn't slow every start
+        self._fetched_at = time.monotonic()
+
+    async def sandbox_for(self, routing_key: Optional[str]) -> Optional[str]:
+        """Destination sandbox of a routing key, or None for baseline."""
+        if not routing_key:
+            return None
+        if self._is_stale():
+            async with self._refresh_lock:
+                if self._is_stale():
+                    await self._refresh()
+        return self._sandboxes.get(routing_key)
+
+    async def resolve(self, task_queue: str, routing_key: Optional[str]) -> str:
+        return sandbox_task_queue(task_queue, await self.sandbox_for(routing_key) or "")
+
+_resolver: Optional[TaskQueueResolver] = None
+
+def get_task_queue_resolver() -> TaskQueueResolver:
+    """Returns the process-wide resolver, creating it from the environment on first use."""
+    global _resolver
+    if _resolver is None:
+        _resolver = TaskQueueResolver()
+    return _resolver
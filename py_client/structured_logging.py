@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_FORMAT = "json" # or "text"
+DEFAULT_RATE_LIMIT_PER_SECOND = 20.0 # per event type
+# Events emitted on every task are sampled by default; LOG_SAMPLE_RATES overrides these
+DEFAULT_SAMPLE_RATES = {
+    "routing.skipped": 0.01,
+    "client.workflow_started": 0.1,
+}
+ROUTING_EVENT_PREFIX = "routing."
+# Loggers whose per-task DEBUG traces LOG_ROUTING_TRACE turns on
+ROUTING_TRACE_LOGGERS = ("platform_sdk.routing", "client.routing")
+
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parses "routing.skipped=0.05,client.workflow_started=1" into a dict."""
+    rates = {}
+    for part in spec.split(","):
+        event, _, rate = part.strip().partition("=")
+        if event and rate:
+            rates[event] = float(rate)
+    return rates
+
+class _EventGate:
+    """Per-event-type sampling plus a token-bucket rate limit, checked before a record is created."""
+
+    def __init__(self, rate_limit: float, sample_rates: Dict[str, float], trace_routing: bool):
+        self.rate_limit = rate_limit
+        self.sample_rates = sample_rates
+        self.trace_routing = trace_routing
+        self._buckets: Dict[str, Tuple[float, float]] = {} # event -> (tokens, last refill)
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, event: str) -> Tuple[bool, int]:
+        """Returns whether to emit this event, and how many were suppressed since the last one emitted."""
+        if self.trace_routing and event.startswith(ROUTING_EVENT_PREFIX):
+            return True, 0
+        sample_rate = self.sample_rates.get(event, 1.0)
+        with self._lock:
+            allowed = sample_rate >= 1.0 or random.random() < sample_rate
+            if allowed and self.rate_limit > 0:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(event, (self.rate_limit, now))
+                tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+                allowed = tokens >= 1.0
+                self._buckets[event] = (tokens - 1.0 if allowed else tokens, now)
+            if not allowed:
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return False, 0
+            return True, self._suppressed.pop(event, 0)
+
+_gate = _EventGate(DEFAULT_RATE_LIMIT_PER_SECOND, dict(DEFAULT_SAMPLE_RATES), trace_routing=False)
+
+class EventLogger(logging.LoggerAdapter):
+    """
+    Logger for structured records. Keyword arguments become record fields:
+
+        log.info("Routing keys updated", event="routes.updated", key_count=3)
+
+    Records with an `event` are sampled and rate limited per event type before
+    the record is even built, so suppressed hot-path logging costs almost nothing.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def log(self, level: int, msg: Any, *args: Any, event: Optional[str] = None, exc_info: Any = None,
+            **fields: Any) -> None:
+        if not self.isEnabledFor(level):
+            return
+        if event:
+            allowed, suppressed = _gate.allow(event)
+            if not allowed:
+                return
+            if suppressed:
+                fields["suppressed"] = suppressed
+        self.logger.log(level, msg, *args, exc_info=exc_info,
+                        extra={"event": event or "", "fields": fields})
+
+    def debug(self, msg: Any, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg: Any, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg: Any, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg: Any, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg: Any, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.ERROR, msg, *args, exc_info=True, **kwargs)
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(logging.getLogger(name))
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, service, event, message and fields."""
+
+    converter = time.gmtime
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "service": self.service,
+            "event": getattr(record, "event", ""),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        # Anything passed through a plain logger's `extra` is kept too
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and key not in ("event", "fields"):
+                entry.setdefault(key, value)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class _DeferredFormattingQueueHandler(QueueHandler):
+    """Enqueues records untouched; message interpolation and formatting happen on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging(service: str) -> None:
+    """
+    Routes all logging through a queue to a background thread that formats and writes to stdout.
+
+    Environment:
+      LOG_LEVEL                  root level (default INFO)
+      LOG_FORMAT                 json or text (default json)
+      LOG_RATE_LIMIT_PER_SECOND  max records per second per event type, 0 for unlimited (default 20)
+      LOG_SAMPLE_RATES           per-event sampling, e.g. "routing.skipped=0.05"
+      LOG_ROUTING_TRACE          true to log every routing decision unsampled, for debugging sandboxes
+    """
+    global _listener, _gate
+    if _listener is not None:
+        return
+
+    trace_routing = os.getenv("LOG_ROUTING_TRACE", "false").lower() == "true"
+    sample_rates = dict(DEFAULT_SAMPLE_RATES)
+    sample_rates.update(_parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")))
+    _gate = _EventGate(float(os.getenv("LOG_RATE_LIMIT_PER_SECOND", str(DEFAULT_RATE_LIMIT_PER_SECOND))),
+                       sample_rates, trace_routing)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    log_format = os.getenv("LOG_FORMAT", DEFAULT_LOG_FORMAT).lower()
+    stream_handler.setFormatter(JsonFormatter(service) if log_format == "json" else TextFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_DeferredFormattingQueueHandler(log_queue)]
+    root.setLevel(os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL).upper())
+    if trace_routing:
+        for name in ROUTING_TRACE_LOGGERS:
+            logging.getLogger(name).setLevel(logging.DEBUG)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Flushes queued records; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
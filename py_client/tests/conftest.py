@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The client's modules are flat, imported from the py_client directory
+PY_CLIENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PY_CLIENT_DIR)
+# main_ui loads its templates relative to the working directory
+os.chdir(PY_CLIENT_DIR)
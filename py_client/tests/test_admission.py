@@ -0,0 +1,75 @@
+import asyncio
+
+from admission import AdmissionController, TokenBucket
+
+async def queue_for(routing_key):
+    return "money-transfer"
+
+def controller(**limits) -> AdmissionController:
+    return AdmissionController(client_factory=None, task_queue_resolver=queue_for, **limits)
+
+def test_bucket_takes_tokens_without_going_into_debt():
+    bucket = TokenBucket(rate=1, burst=10)
+    assert bucket.try_acquire(10) == 0
+    assert bucket.tokens >= 0
+    assert 4 < bucket.try_acquire(5) <= 5
+
+def test_charge_larger_than_burst_is_rejected_as_too_large():
+    admission = controller(rate=10, burst=20)
+    decision = asyncio.run(admission.admit(None, None, tokens=21))
+    assert not decision.admitted and decision.reason == "too_large"
+    # Nothing was taken, so a start that fits still goes ahead
+    assert asyncio.run(admission.admit(None, None, tokens=20)).admitted
+
+def test_account_burst_limits_charges_too():
+    admission = controller(account_rate=1, account_burst=5)
+    assert asyncio.run(admission.admit("acc_001", None, tokens=6)).reason == "too_large"
+    assert asyncio.run(admission.admit("acc_001", None, tokens=5)).admitted
+
+def test_global_rejection_refunds_the_account_bucket():
+    admission = controller(rate=1, burst=1, account_rate=1, account_burst=2)
+    assert asyncio.run(admission.admit("acc_001", None)).admitted
+    decision = asyncio.run(admission.admit("acc_001", None))
+    assert not decision.admitted and decision.reason == "rate" and decision.retry_after > 0
+    # The account's token came back, so only the global bucket is empty
+    assert admission._account_bucket("acc_001").tokens >= 1
+
+def test_account_buckets_are_bounded():
+    admission = controller(account_rate=1, account_burst=1, max_accounts=2)
+    for account in ("acc_001", "acc_002", "acc_003"):
+        asyncio.run(admission.admit(account, None))
+    assert list(admission._account_buckets) == ["acc_002", "acc_003"]
+
+def test_backlog_rejects_and_reading_is_reused(monkeypatch):
+    admission = controller(max_backlog=10, backlog_check_interval=60)
+    reads = []
+
+    async def read_backlog(client, task_queue):
+        reads.append(task_queue)
+        return 12
+
+    monkeypatch.setattr(admission, "_read_backlog", read_backlog)
+    admission._client_factory = lambda: asyncio.sleep(0)
+    for _ in range(3):
+        decision = asyncio.run(admission.admit(None, None))
+        assert decision.reason == "backlog" and decision.retry_after == 60
+    assert reads == ["money-transfer"]
+
+def test_unreadable_backlog_falls_back_to_the_rate_limits(monkeypatch):
+    admission = controller(max_backlog=10)
+
+    async def read_backlog(client, task_queue):
+        raise RuntimeError("Temporal unavailable")
+
+    monkeypatch.setattr(admission, "_read_backlog", read_backlog)
+    admission._client_factory = lambda: asyncio.sleep(0)
+    assert asyncio.run(admission.admit(None, None)).admitted
+
+def test_wait_admitted_waits_for_a_token():
+    admission = controller(rate=50, burst=1)
+
+    async def run():
+        await admission.wait_admitted(None, None)
+        await admission.wait_admitted(None, None)
+    asyncio.run(run())
+    assert admission.counters["admitted"] == 2 and admission.counters["waited"] >= 1
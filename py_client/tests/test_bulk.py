@@ -0,0 +1,117 @@
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+import client
+from admission import AdmissionController
+import main_ui
+
+@pytest.fixture
+def started(monkeypatch) -> List[str]:
+    """Stands in for Temporal: records each start and returns IDs derived from its reference."""
+    references: List[str] = []
+
+    async def start_workflow_with_routing(payment, routing_key=None):
+        references.append(payment.reference)
+        await asyncio.sleep(0)
+        return {"workflow_id": f"wf-{payment.reference}", "run_id": "run"}
+
+    monkeypatch.setattr(client, "start_workflow_with_routing", start_workflow_with_routing)
+    return references
+
+async def asgi_post(path: str, chunks: List[bytes], content_type: str, query: bytes = b"") -> tuple:
+    """POSTs a body in several chunks straight through the ASGI app, like a server using ASGI 2.3."""
+    pending = [{"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+               for index, chunk in enumerate(chunks)]
+    finished = asyncio.Event()
+    status, body = None, b""
+
+    async def receive() -> dict:
+        if pending:
+            await asyncio.sleep(0) # let the response and any disconnect listener run between chunks
+            return pending.pop(0)
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal status, body
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                finished.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query, "headers": [(b"content-type", content_type.encode())],
+        "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    # Lost body chunks leave the request waiting for more; fail instead of hanging
+    await asyncio.wait_for(main_ui.app(scope, receive, send), timeout=10)
+    return status, body
+
+def transfer(index: int) -> dict:
+    return {"from_account": "acc_001", "to_account": "acc_002", "amount": "1.00", "reference": f"ref-{index}"}
+
+def test_multi_chunk_ndjson_gets_a_result_per_line(started):
+    lines = [json.dumps(transfer(index)).encode() + b"\n" for index in range(50)]
+    # Chunks that split lines mid-way, as a network would
+    body = b"".join(lines)
+    chunks = [body[offset:offset + 97] for offset in range(0, len(body), 97)]
+    status, response = asyncio.run(asgi_post("/api/start-workflows", chunks, "application/x-ndjson"))
+    results = [json.loads(line) for line in response.splitlines() if line.strip()]
+    assert status == 200
+    assert sorted(result["index"] for result in results) == list(range(50))
+    assert all("workflow_id" in result for result in results)
+    assert sorted(started) == sorted(f"ref-{index}" for index in range(50))
+
+def test_invalid_ndjson_lines_get_errors(started):
+    body = b"\n".join([json.dumps(transfer(0)).encode(), b"{not json", json.dumps({"amount": "1"}).encode()])
+    status, response = asyncio.run(asgi_post("/api/start-workflows", [body], "application/x-ndjson"))
+    results = {result["index"]: result for result in map(json.loads, response.splitlines())}
+    assert results[0]["workflow_id"] == "wf-ref-0"
+    assert results[1]["error"] == "Invalid JSON."
+    assert "error" in results[2]
+    assert started == ["ref-0"]
+
+def test_json_array_results_are_ordered(started):
+    body = json.dumps([transfer(index) for index in range(10)]).encode()
+    status, response = asyncio.run(asgi_post("/api/start-workflows", [body[:40], body[40:]], "application/json"))
+    content = json.loads(response)
+    assert status == 200 and content["started"] == 10 and content["failed"] == 0
+    assert [result["index"] for result in content["results"]] == list(range(10))
+
+def test_inline_batch_larger_than_one_run_is_rejected(monkeypatch):
+    async def start_batch_transfer(batch, routing_key=None):
+        raise AssertionError("must not start")
+
+    monkeypatch.setattr(main_ui, "start_batch_transfer", start_batch_transfer)
+    body = json.dumps([transfer(index) for index in range(11)]).encode()
+    status, response = asyncio.run(asgi_post("/api/start-batch-transfer", [body], "application/json",
+                                             query=b"transfers_per_run=10"))
+    assert status == 400
+    assert "transfers_ref" in json.loads(response)["error"]
+
+def test_batch_run_larger_than_the_burst_gets_413(monkeypatch):
+    started_batches = []
+
+    async def start_batch_transfer(batch, routing_key=None):
+        started_batches.append(batch)
+        return {"workflow_id": "batch-1"}
+
+    monkeypatch.setattr(main_ui, "start_batch_transfer", start_batch_transfer)
+    admission = AdmissionController(client_factory=None, task_queue_resolver=None, rate=10, burst=20)
+    monkeypatch.setattr(main_ui, "get_admission_controller", lambda: admission)
+    body = json.dumps({"transfers_ref": "batch.ndjson"}).encode()
+    status, response = asyncio.run(asgi_post("/api/start-batch-transfer", [body], "application/json",
+                                             query=b"transfers_per_run=21"))
+    assert status == 413 and json.loads(response)["reason"] == "too_large"
+    # A run that fits is admitted, and the later runs are paced at the admission rate
+    status, _ = asyncio.run(asgi_post("/api/start-batch-transfer", [body], "application/json",
+                                      query=b"transfers_per_run=20"))
+    assert status == 200
+    assert [batch.min_run_seconds for batch in started_batches] == [2.0]
@@ -0,0 +1,23 @@
+import asyncio
+
+import client
+from client import TemporalClientPool
+
+def test_clients_are_handed_out_round_robin(monkeypatch):
+    connected = []
+
+    async def connect(target_url, **kwargs):
+        await asyncio.sleep(0)
+        connected.append(object())
+        return connected[-1]
+
+    monkeypatch.setattr(client.Client, "connect", connect)
+
+    async def run():
+        pool = TemporalClientPool("temporal.invalid:7233", size=3)
+        # Concurrent first uses share one connect
+        first = await asyncio.gather(*(pool.get() for _ in range(3)))
+        return first + [await pool.get() for _ in range(3)]
+    handed_out = asyncio.run(run())
+    assert len(connected) == 3
+    assert handed_out == connected + connected
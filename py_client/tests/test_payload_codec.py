@@ -0,0 +1,29 @@
+import asyncio
+import dataclasses
+
+from temporalio.converter import DataConverter
+
+from models import BatchTransferRequest, PaymentDetails
+from payload_codec import ENCODING, CompactPayloadCodec, data_converter_from_env
+
+def payment(index: int = 0) -> PaymentDetails:
+    return PaymentDetails(from_account="acc_001", to_account="acc_002", amount="12.50", reference=f"ref-{index}")
+
+def test_compact_round_trip():
+    converter = data_converter_from_env(encode=True)
+    values = [payment(), BatchTransferRequest(transfers=[payment(index) for index in range(50)], max_parallel=5)]
+    payloads = asyncio.run(converter.encode(values))
+    assert all(p.metadata["encoding"] == ENCODING for p in payloads)
+    assert sum(p.ByteSize() for p in payloads) < sum(p.ByteSize() for p in asyncio.run(DataConverter.default.encode(values)))
+    assert asyncio.run(converter.decode(payloads, [PaymentDetails, BatchTransferRequest])) == values
+
+def test_json_payloads_decode_with_the_codec_installed():
+    payloads = asyncio.run(DataConverter.default.encode([payment()]))
+    assert asyncio.run(data_converter_from_env(encode=False).decode(payloads, [PaymentDetails])) == [payment()]
+
+def test_codec_off_writes_json_and_still_reads_compact():
+    written = asyncio.run(data_converter_from_env(encode=False).encode([payment()]))
+    assert written[0].metadata["encoding"] == b"json/plain"
+    v1 = dataclasses.replace(DataConverter.default, payload_codec=CompactPayloadCodec(version=1))
+    compact = asyncio.run(v1.encode([payment()]))
+    assert asyncio.run(data_converter_from_env(encode=False).decode(compact, [PaymentDetails])) == [payment()]
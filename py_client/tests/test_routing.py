@@ -0,0 +1,85 @@
+import asyncio
+from typing import List, Optional
+
+import aiohttp
+
+from routing import TaskQueueResolver
+
+class FakeResponse:
+    def __init__(self, status: int, body: Optional[dict] = None, etag: Optional[str] = None):
+        self.status = status
+        self.body = body
+        self.headers = {"ETag": etag} if etag else {}
+
+    async def json(self) -> dict:
+        return self.body
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+class FakeSession:
+    """Route server stand-in: answers each GET with the next response, or raises it"""
+
+    def __init__(self, responses: list):
+        self.responses = responses
+        self.requests: List[dict] = []
+
+    def get(self, url: str, headers: dict):
+        self.requests.append(headers)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def rules(**sandboxes: str) -> dict:
+    return {"routingRules": [{"routingKey": key, "destinationSandboxName": name} for key, name in sandboxes.items()]}
+
+def resolver_with(monkeypatch, responses: list) -> tuple:
+    monkeypatch.setenv("ROUTES_API_REFRESH_INTERVAL_SECONDS", "5")
+    resolver = TaskQueueResolver(route_server_addr="http://routes.invalid")
+    session = FakeSession(responses)
+    resolver._get_session = lambda: session
+    return resolver, session
+
+def age(resolver: TaskQueueResolver, seconds: float) -> None:
+    """Moves the last fetch `seconds` into the past"""
+    resolver._fetched_at -= seconds
+
+def test_rules_are_fetched_once_per_refresh_interval(monkeypatch):
+    resolver, session = resolver_with(monkeypatch, [
+        FakeResponse(200, rules(key_a="sandbox-a"), etag="v1"),
+        FakeResponse(304),
+    ])
+
+    async def run():
+        assert await resolver.resolve("money-transfer", "key_a") == "money-transfer@sandbox-a"
+        assert await resolver.resolve("money-transfer", "key_b") == "money-transfer"
+        assert len(session.requests) == 1
+        age(resolver, 6)
+        # Unchanged rules: the ETag is sent back and the map is kept
+        assert await resolver.resolve("money-transfer", "key_a") == "money-transfer@sandbox-a"
+        assert session.requests[1] == {"If-None-Match": "v1"}
+    asyncio.run(run())
+
+def test_unreachable_route_server_keeps_the_last_rules(monkeypatch):
+    resolver, session = resolver_with(monkeypatch, [
+        FakeResponse(200, rules(key_a="sandbox-a")),
+        aiohttp.ClientConnectionError("refused"),
+    ])
+
+    async def run():
+        await resolver.sandbox_for("key_a")
+        age(resolver, 6)
+        assert await resolver.sandbox_for("key_a") == "sandbox-a"
+        # The failure waits out the interval too
+        assert await resolver.sandbox_for("key_a") == "sandbox-a"
+        assert len(session.requests) == 2
+    asyncio.run(run())
+
+def test_no_routing_key_resolves_to_baseline_without_fetching(monkeypatch):
+    resolver, session = resolver_with(monkeypatch, [])
+    assert asyncio.run(resolver.resolve("money-transfer", None)) == "money-transfer"
+    assert session.requests == []
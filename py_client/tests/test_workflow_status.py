@@ -0,0 +1,98 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from temporalio.api.common.v1 import Payloads
+from temporalio.api.enums.v1 import EventType
+from temporalio.api.history.v1 import (
+    HistoryEvent, WorkflowExecutionCompletedEventAttributes, WorkflowExecutionContinuedAsNewEventAttributes,
+)
+from temporalio.converter import DataConverter
+
+from workflow_status import WorkflowStatusHub
+
+def started() -> HistoryEvent:
+    return HistoryEvent(event_type=EventType.EVENT_TYPE_WORKFLOW_EXECUTION_STARTED)
+
+def continued(run_id: str) -> HistoryEvent:
+    return HistoryEvent(
+        event_type=EventType.EVENT_TYPE_WORKFLOW_EXECUTION_CONTINUED_AS_NEW,
+        workflow_execution_continued_as_new_event_attributes=WorkflowExecutionContinuedAsNewEventAttributes(
+            new_execution_run_id=run_id),
+    )
+
+def completed(result) -> HistoryEvent:
+    payloads = DataConverter.default.payload_converter.to_payloads([result])
+    return HistoryEvent(
+        event_type=EventType.EVENT_TYPE_WORKFLOW_EXECUTION_COMPLETED,
+        workflow_execution_completed_event_attributes=WorkflowExecutionCompletedEventAttributes(
+            result=Payloads(payloads=payloads)),
+    )
+
+class FakeHandle:
+    def __init__(self, events: List[HistoryEvent]):
+        self.events = events
+
+    async def fetch_history_events(self, wait_new_event: bool = False):
+        for event in self.events:
+            await asyncio.sleep(0)
+            yield event
+
+class FakeClient:
+    """Histories by (workflow ID, run ID); a handle without a run ID follows the first run"""
+
+    data_converter = DataConverter.default
+
+    def __init__(self, histories: Dict[tuple, List[HistoryEvent]]):
+        self.histories = histories
+        self.handles: List[tuple] = []
+
+    def get_workflow_handle(self, workflow_id: str, run_id: Optional[str] = None) -> FakeHandle:
+        self.handles.append((workflow_id, run_id))
+        return FakeHandle(self.histories[(workflow_id, run_id)])
+
+def hub_for(client: FakeClient, **sizes) -> WorkflowStatusHub:
+    async def client_factory():
+        return client
+    return WorkflowStatusHub(client_factory, **sizes)
+
+async def updates(hub: WorkflowStatusHub, workflow_id: str) -> List[dict]:
+    return [update async for update in hub.subscribe(workflow_id)]
+
+def test_batch_is_followed_across_continue_as_new():
+    client = FakeClient({
+        ("batch", None): [started(), continued("run-2")],
+        ("batch", "run-2"): [started(), completed({"total": 2})],
+    })
+    received = asyncio.run(updates(hub_for(client), "batch"))
+    assert [update["event"] for update in received] == ["started", "continued_as_new", "completed"]
+    assert received[1]["run_id"] == "run-2"
+    assert received[-1]["result"] == {"total": 2}
+    assert client.handles == [("batch", None), ("batch", "run-2")]
+
+def test_finished_workflows_are_replayed_from_the_lru():
+    client = FakeClient({
+        ("wf-1", None): [started(), completed("done 1")],
+        ("wf-2", None): [started(), completed("done 2")],
+    })
+    hub = hub_for(client, finished_cache_size=1)
+
+    async def run():
+        first = await updates(hub, "wf-1")
+        # Served from the cache: Temporal isn't asked again
+        assert await updates(hub, "wf-1") == first
+        assert len(client.handles) == 1
+        await updates(hub, "wf-2")
+        # wf-2 pushed wf-1 out; following it again watches its history, through the cached handle
+        assert await updates(hub, "wf-1") == first
+        assert hub.stats()["finished_cached"] == 1
+    asyncio.run(run())
+
+def test_subscribers_share_one_watch():
+    client = FakeClient({("wf-1", None): [started(), completed("done")]})
+    hub = hub_for(client)
+
+    async def run():
+        return await asyncio.gather(updates(hub, "wf-1"), updates(hub, "wf-1"))
+    first, second = asyncio.run(run())
+    assert first == second and first[-1]["result"] == "done"
+    assert len(client.handles) == 1
@@ -0,0 +1,122 @@
+import os
+import json
+import threading
+from typing import List, Optional, Sequence
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from structured_logging import get_logger
+
+# Shared by temporal_worker and py_client; keep both copies identical.
+
+DEFAULT_TRACING_FILE = "traces.jsonl"
+TRACING_EXPORTERS = ("none", "file", "otlp", "console")
+
+log = get_logger("tracing")
+
+_provider: Optional[TracerProvider] = None
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _to_record(span: ReadableSpan) -> dict:
+        context = span.get_span_context()
+        return {
+            "name": span.name,
+            "service": span.resource.attributes.get("service.name", ""),
+            "trace_id": format(context.trace_id, "032x"),
+            "span_id": format(context.span_id, "016x"),
+            "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+            "kind": span.kind.name,
+            "start_ns": span.start_time,
+            "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+            "status": span.status.status_code.name,
+            "attributes": dict(span.attributes or {}),
+        }
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(self._to_record(span), default=str) + "\n" for span in spans).encode()
+        try:
+            # One unbuffered append per batch, so processes sharing the file don't interleave lines
+            with self._lock, open(self.path, "ab", buffering=0) as f:
+                f.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+def _create_exporter(kind: str) -> Optional[SpanExporter]:
+    if kind == "file":
+        return JsonLinesSpanExporter(os.getenv("TRACING_FILE", DEFAULT_TRACING_FILE))
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "otlp":
+        try:
+            # Optional dependency; reads OTEL_EXPORTER_OTLP_ENDPOINT like any OTLP exporter
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            log.warning("TRACING_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http; tracing is off",
+                        event="tracing.exporter_missing")
+            return None
+        return OTLPSpanExporter()
+    return None
+
+def configure_tracing(service: str) -> bool:
+    """
+    Installs a global tracer provider from the environment; returns whether tracing is on:
+      TRACING_EXPORTER      none (default), file, otlp or console
+      TRACING_FILE          file exporter path (default traces.jsonl), one JSON span per line
+      TRACING_SAMPLE_RATIO  fraction of new traces recorded (default 1.0); child spans follow their parent
+    """
+    global _provider
+    if _provider is not None:
+        return True
+    kind = os.getenv("TRACING_EXPORTER", "none").lower()
+    if kind not in TRACING_EXPORTERS:
+        raise ValueError(f"unknown TRACING_EXPORTER '{kind}', expected one of {', '.join(TRACING_EXPORTERS)}")
+    exporter = _create_exporter(kind)
+    if exporter is None:
+        return False
+    ratio = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    provider = TracerProvider(resource=Resource.create({"service.name": service}),
+                              sampler=ParentBased(TraceIdRatioBased(ratio)))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    log.info("Tracing enabled", event="tracing.configured", exporter=kind, sample_ratio=ratio)
+    return True
+
+def tracing_enabled() -> bool:
+    return _provider is not None
+
+def tracing_interceptors() -> List:
+    """Temporal client/worker interceptors that create spans and carry trace context in Temporal headers."""
+    if _provider is None:
+        return []
+    from temporalio.contrib.opentelemetry import TracingInterceptor
+    return [TracingInterceptor()]
+
+def get_tracer(name: str) -> trace.Tracer:
+    """Tracer for `name`; a no-op until configure_tracing enables tracing."""
+    return trace.get_tracer(name)
+
+def shutdown_tracing() -> None:
+    """Flushes and stops span export."""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
@@ -0,0 +1,256 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from temporalio.api.enums.v1 import EventType
+from temporalio.api.history.v1 import HistoryEvent
+from temporalio.client import Client, WorkflowHandle
+from temporalio.service import RPCError, RPCStatusCode
+
+from client import get_client_pool
+from structured_logging import get_logger
+
+DEFAULT_HANDLE_CACHE_SIZE = 10000 # workflow handles kept for reuse
+DEFAULT_FINISHED_CACHE_SIZE = 10000 # finished workflows whose updates are replayed without asking Temporal
+LOCAL_ACTIVITY_MARKER = "core_local_activity"
+# With BANKING_ACTIVITY_MODE=actor a step only sends the operation; its outcome is the
+# account's `account_result` signal, reported under the step's usual name
+ACCOUNT_SEND_ACTIVITY = "send_account_operation"
+ACCOUNT_RESULT_SIGNAL = "account_result"
+ACCOUNT_OPERATION_STEPS = {"debit": "withdraw", "credit": "deposit", "refund": "refund"}
+
+TERMINAL_EVENTS = {
+    EventType.EVENT_TYPE_WORKFLOW_EXECUTION_COMPLETED: "completed",
+    EventType.EVENT_TYPE_WORKFLOW_EXECUTION_FAILED: "failed",
+    EventType.EVENT_TYPE_WORKFLOW_EXECUTION_TIMED_OUT: "timed_out",
+    EventType.EVENT_TYPE_WORKFLOW_EXECUTION_TERMINATED: "terminated",
+    EventType.EVENT_TYPE_WORKFLOW_EXECUTION_CANCELED: "canceled",
+}
+
+log = get_logger("workflow_status")
+
+class _LRU(OrderedDict):
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def get_fresh(self, key) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> None:
+        self[key] = value
+        self.move_to_end(key)
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+
+class _Watch:
+    """One long-poll on a workflow's history, shared by every subscriber of that workflow."""
+
+    def __init__(self, workflow_id: str):
+        self.workflow_id = workflow_id
+        self.updates: List[Dict[str, Any]] = [] # replayed to late subscribers
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.finished = False
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, update: Dict[str, Any]) -> None:
+        self.updates.append(update)
+        for queue in self.subscribers:
+            queue.put_nowait(update)
+
+class WorkflowStatusHub:
+    """
+    Streams progress updates of transfer workflows to any number of subscribers.
+
+    The first subscriber of a workflow starts a single history long-poll
+    (fetch_history_events with wait_new_event) that turns history events into
+    updates: started, withdraw/deposit completed or failed, and a terminal update
+    with the workflow's result. Later subscribers get the updates so far, then
+    share the same poll, which stops when the workflow finishes or the last
+    subscriber leaves. Updates of finished workflows are kept in an LRU, so
+    following a finished transfer costs Temporal nothing.
+    """
+
+    def __init__(self, client_factory, handle_cache_size: int = DEFAULT_HANDLE_CACHE_SIZE,
+                 finished_cache_size: int = DEFAULT_FINISHED_CACHE_SIZE):
+        self._client_factory = client_factory # async () -> Client
+        self._handles = _LRU(handle_cache_size)
+        self._finished = _LRU(finished_cache_size)
+        self._watches: Dict[str, _Watch] = {}
+
+    async def _handle(self, workflow_id: str) -> Tuple[Client, WorkflowHandle]:
+        cached = self._handles.get_fresh(workflow_id)
+        if cached is None:
+            client: Client = await self._client_factory()
+            cached = (client, client.get_workflow_handle(workflow_id))
+            self._handles.put(workflow_id, cached)
+        return cached
+
+    async def _decode(self, client: Client, payloads) -> Any:
+        if not payloads:
+            return None
+        values = await client.data_converter.decode(payloads)
+        return values[0] if values else None
+
+    async def _to_update(self, client: Client, event: HistoryEvent, activity_types: Dict[int, str]) -> Optional[Dict[str, Any]]:
+        kind = event.event_type
+        if kind == EventType.EVENT_TYPE_WORKFLOW_EXECUTION_STARTED:
+            return {"event": "started"}
+        if kind == EventType.EVENT_TYPE_ACTIVITY_TASK_SCHEDULED:
+            activity_types[event.event_id] = event.activity_task_scheduled_event_attributes.activity_type.name
+            return None
+        if kind == EventType.EVENT_TYPE_ACTIVITY_TASK_COMPLETED:
+            attributes = event.activity_task_completed_event_attributes
+            activity_type = activity_types.get(attributes.scheduled_event_id, "activity")
+            return {"event": f"{activity_type}_completed", "result": await self._decode(client, attributes.result.payloads)}
+        if kind in (EventType.EVENT_TYPE_ACTIVITY_TASK_FAILED, EventType.EVENT_TYPE_ACTIVITY_TASK_TIMED_OUT):
+            attributes = event.activity_task_failed_event_attributes if kind == EventType.EVENT_TYPE_ACTIVITY_TASK_FAILED \
+                else event.activity_task_timed_out_event_attributes
+            activity_type = activity_types.get(attributes.scheduled_event_id, "activity")
+            return {"event": f"{activity_type}_failed", "error": attributes.failure.message}
+        if kind == EventType.EVENT_TYPE_MARKER_RECORDED:
+            # Local activities are recorded as markers rather than activity events
+            attributes = event.marker_recorded_event_attributes
+            if attributes.marker_name != LOCAL_ACTIVITY_MARKER or "data" not in attributes.details:
+                return None
+            data = json.loads(attributes.details["data"].payloads[0].data)
+            activity_type = data.get("activity_type", "activity")
+            if activity_type == ACCOUNT_SEND_ACTIVITY and not attributes.HasField("failure"):
+                return None
+            if attributes.HasField("failure"):
+                return {"event": f"{activity_type}_failed", "error": attributes.failure.message}
+            result = attributes.details["result"].payloads if "result" in attributes.details else None
+            return {"event": f"{activity_type}_completed", "result": await self._decode(client, result)}
+        if kind == EventType.EVENT_TYPE_WORKFLOW_EXECUTION_SIGNALED:
+            attributes = event.workflow_execution_signaled_event_attributes
+            if attributes.signal_name != ACCOUNT_RESULT_SIGNAL:
+                return None
+            result = await self._decode(client, attributes.input.payloads)
+            # Operation IDs are "<run ID>-<operation>", with an optional "-cancel"; run IDs are UUIDs
+            operation = result["operation_id"].split("-", 5)[-1].removesuffix("-cancel")
+            step = ACCOUNT_OPERATION_STEPS.get(operation)
+            if step is None:
+                return None
+            if result.get("cancelled"):
+                return {"event": f"{step}_failed", "error": result.get("message", "")}
+            return {"event": f"{step}_completed", "result": result}
+        if kind in TERMINAL_EVENTS:
+            update: Dict[str, Any] = {"event": TERMINAL_EVENTS[kind], "final": True}
+            if kind == EventType.EVENT_TYPE_WORKFLOW_EXECUTION_COMPLETED:
+                update["result"] = await self._decode(client, event.workflow_execution_completed_event_attributes.result.payloads)
+            elif kind == EventType.EVENT_TYPE_WORKFLOW_EXECUTION_FAILED:
+                update["error"] = event.workflow_execution_failed_event_attributes.failure.message
+            return update
+        return None
+
+    async def _run_watch(self, watch: _Watch) -> None:
+        activity_types: Dict[int, str] = {}
+        try:
+            client, handle = await self._handle(watch.workflow_id)
+            while True:
+                continued_run_id = None
+                async for event in handle.fetch_history_events(wait_new_event=True):
+                    if event.event_type == EventType.EVENT_TYPE_WORKFLOW_EXECUTION_CONTINUED_AS_NEW:
+                        # Batches continue as new; follow the next run
+                        continued_run_id = event.workflow_execution_continued_as_new_event_attributes.new_execution_run_id
+                        watch.publish({"event": "continued_as_new", "run_id": continued_run_id})
+                        break
+                    update = await self._to_update(client, event, activity_types)
+                    if update is not None and not (update["event"] == "started" and watch.updates):
+                        watch.publish(update)
+                        if update.get("final"):
+                            watch.finished = True
+                            self._finished.put(watch.workflow_id, watch.updates)
+                            return
+                if continued_run_id is None:
+                    return
+                handle = client.get_workflow_handle(watch.workflow_id, run_id=continued_run_id)
+                activity_types = {}
+        except RPCError as e:
+            watch.finished = True
+            message = "Workflow not found" if e.status == RPCStatusCode.NOT_FOUND else str(e)
+            watch.publish({"event": "error", "error": message, "final": True})
+            if e.status != RPCStatusCode.NOT_FOUND:
+                log.warning("Workflow status watch failed", event="status.watch_error", workflow_id=watch.workflow_id, error=str(e))
+        except Exception as e:
+            watch.finished = True
+            watch.publish({"event": "error", "error": str(e), "final": True})
+            log.exception("Workflow status watch failed", event="status.watch_error", workflow_id=watch.workflow_id)
+        finally:
+            if self._watches.get(watch.workflow_id) is watch:
+                del self._watches[watch.workflow_id]
+            for queue in watch.subscribers:
+                queue.put_nowait(None)
+
+    async def subscribe(self, workflow_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the workflow's updates so far and then new ones, ending after the final update."""
+        finished = self._finished.get_fresh(workflow_id)
+        if finished is not None:
+            for update in finished:
+                yield update
+            return
+
+        watch = self._watches.get(workflow_id)
+        if watch is None:
+            watch = self._watches[workflow_id] = _Watch(workflow_id)
+            watch.task = asyncio.create_task(self._run_watch(watch))
+        queue: asyncio.Queue = asyncio.Queue()
+        for update in watch.updates:
+            queue.put_nowait(update)
+        watch.subscribers.add(queue)
+        try:
+            while True:
+                update = await queue.get()
+                if update is None:
+                    return
+                yield update
+                if update.get("final"):
+                    return
+        finally:
+            watch.subscribers.discard(queue)
+            if not watch.subscribers and not watch.finished and watch.task is not None:
+                # Nobody is listening any more; a later subscriber starts a new watch
+                watch.task.cancel()
+                if self._watches.get(workflow_id) is watch:
+                    del self._watches[workflow_id]
+
+    async def result(self, workflow_id: str) -> Dict[str, Any]:
+        """Waits for the workflow's final update, sharing the watch with any streaming subscribers."""
+        final: Dict[str, Any] = {"event": "error", "error": "Status stream ended", "final": True}
+        async for update in self.subscribe(workflow_id):
+            if update.get("final"):
+                final = update
+        return final
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_watches": len(self._watches),
+            "subscribers": sum(len(watch.subscribers) for watch in self._watches.values()),
+            "cached_handles": len(self._handles),
+            "finished_cached": len(self._finished),
+        }
+
+    async def close(self) -> None:
+        tasks = [watch.task for watch in self._watches.values() if watch.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+_hub: Optional[WorkflowStatusHub] = None
+
+def get_status_hub() -> WorkflowStatusHub:
+    """Returns the process-wide hub, sized from WORKFLOW_HANDLE_CACHE_SIZE and WORKFLOW_STATUS_CACHE_SIZE."""
+    global _hub
+    if _hub is None:
+        _hub = WorkflowStatusHub(
+            client_factory=lambda: get_client_pool().get(),
+            handle_cache_size=int(os.getenv("WORKFLOW_HANDLE_CACHE_SIZE", str(DEFAULT_HANDLE_CACHE_SIZE))),
+            finished_cache_size=int(os.getenv("WORKFLOW_STATUS_CACHE_SIZE", str(DEFAULT_FINISHED_CACHE_SIZE))),
+        )
+    return _hub
@@ -0,0 +1,208 @@
+import os
+import queue
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Dict, Optional, TypeVar
+
+DEFAULT_ACCOUNT_STORE = "memory" # or "sqlite"
+DEFAULT_SQLITE_PATH = "accounts.db"
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MEMORY_LATENCY_MS = 100 # simulated database round trip for the demo store
+DEFAULT_OPENING_BALANCE = Decimal('1000.00') # accounts not seeded below start with this
+
+# Demo accounts every store is seeded with
+DEMO_BALANCES = {
+    "acc_001": Decimal('1000.00'),
+    "acc_002": Decimal('500.00'),
+    "acc_003": Decimal('2500.00'),
+    "acc_004": Decimal('750.00'),
+}
+
+T = TypeVar("T")
+
+@dataclass
+class BalanceUpdate:
+    """Outcome of a conditional balance update; `balance` is the balance after it (or the current one if refused)"""
+    success: bool
+    balance: Decimal
+
+class AccountStore(ABC):
+    """
+    Account balances. Every update is a single atomic round trip to the store:
+    a withdrawal checks the balance and debits it in one step, so concurrent
+    transfers on the same account can neither overdraw it nor lose an update.
+    """
+
+    @abstractmethod
+    async def get_balance(self, account_id: str) -> Decimal:
+        ...
+
+    @abstractmethod
+    async def withdraw(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        """Debits `amount` only if the balance covers it."""
+
+    @abstractmethod
+    async def deposit(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        ...
+
+    def check_amount(self, amount: Decimal) -> None:
+        """Raises ValueError for an amount the store can't hold."""
+
+    async def close(self) -> None:
+        pass
+
+class InMemoryAccountStore(AccountStore):
+    """Process-local balances for demos. Updates never await between the check and the write, so they are atomic."""
+
+    def __init__(self, balances: Optional[Dict[str, Decimal]] = None, latency_ms: float = DEFAULT_MEMORY_LATENCY_MS):
+        self._balances = dict(DEMO_BALANCES if balances is None else balances)
+        self.latency = latency_ms / 1000
+
+    async def _round_trip(self) -> None:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    async def get_balance(self, account_id: str) -> Decimal:
+        await self._round_trip()
+        return self._balances.get(account_id, DEFAULT_OPENING_BALANCE)
+
+    async def withdraw(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        await self._round_trip()
+        balance = self._balances.get(account_id, DEFAULT_OPENING_BALANCE)
+        if balance < amount:
+            return BalanceUpdate(success=False, balance=balance)
+        self._balances[account_id] = balance - amount
+        return BalanceUpdate(success=True, balance=balance - amount)
+
+    async def deposit(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        await self._round_trip()
+        balance = self._balances.get(account_id, DEFAULT_OPENING_BALANCE) + amount
+        self._balances[account_id] = balance
+        return BalanceUpdate(success=True, balance=balance)
+
+def _to_cents(amount: Decimal) -> int:
+    cents = amount * 100
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Amount {amount} has fractions of a cent")
+    return int(cents)
+
+def _from_cents(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+class SQLiteAccountStore(AccountStore):
+    """
+    Balances in SQLite, stored as integer cents. Queries run on a thread pool with
+    one pooled connection per thread, so the event loop never blocks on the database.
+
+    Stand-in for a networked database: each operation is one executor hop and one
+    transaction, and the conditional UPDATE ... RETURNING does the check and the write together.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, pool_size: int = DEFAULT_POOL_SIZE,
+                 balances: Optional[Dict[str, Decimal]] = None):
+        self.path = path
+        self.pool_size = max(1, pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="account-store")
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(self.pool_size):
+            self._pool.put(self._connect())
+        self._call(lambda conn: self._create_schema(conn, DEMO_BALANCES if balances is None else balances))
+
+    def check_amount(self, amount: Decimal) -> None:
+        _to_cents(amount)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection, balances: Dict[str, Decimal]) -> None:
+        conn.execute("CREATE TABLE IF NOT EXISTS accounts (account_id TEXT PRIMARY KEY, balance_cents INTEGER NOT NULL)")
+        conn.executemany("INSERT OR IGNORE INTO accounts (account_id, balance_cents) VALUES (?, ?)",
+                         [(account_id, _to_cents(balance)) for account_id, balance in balances.items()])
+
+    def _call(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Runs fn in one transaction on a pooled connection."""
+        conn = self._pool.get()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        finally:
+            self._pool.put(conn)
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn)
+
+    @staticmethod
+    def _ensure_account(conn: sqlite3.Connection, account_id: str) -> None:
+        conn.execute("INSERT OR IGNORE INTO accounts (account_id, balance_cents) VALUES (?, ?)",
+                     (account_id, _to_cents(DEFAULT_OPENING_BALANCE)))
+
+    async def get_balance(self, account_id: str) -> Decimal:
+        def query(conn: sqlite3.Connection) -> int:
+            row = conn.execute("SELECT balance_cents FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+            return row[0] if row else _to_cents(DEFAULT_OPENING_BALANCE)
+        return _from_cents(await self._run(query))
+
+    async def withdraw(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        cents = _to_cents(amount)
+
+        def update(conn: sqlite3.Connection) -> BalanceUpdate:
+            self._ensure_account(conn, account_id)
+            row = conn.execute(
+                "UPDATE accounts SET balance_cents = balance_cents - ? "
+                "WHERE account_id = ? AND balance_cents >= ? RETURNING balance_cents",
+                (cents, account_id, cents)).fetchone()
+            if row:
+                return BalanceUpdate(success=True, balance=_from_cents(row[0]))
+            # Refused: report the balance that was too low, read in the same transaction
+            row = conn.execute("SELECT balance_cents FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+            return BalanceUpdate(success=False, balance=_from_cents(row[0]))
+        return await self._run(update)
+
+    async def deposit(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        cents = _to_cents(amount)
+
+        def update(conn: sqlite3.Connection) -> BalanceUpdate:
+            self._ensure_account(conn, account_id)
+            row = conn.execute(
+                "UPDATE accounts SET balance_cents = balance_cents + ? WHERE account_id = ? RETURNING balance_cents",
+                (cents, account_id)).fetchone()
+            return BalanceUpdate(success=True, balance=_from_cents(row[0]))
+        return await self._run(update)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+def create_account_store() -> AccountStore:
+    """
+    Builds the account store selected by the environment:
+      ACCOUNT_STORE                memory (default) or sqlite
+      ACCOUNT_STORE_PATH           SQLite database file (default accounts.db)
+      ACCOUNT_STORE_POOL_SIZE      SQLite connections / threads (default 4)
+      ACCOUNT_STORE_LATENCY_MS     simulated round trip of the memory store (default 100)
+    """
+    kind = os.getenv("ACCOUNT_STORE", DEFAULT_ACCOUNT_STORE).lower()
+    if kind == "sqlite":
+        return SQLiteAccountStore(
+            path=os.getenv("ACCOUNT_STORE_PATH", DEFAULT_SQLITE_PATH),
+            pool_size=int(os.getenv("ACCOUNT_STORE_POOL_SIZE", str(DEFAULT_POOL_SIZE))),
+        )
+    if kind == "memory":
+        return InMemoryAccountStore(latency_ms=float(os.getenv("ACCOUNT_STORE_LATENCY_MS", str(DEFAULT_MEMORY_LATENCY_MS))))
+    raise ValueError(f"Unknown ACCOUNT_STORE '{kind}', expected 'memory' or 'sqlite'")
@@ -1,11 +1,39 @@
+import os
 import uuid
+import json
 import asyncio
+import itertools
 from decimal import Decimal
+from typing import Awaitable, Callable, List, Optional
 from temporalio import activity
-from models import WithdrawRequest, WithdrawResponse, DepositRequest, DepositResponse
+from temporalio.client import Client
+from opentelemetry import trace
+from models import (
+    WithdrawRequest, WithdrawResponse, DepositRequest, DepositResponse, PaymentDetails, TransferPageRequest,
+    AccountOperation, AccountState,
+)
+from account_store import AccountStore
+from ledger import create_ledger
+
+# Must match the client's main_ui.py
+ACCOUNT_WORKFLOW_ID_PREFIX = "account-"
+DEFAULT_OPERATIONS_PER_RUN = 1000 # operations an AccountWorkflow applies before continuing as new
+
+# transfers_ref files are resolved under this directory; anything outside it is rejected
+DEFAULT_BATCH_TRANSFERS_DIR = "/app/batches"
+
+def account_workflow_id(account_id: str) -> str:
+    return f"{ACCOUNT_WORKFLOW_ID_PREFIX}{account_id}"
+
+# Spans nest under the RunActivity span started by the tracing interceptor; no-ops when tracing is off
+tracer = trace.get_tracer("activities")
 
 class BankingActivities:
     """Banking activities implementation"""
+
+    def __init__(self, store: Optional[AccountStore] = None):
+        # Default: the store from ACCOUNT_STORE, wrapped as configured by create_ledger
+        self.store = store if store is not None else create_ledger()
     
     @activity.defn
     async def withdraw(self, request: WithdrawRequest) -> WithdrawResponse:
@@ -13,38 +41,35 @@ class BankingActivities:
         activity.logger.info(f"Processing withdrawal: {request.account_id}, amount: {request.amount}")
         
         try:
-            # Simulate account balance check
-            current_balance = await self._get_account_balance(request.account_id)
+            # Simulate withdrawal processing time
+            with tracer.start_as_current_span("withdraw.processing"):
+                await asyncio.sleep(0.5)
             
-            if current_balance < Decimal(request.amount):
+            # Check the balance and debit it in one atomic update
+            with tracer.start_as_current_span("withdraw.balance_update", attributes={"account.id": request.account_id}) as span:
+                update = await self.store.withdraw(request.account_id, Decimal(request.amount))
+                span.set_attribute("withdraw.success", update.success)
+            
+            if not update.success:
                 return WithdrawResponse(
                     transaction_id="",
                     account_id=request.account_id,
                     amount=request.amount,
-                    balance_after=str(current_balance),
+                    balance_after=str(update.balance),
                     success=False,
                     message="Insufficient funds"
                 )
             
-            # Simulate withdrawal processing time
-            await asyncio.sleep(0.5)
-            
             # Generate transaction ID
             transaction_id = str(uuid.uuid4())
             
-            # Calculate new balance
-            new_balance = current_balance - Decimal(request.amount)
-            
-            # Simulate updating account balance
-            await self._update_account_balance(request.account_id, new_balance)
-            
             activity.logger.info(f"Withdrawal successful: {transaction_id}")
             
             return WithdrawResponse(
                 transaction_id=transaction_id,
                 account_id=request.account_id,
                 amount=request.amount,
-                balance_after=str(new_balance),
+                balance_after=str(update.balance),
                 success=True,
                 message="Withdrawal successful"
             )
@@ -66,28 +91,24 @@ class BankingActivities:
         activity.logger.info(f"Processing deposit: {request.account_id}, amount: {request.amount}")
         
         try:
-            # Get current balance
-            current_balance = await self._get_account_balance(request.account_id)
-            
             # Simulate deposit processing time
-            await asyncio.sleep(0.3)
+            with tracer.start_as_current_span("deposit.processing"):
+                await asyncio.sleep(0.3)
+            
+            # Credit the account in one atomic update
+            with tracer.start_as_current_span("deposit.balance_update", attributes={"account.id": request.account_id}):
+                update = await self.store.deposit(request.account_id, Decimal(request.amount))
             
             # Generate transaction ID
             transaction_id = str(uuid.uuid4())
             
-            # Calculate new balance
-            new_balance = current_balance + Decimal(request.amount)
-            
-            # Simulate updating account balance
-            await self._update_account_balance(request.account_id, new_balance)
-            
             activity.logger.info(f"Deposit successful: {transaction_id}")
             
             return DepositResponse(
                 transaction_id=transaction_id,
                 account_id=request.account_id,
                 amount=request.amount,
-                balance_after=str(new_balance),
+                balance_after=str(update.balance),
                 success=True,
                 message="Deposit successful"
             )
@@ -102,27 +123,56 @@ class BankingActivities:
                 success=False,
                 message=f"Deposit failed: {str(e)}"
             )
-    
-    async def _get_account_balance(self, account_id: str) -> Decimal:
-        """Simulate getting account balance from database"""
-        # In real implementation, this would query actual database
-        # For demo purposes, return mock balances
-        mock_balances = {
-            "acc_001": Decimal('1000.00'),
-            "acc_002": Decimal('500.00'),
-            "acc_003": Decimal('2500.00'),
-            "acc_004": Decimal('750.00')
-        }
-        
-        # Simulate database query delay
-        await asyncio.sleep(0.1)
-        
-        return mock_balances.get(account_id, Decimal('1000.00'))
-    
-    async def _update_account_balance(self, account_id: str, new_balance: Decimal):
-        """Simulate updating account balance in database"""
-        # In real implementation, this would update actual database
-        activity.logger.info(f"Updated balance for {account_id}: {new_balance}")
-        
-        # Simulate database update delay
-        await asyncio.sleep(0.1)
\ No newline at end of file
+
+    @activity.defn
+    async def load_balance(self, account_id: str) -> str:
+        """Reads an account's balance, to seed its AccountWorkflow"""
+        return str(await self.store.get_balance(account_id))
+
+class AccountActorActivities:
+    """Sends debits and credits to AccountWorkflows"""
+
+    def __init__(self, client_factory: Callable[[], Awaitable[Client]], task_queue: str,
+                 operations_per_run: int = DEFAULT_OPERATIONS_PER_RUN):
+        self.client_factory = client_factory
+        # Account workflows serve every sandbox, so they run on the baseline task queue without baggage
+        self.task_queue = task_queue
+        self.operations_per_run = operations_per_run # for account workflows started from here
+
+    @activity.defn
+    async def send_account_operation(self, operation: AccountOperation) -> None:
+        """Signals the operation to the account's workflow, starting the workflow if it isn't running"""
+        client = await self.client_factory()
+        await client.start_workflow(
+            "AccountWorkflow",
+            AccountState(account_id=operation.account_id, operations_per_run=self.operations_per_run),
+            id=account_workflow_id(operation.account_id),
+            task_queue=self.task_queue,
+            start_signal="apply",
+            start_signal_args=[operation],
+        )
+
+def resolve_transfers_ref(transfers_ref: str) -> str:
+    """Path of a batch's transfers file; ValueError unless it is inside BATCH_TRANSFERS_DIR"""
+    base = os.path.realpath(os.getenv("BATCH_TRANSFERS_DIR", DEFAULT_BATCH_TRANSFERS_DIR))
+    path = os.path.realpath(os.path.join(base, transfers_ref))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError(f"transfers_ref '{transfers_ref}' is outside BATCH_TRANSFERS_DIR")
+    return path
+
+def _read_transfer_page(transfers_ref: str, offset: int, limit: int) -> List[PaymentDetails]:
+    # NDJSON only: earlier lines are skipped without being parsed, so a page costs one
+    # scan to its offset instead of parsing the whole file
+    with open(resolve_transfers_ref(transfers_ref)) as f:
+        lines = (line for line in f if line.strip())
+        try:
+            items = [json.loads(line) for line in itertools.islice(lines, offset, offset + limit)]
+        except json.JSONDecodeError as e:
+            # ValueError is not retried; JSONDecodeError would be matched by its own name
+            raise ValueError(f"transfers_ref '{transfers_ref}' is not NDJSON: {e}") from e
+    return [PaymentDetails(**item) for item in items]
+
+@activity.defn
+async def load_transfer_page(request: TransferPageRequest) -> List[PaymentDetails]:
+    """Reads one page of a batch's transfers from its transfers_ref file"""
+    return await asyncio.to_thread(_read_transfer_page, request.transfers_ref, request.offset, request.limit)
@@ -0,0 +1,33 @@
+from functools import lru_cache
+from typing import Optional, Union
+from urllib.parse import unquote_plus
+
+# Shared by temporal_worker and py_client; keep both copies identical.
+
+ROUTING_KEY = "sd-routing-key"
+ROUTING_KEY_CACHE_SIZE = 4096
+MAX_BAGGAGE_LENGTH = 8192 # W3C baggage limit; longer headers are ignored, as OpenTelemetry does
+
+@lru_cache(maxsize=ROUTING_KEY_CACHE_SIZE)
+def extract_routing_key(baggage_header: Union[str, bytes, None]) -> Optional[str]:
+    """
+    Returns the sd-routing-key member of a W3C baggage header, or None.
+
+    Only the routing key is parsed out, without building an OpenTelemetry
+    Context. Results are memoized on the raw header (str or the bytes of a
+    Temporal header payload), since the same baggage strings repeat constantly.
+    """
+    if not baggage_header or len(baggage_header) > MAX_BAGGAGE_LENGTH:
+        return None
+    if isinstance(baggage_header, bytes):
+        baggage_header = baggage_header.decode('utf-8', errors='replace')
+    if ROUTING_KEY not in baggage_header:
+        return None
+
+    routing_key = None
+    for member in baggage_header.split(','):
+        name, separator, value = member.partition('=')
+        if separator and unquote_plus(name.strip(" \t")) == ROUTING_KEY:
+            # Drop member properties (";key=value") and keep the last occurrence, like the OTel propagator
+            routing_key = unquote_plus(value.split(';', 1)[0].strip(" \t")) or None
+    return routing_key
@@ -0,0 +1,140 @@
+"""
+Hot-account transfer throughput with withdraw/deposit activities and with account workflows.
+
+Boots a local Temporal dev server and a stub route server, then for each mode
+runs the worker from main.build_worker (BANKING_ACTIVITY_MODE=<mode>) on its own
+task queue and drives transfers that all draw from a few hot accounts. In
+"remote" mode each step is an activity that updates the account store; in
+"actor" mode each step is a signal to the account's AccountWorkflow, which
+applies the operations on one account one at a time.
+
+Reports throughput and latency per mode. For actor mode it also queries each
+hot account's workflow and checks its balance against the completed transfers.
+The actor steps skip the activities' simulated processing time, and actor mode
+reads the store (ACCOUNT_STORE_LATENCY_MS) only once per account, so compare
+modes under the store latency you expect in production.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.account_actor --transfers 1000 --hot-accounts 1 --output account_actor.json
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from temporalio.testing import WorkflowEnvironment
+
+from account_store import DEFAULT_OPENING_BALANCE
+from activities import DEFAULT_OPERATIONS_PER_RUN, account_workflow_id
+from main import build_worker
+from models import PaymentDetails
+from payload_codec import data_converter_from_env
+
+from benchmarks.harness import build_report, latency_summary, wait_for_routes, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+AMOUNT = Decimal("0.01")
+
+async def measure_mode(env: WorkflowEnvironment, route_server: StubRouteServer, mode: str, args) -> dict:
+    # Read by build_worker
+    os.environ["BANKING_ACTIVITY_MODE"] = mode
+    os.environ["TASK_QUEUE"] = task_queue = f"bench-account-actor-{mode}-{uuid.uuid4()}"
+    # Fresh accounts per mode, so each starts from the opening balance
+    run_id = uuid.uuid4().hex[:8]
+    hot_accounts = [f"hot-{run_id}-{index}" for index in range(args.hot_accounts)]
+    destinations = [f"dest-{run_id}-{index}" for index in range(args.destinations)]
+
+    worker = build_worker(sandbox_name="", client=env.client, route_server_addr=route_server.address)
+    worker_task = asyncio.create_task(worker.run())
+    try:
+        await wait_for_routes([worker])
+        in_flight = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        debited: Counter = Counter()
+        outcomes: Counter = Counter()
+
+        async def drive_one(index: int) -> None:
+            source = hot_accounts[index % len(hot_accounts)]
+            payment = PaymentDetails(from_account=source, to_account=destinations[index % len(destinations)],
+                                     amount=str(AMOUNT), reference=f"bench-actor-{index}")
+            async with in_flight:
+                started = time.perf_counter()
+                result = await env.client.execute_workflow(
+                    "MoneyTransferWorkflow", payment, id=f"bench-actor-{mode}-{index}-{uuid.uuid4()}",
+                    task_queue=task_queue, result_type=str,
+                )
+                latencies.append(time.perf_counter() - started)
+            if result.startswith("Transfer complete"):
+                outcomes["completed"] += 1
+                debited[source] += 1
+            elif result.startswith("Transfer partially failed"):
+                # The debit went through even though the credit didn't
+                outcomes["partially_failed"] += 1
+                debited[source] += 1
+            else:
+                outcomes["failed"] += 1
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(drive_one(index) for index in range(args.transfers)))
+        wall_seconds = time.perf_counter() - wall_started
+
+        balances = {}
+        if mode == "actor":
+            for account in hot_accounts:
+                balance = await env.client.get_workflow_handle(account_workflow_id(account)).query("balance")
+                expected = DEFAULT_OPENING_BALANCE - AMOUNT * debited[account]
+                balances[account] = {"balance": balance, "expected": str(expected),
+                                     "consistent": Decimal(balance) == expected}
+    finally:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+
+    return {
+        **{outcome: outcomes[outcome] for outcome in ("completed", "partially_failed", "failed")},
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(args.transfers / wall_seconds, 1),
+        "latency_ms": latency_summary(latencies),
+        "hot_account_balances": balances,
+    }
+
+async def run_benchmark(args) -> dict:
+    route_server = StubRouteServer()
+    await route_server.start()
+    results = {}
+    try:
+        async with await WorkflowEnvironment.start_local(data_converter=data_converter_from_env()) as env:
+            for mode in args.modes:
+                results[mode] = await measure_mode(env, route_server, mode, args)
+    finally:
+        await route_server.stop()
+    return build_report("account_actor", {
+        "transfers": args.transfers,
+        "concurrency": args.concurrency,
+        "hot_accounts": args.hot_accounts,
+        "destinations": args.destinations,
+        "modes": args.modes,
+        "store_latency_ms": float(os.environ["ACCOUNT_STORE_LATENCY_MS"]),
+        "operations_per_run": int(os.getenv("ACCOUNT_ACTOR_OPERATIONS_PER_RUN", str(DEFAULT_OPERATIONS_PER_RUN))),
+    }, results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transfers", type=int, default=1000, help="Transfers per mode")
+    parser.add_argument("--concurrency", type=int, default=100, help="Transfers in flight at once")
+    parser.add_argument("--hot-accounts", type=int, default=1, help="Source accounts every transfer draws from")
+    parser.add_argument("--destinations", type=int, default=20, help="Accounts the transfers pay into")
+    parser.add_argument("--modes", nargs="+", choices=["remote", "actor"], default=["remote", "actor"])
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("ACCOUNT_STORE_LATENCY_MS", "5")
+    os.environ.pop("ROUTES_API_SNAPSHOT_PATH", None)
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compares remote and local activity execution of MoneyTransferWorkflow.
+
+Boots a local Temporal dev server and a stub route server, then for each mode
+runs a SandboxAwareWorker on its own task queue and drives transfers through it.
+Reports end-to-end latency and, from each workflow's history, the server round
+trips it took: workflow tasks plus activity tasks, each one a poll and a
+completion. Local activities show up as markers instead of activity tasks.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.activity_modes --workflows 200 --output activity_modes.json
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter
+
+from temporalio.api.enums.v1 import EventType
+from temporalio.testing import WorkflowEnvironment
+
+from activities import BankingActivities
+from models import PaymentDetails
+from platform_sdk import SandboxAwareWorker
+from workflows import LocalActivityMoneyTransferWorkflow, MoneyTransferWorkflow
+
+from benchmarks.harness import build_report, latency_summary, wait_for_routes, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+MODES = {
+    "remote": MoneyTransferWorkflow,
+    "local": LocalActivityMoneyTransferWorkflow,
+}
+
+async def measure_mode(env: WorkflowEnvironment, route_server: StubRouteServer, mode: str, args) -> dict:
+    task_queue = f"bench-activity-modes-{mode}-{uuid.uuid4()}"
+    banking_activities = BankingActivities()
+    worker = SandboxAwareWorker(
+        task_queue=task_queue,
+        workflows=[MODES[mode]],
+        activities=[banking_activities.withdraw, banking_activities.deposit],
+        sandbox_name="",
+        client=env.client,
+        route_server_addr=route_server.address,
+    )
+    worker_task = asyncio.create_task(worker.run())
+    try:
+        await wait_for_routes([worker])
+        in_flight = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        events: Counter = Counter()
+        completed = 0
+
+        async def drive_one(index: int) -> None:
+            nonlocal completed
+            payment = PaymentDetails(from_account="acc_001", to_account="acc_003", amount="1.00",
+                                     reference=f"bench-{mode}-{index}")
+            async with in_flight:
+                started = time.perf_counter()
+                handle = await env.client.start_workflow(
+                    MoneyTransferWorkflow.run, payment, id=f"bench-{mode}-{index}-{uuid.uuid4()}", task_queue=task_queue,
+                )
+                result = await handle.result()
+                latencies.append(time.perf_counter() - started)
+            if result and result.startswith("Transfer complete"):
+                completed += 1
+            async for event in handle.fetch_history_events():
+                events[EventType.Name(event.event_type)] += 1
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(drive_one(index) for index in range(args.workflows)))
+        wall_seconds = time.perf_counter() - wall_started
+    finally:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+
+    workflow_tasks = events["EVENT_TYPE_WORKFLOW_TASK_COMPLETED"]
+    activity_tasks = events["EVENT_TYPE_ACTIVITY_TASK_STARTED"]
+    return {
+        "completed": completed,
+        "wall_seconds": round(wall_seconds, 3),
+        "latency_ms": latency_summary(latencies),
+        "per_workflow": {
+            "history_events": round(sum(events.values()) / args.workflows, 2),
+            "workflow_tasks": round(workflow_tasks / args.workflows, 2),
+            "activity_tasks": round(activity_tasks / args.workflows, 2),
+            "local_activity_markers": round(events["EVENT_TYPE_MARKER_RECORDED"] / args.workflows, 2),
+            "server_round_trips": round((workflow_tasks + activity_tasks) / args.workflows, 2),
+        },
+    }
+
+async def run_benchmark(args) -> dict:
+    route_server = StubRouteServer()
+    await route_server.start()
+    results = {}
+    try:
+        async with await WorkflowEnvironment.start_local() as env:
+            for mode in args.modes:
+                results[mode] = await measure_mode(env, route_server, mode, args)
+    finally:
+        await route_server.stop()
+    return build_report("activity_modes", {
+        "workflows": args.workflows,
+        "concurrency": args.concurrency,
+        "modes": args.modes,
+    }, results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, default=100, help="Workflows per mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="Workflows in flight at once")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    os.environ.setdefault("METRICS_PORT", "0")
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
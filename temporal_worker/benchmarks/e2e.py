@@ -0,0 +1,210 @@
+"""
+End-to-end throughput and latency benchmark for SandboxAwareWorker.
+
+Boots a local Temporal dev server and a stub route server, runs one baseline
+worker plus one worker per sandbox in the mix on a shared task queue, and drives
+MoneyTransferWorkflow executions with the configured routing-key mix.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.e2e --workflows 500 --mix baseline=0.6,sandbox-a=0.2,sandbox-b=0.2 --output e2e.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Optional, Set
+
+from temporalio import activity
+from temporalio.client import Client, WorkflowFailureError
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Interceptor
+from temporalio.worker._interceptor import ActivityInboundInterceptor, ExecuteActivityInput
+
+from activities import BankingActivities
+from models import PaymentDetails
+from platform_sdk import SandboxAwareWorker
+from workflows import MoneyTransferWorkflow
+
+from benchmarks.harness import (
+    BaggageClientInterceptor, build_report, latency_summary, parse_mix, wait_for_routes, with_baggage, write_report,
+)
+from benchmarks.stub_route_server import StubRouteServer
+
+BASELINE = "baseline"
+
+class ExecutionRecorder(Interceptor):
+    """Records which worker executed activities for each workflow."""
+
+    def __init__(self, label: str, executions: Dict[str, Set[str]]):
+        self.label = label
+        self.executions = executions
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        recorder = self
+
+        class _Inbound(ActivityInboundInterceptor):
+            async def execute_activity(self, input: ExecuteActivityInput):
+                recorder.executions[activity.info().workflow_id].add(recorder.label)
+                return await self.next.execute_activity(input)
+
+        return _Inbound(next)
+
+class RoutingStats:
+    """Wraps a RoutesAPIClient.should_process to count decisions and time spent deciding."""
+
+    def __init__(self):
+        self.processed = 0
+        self.skipped = 0
+        self.decision_seconds = 0.0
+
+    def instrument(self, routes_client) -> None:
+        original = routes_client.should_process
+
+        async def should_process(routing_key: Optional[str]) -> bool:
+            started = time.perf_counter()
+            decision = await original(routing_key)
+            self.decision_seconds += time.perf_counter() - started
+            if decision:
+                self.processed += 1
+            else:
+                self.skipped += 1
+            return decision
+
+        routes_client.should_process = should_process
+
+    def as_dict(self) -> dict:
+        decisions = self.processed + self.skipped
+        return {
+            "decisions": decisions,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "mean_decision_us": round(self.decision_seconds / decisions * 1e6, 3) if decisions else 0.0,
+        }
+
+async def run_benchmark(args) -> dict:
+    mix = parse_mix(args.mix)
+    sandboxes = [name for name in mix if name != BASELINE]
+    rng = random.Random(args.seed)
+    task_queue = f"bench-money-transfer-{uuid.uuid4()}"
+
+    route_server = StubRouteServer()
+    await route_server.start()
+    for sandbox in sandboxes:
+        route_server.set_rule(f"{sandbox}-key", sandbox)
+
+    executions: Dict[str, Set[str]] = defaultdict(set)
+    routing_stats = RoutingStats()
+
+    async with await WorkflowEnvironment.start_local() as env:
+        workers = []
+        for label in [BASELINE] + sandboxes:
+            banking_activities = BankingActivities()
+            worker = SandboxAwareWorker(
+                task_queue=task_queue,
+                workflows=[MoneyTransferWorkflow],
+                activities=[banking_activities.withdraw, banking_activities.deposit],
+                sandbox_name="" if label == BASELINE else label,
+                client=env.client,
+                route_server_addr=route_server.address,
+                interceptors=[ExecutionRecorder(label, executions)],
+            )
+            routing_stats.instrument(worker.routes_client)
+            workers.append(worker)
+
+        worker_tasks = [asyncio.create_task(worker.run()) for worker in workers]
+        try:
+            await wait_for_routes(workers)
+            client = Client(env.client.service_client, namespace=env.client.namespace,
+                            interceptors=[BaggageClientInterceptor()])
+
+            outcomes: Dict[str, int] = defaultdict(int)
+            expected_label: Dict[str, str] = {}
+            latencies = []
+            in_flight = asyncio.Semaphore(args.concurrency)
+
+            async def drive_one(index: int, label: str) -> None:
+                workflow_id = f"bench-{index}-{uuid.uuid4()}"
+                expected_label[workflow_id] = label
+                payment = PaymentDetails(from_account="acc_001", to_account="acc_003", amount="1.00",
+                                         reference=f"bench-{index}")
+                async with in_flight:
+                    started = time.perf_counter()
+                    try:
+                        with with_baggage(None if label == BASELINE else f"{label}-key"):
+                            handle = await client.start_workflow(
+                                MoneyTransferWorkflow.run, payment, id=workflow_id, task_queue=task_queue,
+                                run_timeout=args.workflow_timeout,
+                            )
+                        result = await handle.result()
+                    except WorkflowFailureError:
+                        outcomes["timed_out_or_failed"] += 1
+                        return
+                    latencies.append(time.perf_counter() - started)
+                if result is None:
+                    outcomes["skipped"] += 1
+                elif result.startswith("Transfer complete"):
+                    outcomes["completed"] += 1
+                else:
+                    outcomes["failed"] += 1
+
+            labels = rng.choices(list(mix), weights=list(mix.values()), k=args.workflows)
+            wall_started = time.perf_counter()
+            await asyncio.gather(*(drive_one(index, label) for index, label in enumerate(labels)))
+            wall_seconds = time.perf_counter() - wall_started
+        finally:
+            for task in worker_tasks:
+                task.cancel()
+            await asyncio.gather(*worker_tasks, return_exceptions=True)
+            await route_server.stop()
+
+    misrouted = sum(
+        1 for workflow_id, label in expected_label.items()
+        if executions.get(workflow_id, set()) - {label}
+    )
+    return build_report("e2e", {
+        "workflows": args.workflows,
+        "mix": mix,
+        "concurrency": args.concurrency,
+        "workflow_timeout_seconds": args.workflow_timeout.total_seconds(),
+        "seed": args.seed,
+    }, {
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(outcomes["completed"] / wall_seconds, 3) if wall_seconds else 0.0,
+        "outcomes": {
+            "completed": outcomes["completed"],
+            "failed": outcomes["failed"],
+            "skipped": outcomes["skipped"],
+            "timed_out_or_failed": outcomes["timed_out_or_failed"],
+            "misrouted": misrouted,
+        },
+        "latency_ms": latency_summary(latencies),
+        "routing": routing_stats.as_dict(),
+        "route_server": {
+            "requests": route_server.request_count,
+            "not_modified": route_server.not_modified_count,
+        },
+    })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, default=200, help="Number of workflows to drive")
+    parser.add_argument("--mix", default="baseline=0.8,sandbox-a=0.2",
+                        help="Comma-separated name=weight pairs; 'baseline' means no routing key")
+    parser.add_argument("--concurrency", type=int, default=100, help="Workflows in flight at once")
+    parser.add_argument("--workflow-timeout", type=lambda value: timedelta(seconds=float(value)), default=timedelta(seconds=60),
+                        help="Run timeout per workflow, in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the routing-key mix")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # Several workers share this process; don't claim the worker's metrics port unless asked to
+    os.environ.setdefault("METRICS_PORT", "0")
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import math
+import platform
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from temporalio.api.common.v1 import Payload
+from temporalio.client import Interceptor, OutboundInterceptor, StartWorkflowInput
+
+ROUTING_KEY = "sd-routing-key"
+
+_baggage: ContextVar[Optional[str]] = ContextVar("bench_baggage", default=None)
+
+class BaggageClientInterceptor(Interceptor):
+    """Client interceptor that attaches the baggage set via `with_baggage` to workflow starts."""
+
+    def intercept_client(self, next: OutboundInterceptor) -> OutboundInterceptor:
+        return _BaggageOutboundInterceptor(next)
+
+class _BaggageOutboundInterceptor(OutboundInterceptor):
+
+    async def start_workflow(self, input: StartWorkflowInput):
+        value = _baggage.get()
+        if value:
+            input.headers = {**input.headers, "baggage": Payload(data=value.encode("utf-8"))}
+        return await self.next.start_workflow(input)
+
+@contextmanager
+def with_baggage(routing_key: Optional[str]):
+    """Routes workflow starts made inside the block with `routing_key` (None for baseline)."""
+    token = _baggage.set(f"{ROUTING_KEY}={routing_key}" if routing_key else None)
+    try:
+        yield
+    finally:
+        _baggage.reset(token)
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parses "baseline=0.6,sandbox-a=0.4" into normalized weights."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Mix '{spec}' has no positive weights")
+    return {name: weight / total for name, weight in weights.items()}
+
+def percentile(sorted_samples: Sequence[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, math.ceil(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+def latency_summary(samples_seconds: List[float]) -> dict:
+    """Summarizes latency samples in milliseconds."""
+    ordered = sorted(samples_seconds)
+    to_ms = lambda value: round(value * 1000, 3)
+    return {
+        "count": len(ordered),
+        "mean": to_ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50": to_ms(percentile(ordered, 0.50)),
+        "p90": to_ms(percentile(ordered, 0.90)),
+        "p95": to_ms(percentile(ordered, 0.95)),
+        "p99": to_ms(percentile(ordered, 0.99)),
+        "max": to_ms(ordered[-1]) if ordered else 0.0,
+    }
+
+def build_report(benchmark: str, config: dict, results: dict) -> dict:
+    return {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+def write_report(report: dict, output: Optional[str]) -> None:
+    """Writes the report as JSON to `output`, or to stdout when no path is given."""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {report['benchmark']} results to {output}")
+    else:
+        print(text)
+
+async def wait_for_routes(workers, timeout: float = 15.0) -> None:
+    """Blocks until every worker's routing cache has completed its first fetch."""
+    deadline = time.monotonic() + timeout
+    while not all(worker.routes_client._is_first_update_done for worker in workers):
+        if time.monotonic() > deadline:
+            raise TimeoutError("Routing caches were not populated in time")
+        await asyncio.sleep(0.05)
@@ -0,0 +1,93 @@
+"""
+Hot-account contention benchmark for ShardedLedger.
+
+Drives concurrent withdrawals and deposits against the in-memory account store
+(with a simulated round trip), sending a growing share of the traffic to one hot
+settlement account. Each share is run against the bare store, which applies each
+update atomically and is what the worker uses by default (LEDGER_SHARDS=0), and
+through a ShardedLedger with a single shard (a global lock) and with the
+configured number of shards.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.ledger_contention --operations 2000 --hot-shares 0,0.1,0.5,0.9 --output ledger.json
+"""
+import argparse
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+from account_store import InMemoryAccountStore
+from ledger import ShardedLedger
+
+from benchmarks.harness import build_report, latency_summary, write_report
+
+HOT_ACCOUNT = "acc_005_large_balance"
+
+async def measure(shards: int, hot_share: float, args) -> dict:
+    """Runs one share against the bare store when `shards` is 0, else through a ShardedLedger"""
+    rng = random.Random(args.seed)
+    cold_accounts = [f"acc_{index:04d}" for index in range(args.accounts)]
+    balances = {account: Decimal("1000000.00") for account in cold_accounts + [HOT_ACCOUNT]}
+    store = InMemoryAccountStore(balances, latency_ms=args.latency_ms)
+    ledger = ShardedLedger(store, shards) if shards else store
+    in_flight = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(index: int) -> None:
+        account = HOT_ACCOUNT if rng.random() < hot_share else rng.choice(cold_accounts)
+        operation = ledger.withdraw if index % 2 else ledger.deposit
+        async with in_flight:
+            started = time.perf_counter()
+            await operation(account, Decimal("1.00"))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(args.operations)))
+    elapsed = time.perf_counter() - started
+
+    stats = ledger.shard_stats() if shards else []
+    acquisitions = sum(shard["acquisitions"] for shard in stats)
+    contended = sum(shard["contended"] for shard in stats)
+    return {
+        "throughput_per_second": round(args.operations / elapsed, 1),
+        "latency_ms": latency_summary(latencies),
+        "contended_share": round(contended / acquisitions, 3) if acquisitions else 0.0,
+        "max_waiters": max((shard["max_waiters"] for shard in stats), default=0),
+    }
+
+async def run_benchmark(args) -> dict:
+    results = {}
+    for hot_share in args.hot_shares:
+        results[f"hot_{hot_share}"] = {
+            "bare_store": await measure(0, hot_share, args),
+            "global_lock": await measure(1, hot_share, args),
+            f"sharded_{args.shards}": await measure(args.shards, hot_share, args),
+        }
+    return build_report("ledger_contention", {
+        "operations": args.operations,
+        "concurrency": args.concurrency,
+        "accounts": args.accounts,
+        "shards": args.shards,
+        "latency_ms": args.latency_ms,
+        "seed": args.seed,
+    }, results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=2000, help="Balance updates per run")
+    parser.add_argument("--concurrency", type=int, default=200, help="Updates in flight at once")
+    parser.add_argument("--accounts", type=int, default=1000, help="Number of cold accounts")
+    parser.add_argument("--shards", type=int, default=64, help="Shards for the sharded runs")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated store round trip")
+    parser.add_argument("--hot-shares", type=lambda value: [float(share) for share in value.split(",")],
+                        default=[0.0, 0.1, 0.25, 0.5, 0.9], help="Comma-separated shares of traffic to the hot account")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for account selection")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
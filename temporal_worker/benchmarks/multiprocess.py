@@ -0,0 +1,111 @@
+"""
+Throughput of the worker supervisor with one process versus several.
+
+Boots a local Temporal dev server and a stub route server, then for each process
+count runs a WorkerSupervisor (which spawns that many worker processes sharing one
+routing-rules fetch) and drives MoneyTransferWorkflow executions through it.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.multiprocess --processes 1 4 --workflows 1000 --output multiprocess.json
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from temporalio.testing import WorkflowEnvironment
+
+from models import PaymentDetails
+from supervisor import WorkerSupervisor
+from workflows import MoneyTransferWorkflow
+
+from benchmarks.harness import build_report, latency_summary, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+async def _wait_healthy(supervisor: WorkerSupervisor, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not supervisor.health()["healthy"] or len(supervisor.health()["children"]) < supervisor.processes:
+        if time.monotonic() > deadline:
+            raise TimeoutError("Worker processes did not become healthy in time")
+        await asyncio.sleep(0.2)
+
+async def measure(env: WorkflowEnvironment, processes: int, args) -> dict:
+    task_queue = f"bench-multiprocess-{processes}-{uuid.uuid4()}"
+    # Read by the worker processes the supervisor spawns
+    os.environ["TASK_QUEUE"] = task_queue
+    supervisor = WorkerSupervisor(processes=processes, health_port=0)
+    supervisor_task = asyncio.create_task(supervisor.run())
+    try:
+        await _wait_healthy(supervisor, timeout=60)
+        in_flight = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        completed = 0
+
+        async def drive_one(index: int) -> None:
+            nonlocal completed
+            payment = PaymentDetails(from_account="acc_001", to_account="acc_003", amount="0.01",
+                                     reference=f"bench-{processes}-{index}")
+            async with in_flight:
+                started = time.perf_counter()
+                result = await env.client.execute_workflow(
+                    MoneyTransferWorkflow.run, payment, id=f"bench-{processes}-{index}-{uuid.uuid4()}",
+                    task_queue=task_queue,
+                )
+                latencies.append(time.perf_counter() - started)
+            if result and result.startswith("Transfer complete"):
+                completed += 1
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(drive_one(index) for index in range(args.workflows)))
+        wall_seconds = time.perf_counter() - wall_started
+    finally:
+        supervisor.stop()
+        await supervisor_task
+
+    return {
+        "completed": completed,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(completed / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_ms": latency_summary(latencies),
+    }
+
+async def run_benchmark(args) -> dict:
+    route_server = StubRouteServer()
+    await route_server.start()
+    results = {}
+    try:
+        async with await WorkflowEnvironment.start_local() as env:
+            os.environ["TEMPORAL_SERVER_URL"] = env.client.service_client.config.target_host
+            os.environ["ROUTES_API_ROUTE_SERVER_ADDR"] = route_server.address
+            for processes in args.processes:
+                results[f"processes_{processes}"] = await measure(env, processes, args)
+    finally:
+        await route_server.stop()
+    return build_report("multiprocess", {
+        "processes": args.processes,
+        "workflows": args.workflows,
+        "concurrency": args.concurrency,
+        "cpu_count": os.cpu_count(),
+    }, {
+        **results,
+        "route_server_requests": route_server.request_count,
+    })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Worker process counts to compare")
+    parser.add_argument("--workflows", type=int, default=500, help="Workflows per process count")
+    parser.add_argument("--concurrency", type=int, default=500, help="Workflows in flight at once")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # Worker processes inherit these; the benchmark needs no metrics endpoints or simulated store latency
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("ACCOUNT_STORE_LATENCY_MS", "0")
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Payload bytes and encode/decode time with the JSON and compact payload codecs.
+
+Encodes the payloads Temporal stores for one MoneyTransferWorkflow (its input,
+both activity requests and responses, and its result), for one actor-mode
+transfer (its account operations and their results), for an AccountWorkflow's
+continue-as-new input and for a BatchTransferWorkflow input. Each goes through
+the default data converter, and through payload_codec with PAYLOAD_CODEC=compact
+at the latest key table version and at version 1. Needs no Temporal server.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.payload_size --iterations 20000 --output payload_size.json
+"""
+import argparse
+import asyncio
+import dataclasses
+import time
+import uuid
+from typing import Any, List
+
+from temporalio.converter import DataConverter
+
+import payload_codec
+from models import (
+    AccountOperation, AccountOperationResult, AccountState, BatchTransferRequest, DepositRequest, DepositResponse,
+    PaymentDetails, SenderOutcomes, WithdrawRequest, WithdrawResponse,
+)
+from payload_codec import data_converter_from_env
+
+from benchmarks.harness import build_report, write_report
+
+def transfer_values() -> List[Any]:
+    payment = PaymentDetails(from_account="acc_001", to_account="acc_003", amount="125.50",
+                             reference=f"invoice-{uuid.uuid4()}")
+    withdraw_id, deposit_id = str(uuid.uuid4()), str(uuid.uuid4())
+    return [
+        payment,
+        WithdrawRequest(account_id=payment.from_account, amount=payment.amount, reference=payment.reference),
+        WithdrawResponse(transaction_id=withdraw_id, account_id=payment.from_account, amount=payment.amount,
+                         balance_after="874.50", success=True, message="Withdrawal successful"),
+        DepositRequest(account_id=payment.to_account, amount=payment.amount, reference=payment.reference),
+        DepositResponse(transaction_id=deposit_id, account_id=payment.to_account, amount=payment.amount,
+                        balance_after="1125.50", success=True, message="Deposit successful"),
+        f"Transfer complete: {withdraw_id} -> {deposit_id}",
+    ]
+
+def account_operation(run_id: str, name: str, kind: str, account_id: str, amount: str = "0") -> AccountOperation:
+    return AccountOperation(operation_id=f"{run_id}-{name}", account_id=account_id, kind=kind, amount=amount,
+                            reference=f"invoice-{run_id}", sender_run_id=run_id,
+                            reply_workflow_id=f"transfer-{run_id}")
+
+def actor_transfer_values() -> List[Any]:
+    """Signals and results of one AccountActorMoneyTransferWorkflow"""
+    run_id = str(uuid.uuid4())
+    payment = PaymentDetails(from_account="acc_001", to_account="acc_003", amount="125.50",
+                             reference=f"invoice-{run_id}")
+    return [
+        payment,
+        account_operation(run_id, "debit", "debit", payment.from_account, payment.amount),
+        AccountOperationResult(operation_id=f"{run_id}-debit", success=True, balance_after="874.50"),
+        account_operation(run_id, "credit", "credit", payment.to_account, payment.amount),
+        AccountOperationResult(operation_id=f"{run_id}-credit", success=True, balance_after="1125.50"),
+        account_operation(run_id, "ack", "ack", payment.from_account),
+        account_operation(run_id, "ack", "ack", payment.to_account),
+        f"Transfer complete: {run_id}-debit -> {run_id}-credit",
+    ]
+
+def account_state_values(size: int) -> List[Any]:
+    """An AccountWorkflow's continue-as-new input with `size` pending operations and unacknowledged outcomes"""
+    run_ids = [str(uuid.uuid4()) for _ in range(size)]
+    return [AccountState(
+        account_id="acc_001",
+        balance="1000.00",
+        pending=[account_operation(run_id, "debit", "debit", "acc_001", "1.00") for run_id in run_ids],
+        outcomes=[SenderOutcomes(sender_run_id=run_id, first_applied_at=1.7e9, results=[
+            AccountOperationResult(operation_id=f"{run_id}-debit", success=True, balance_after="999.00"),
+        ]) for run_id in run_ids],
+    )]
+
+def batch_values(size: int) -> List[Any]:
+    return [BatchTransferRequest(transfers=[
+        PaymentDetails(from_account=f"acc_{index % 100:03d}", to_account=f"acc_{(index + 1) % 100:03d}",
+                       amount=f"{index % 500 + 1}.00", reference=f"batch-item-{index}")
+        for index in range(size)
+    ])]
+
+async def measure(converter: DataConverter, values: List[Any], iterations: int) -> dict:
+    types = [type(value) for value in values]
+    payloads = await converter.encode(values)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await converter.encode(values)
+    encode_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await converter.decode(payloads, types)
+    decode_seconds = time.perf_counter() - started
+    return {
+        # Serialized Payload messages, metadata included, as stored in history
+        "payload_bytes": sum(payload.ByteSize() for payload in payloads),
+        "encode_us": round(encode_seconds / iterations * 1e6, 2),
+        "decode_us": round(decode_seconds / iterations * 1e6, 2),
+    }
+
+async def run_benchmark(args) -> dict:
+    compact = data_converter_from_env(encode=True)
+    converters = {
+        "json": DataConverter.default,
+        "compact": compact,
+        "compact_v1": dataclasses.replace(compact, payload_codec=payload_codec.CompactPayloadCodec(
+            compress_threshold=compact.payload_codec.compress_threshold, version=1)),
+    }
+    scenarios = {
+        "transfer": (transfer_values(), args.iterations),
+        "actor_transfer": (actor_transfer_values(), args.iterations),
+        f"account_state_{args.batch_size}": (account_state_values(args.batch_size),
+                                             max(1, args.iterations // args.batch_size)),
+        f"batch_{args.batch_size}": (batch_values(args.batch_size), max(1, args.iterations // args.batch_size)),
+    }
+    results = {}
+    for scenario, (values, iterations) in scenarios.items():
+        results[scenario] = {name: await measure(converter, values, iterations) for name, converter in converters.items()}
+        baseline = results[scenario]["json"]["payload_bytes"]
+        for name in ("compact", "compact_v1"):
+            results[scenario][name]["bytes_vs_json"] = round(results[scenario][name]["payload_bytes"] / baseline, 3)
+    return build_report("payload_size", {
+        "iterations": args.iterations,
+        "batch_size": args.batch_size,
+        "msgpack": payload_codec.msgpack is not None,
+        "compress_threshold": compact.payload_codec.compress_threshold,
+        "codec_version": payload_codec.CURRENT_VERSION,
+    }, results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000, help="Transfers encoded and decoded")
+    parser.add_argument("--batch-size", type=int, default=500, help="Transfers in the batch scenario, and pending operations in the account state one")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
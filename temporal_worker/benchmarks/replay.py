@@ -0,0 +1,182 @@
+"""
+Replay determinism check and replay cost over recorded workflow histories.
+
+`record` boots a local Temporal dev server and a stub route server, runs the
+worker from main.build_worker on a fresh task queue, drives transfers (and
+optionally batches) through it, and writes each workflow's history to
+`--histories` as JSON.
+
+`replay` replays every history in `--histories` with temporalio's Replayer,
+using the workflows and the interceptors that build_worker's SandboxAwareWorker
+installs, and the same data converter. It reports nondeterminism per workflow
+and replay time per workflow and per history event, and exits with status 1 if
+any history failed to replay, so it can gate releases. Replaying a history is
+what a worker does on a sticky cache miss, so the per-workflow times also show
+what an evicted workflow costs. The first history of a run also pays for
+loading the workflow sandbox, so replay enough histories to amortize it.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.replay record --workflows 200 --batches 2 --histories histories/
+    python -m benchmarks.replay replay --histories histories/ --output replay.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from temporalio.client import WorkflowHistory
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Replayer
+
+from main import build_worker
+from models import BatchTransferRequest, PaymentDetails
+from payload_codec import data_converter_from_env
+
+from benchmarks.harness import build_report, latency_summary, wait_for_routes, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+async def record(args) -> dict:
+    histories_dir = Path(args.histories)
+    histories_dir.mkdir(parents=True, exist_ok=True)
+    route_server = StubRouteServer()
+    await route_server.start()
+    # Read by build_worker
+    os.environ["TASK_QUEUE"] = task_queue = f"bench-replay-{uuid.uuid4()}"
+    try:
+        async with await WorkflowEnvironment.start_local(data_converter=data_converter_from_env()) as env:
+            worker = build_worker(sandbox_name="", client=env.client, route_server_addr=route_server.address)
+            worker_task = asyncio.create_task(worker.run())
+            try:
+                await wait_for_routes([worker])
+                in_flight = asyncio.Semaphore(args.concurrency)
+
+                async def run_one(workflow: str, argument, workflow_id: str) -> None:
+                    async with in_flight:
+                        handle = await env.client.start_workflow(workflow, argument, id=workflow_id, task_queue=task_queue)
+                        await handle.result()
+                        history = await handle.fetch_history()
+                    (histories_dir / f"{workflow_id}.json").write_text(history.to_json())
+
+                runs = [
+                    run_one("MoneyTransferWorkflow",
+                            PaymentDetails(from_account="acc_001", to_account="acc_003", amount="0.01", reference=f"replay-{index}"),
+                            f"replay-transfer-{index}-{uuid.uuid4()}")
+                    for index in range(args.workflows)
+                ] + [
+                    run_one("BatchTransferWorkflow", BatchTransferRequest(transfers=[
+                        PaymentDetails(from_account="acc_002", to_account="acc_004", amount="0.01", reference=f"replay-batch-{batch}-{index}")
+                        for index in range(args.batch_size)
+                    ]), f"replay-batch-{batch}-{uuid.uuid4()}")
+                    for batch in range(args.batches)
+                ]
+                await asyncio.gather(*runs)
+            finally:
+                worker_task.cancel()
+                await asyncio.gather(worker_task, return_exceptions=True)
+    finally:
+        await route_server.stop()
+    return build_report("replay_record", {
+        "workflows": args.workflows,
+        "batches": args.batches,
+        "batch_size": args.batch_size,
+    }, {"histories_dir": str(histories_dir), "histories_written": args.workflows + args.batches})
+
+def load_histories(histories_dir: str) -> List[WorkflowHistory]:
+    paths = sorted(Path(histories_dir).glob("*.json"))
+    if not paths:
+        raise SystemExit(f"No histories found in {histories_dir}")
+    return [WorkflowHistory.from_json(path.stem, path.read_text()) for path in paths]
+
+async def replay(args) -> dict:
+    histories = load_histories(args.histories)
+    # The same workflows, interceptors and converter a deployed worker uses
+    worker = build_worker(sandbox_name="")
+    replayer = Replayer(
+        workflows=worker.workflows,
+        interceptors=worker._build_interceptors(),
+        data_converter=data_converter_from_env(),
+    )
+
+    async def history_source():
+        for history in histories:
+            yield history
+
+    durations: Dict[str, List[float]] = defaultdict(list)
+    events: Dict[str, List[int]] = defaultdict(list)
+    failures = []
+    wall_started = time.perf_counter()
+    async with replayer.workflow_replay_iterator(history_source()) as results:
+        # Histories replay one after another, so each result's time is the gap since the previous one
+        previous = time.perf_counter()
+        async for result in results:
+            now = time.perf_counter()
+            started_event = result.history.events[0].workflow_execution_started_event_attributes
+            workflow_type = started_event.workflow_type.name or "unknown"
+            durations[workflow_type].append(now - previous)
+            events[workflow_type].append(len(result.history.events))
+            previous = now
+            if result.replay_failure is not None:
+                failures.append({
+                    "workflow_id": result.history.workflow_id,
+                    "workflow_type": workflow_type,
+                    "error": str(result.replay_failure),
+                })
+    wall_seconds = time.perf_counter() - wall_started
+
+    per_type = {}
+    for workflow_type, samples in durations.items():
+        event_counts = events[workflow_type]
+        per_type[workflow_type] = {
+            "histories": len(samples),
+            "events_mean": round(sum(event_counts) / len(event_counts), 1),
+            "events_max": max(event_counts),
+            "replay_ms": latency_summary(samples),
+            "replay_us_per_event": round(sum(samples) / sum(event_counts) * 1e6, 2),
+        }
+    return build_report("replay", {
+        "histories_dir": args.histories,
+        "activity_mode": os.getenv("BANKING_ACTIVITY_MODE", "remote"),
+        "payload_codec": os.getenv("PAYLOAD_CODEC", "json"),
+    }, {
+        "histories": len(histories),
+        "nondeterministic": len(failures),
+        "wall_seconds": round(wall_seconds, 3),
+        "workflow_types": per_type,
+        "failures": failures[:args.max_failures],
+    })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Run workflows against a local server and save their histories")
+    record_parser.add_argument("--workflows", type=int, default=100, help="MoneyTransferWorkflow histories to record")
+    record_parser.add_argument("--batches", type=int, default=0, help="BatchTransferWorkflow histories to record")
+    record_parser.add_argument("--batch-size", type=int, default=100, help="Transfers per batch")
+    record_parser.add_argument("--concurrency", type=int, default=50, help="Workflows in flight at once")
+    replay_parser = commands.add_parser("replay", help="Replay saved histories and report nondeterminism and timing")
+    replay_parser.add_argument("--max-failures", type=int, default=20, help="Failures listed in the report")
+    for sub in (record_parser, replay_parser):
+        sub.add_argument("--histories", required=True, help="Directory of history JSON files")
+        sub.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # Neither command needs metrics endpoints, routing snapshots or simulated store latency
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("ACCOUNT_STORE_LATENCY_MS", "0")
+    os.environ.pop("ROUTES_API_SNAPSHOT_PATH", None)
+    if args.command == "record":
+        write_report(asyncio.run(record(args)), args.output)
+        return
+    report = asyncio.run(replay(args))
+    write_report(report, args.output)
+    if report["results"]["nondeterministic"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
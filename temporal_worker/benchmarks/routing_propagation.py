@@ -0,0 +1,97 @@
+"""
+Routing-rule propagation benchmark for RoutesAPIClient.
+
+Runs a client against the stub route server in polling mode, in watch mode, and
+in watch mode against a server without a watch endpoint (which must fall back to
+polling). For each mode it adds and removes routing rules and measures how long
+each change takes to reach the client's cache, and how many requests the route
+server handled.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.routing_propagation --changes 5 --refresh-interval 2 --output propagation.json
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from platform_sdk import RoutesAPIClient
+
+from benchmarks.harness import build_report, latency_summary, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+MODES = {
+    # mode name -> (ROUTES_API_WATCH_ENABLED, server supports watch)
+    "poll": ("false", True),
+    "watch": ("true", True),
+    "watch_fallback": ("true", False),
+}
+
+async def _wait_until(predicate, timeout: float) -> float:
+    started = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError("Routing change did not propagate in time")
+        await asyncio.sleep(0.005)
+    return time.perf_counter() - started
+
+async def measure_mode(mode: str, args) -> dict:
+    watch_enabled, supports_watch = MODES[mode]
+    os.environ["ROUTES_API_WATCH_ENABLED"] = watch_enabled
+    os.environ["ROUTES_API_REFRESH_INTERVAL_SECONDS"] = str(args.refresh_interval)
+
+    server = StubRouteServer(supports_watch=supports_watch, heartbeat_interval=1.0)
+    await server.start()
+    client = RoutesAPIClient(sandbox_name="", route_server_addr=server.address)
+    updater = asyncio.create_task(client._periodic_cache_updater())
+    try:
+        await _wait_until(lambda: client._is_first_update_done, timeout=args.refresh_interval * 3)
+        propagation = []
+        started = time.perf_counter()
+        requests_before = server.request_count + server.watch_request_count
+        for index in range(args.changes):
+            routing_key = f"{mode}-key-{index}"
+            server.set_rule(routing_key, "sandbox-a")
+            propagation.append(await _wait_until(lambda: routing_key in client._routing_keys_cache,
+                                                 timeout=args.refresh_interval * 3))
+            server.remove_rule(routing_key)
+            propagation.append(await _wait_until(lambda: routing_key not in client._routing_keys_cache,
+                                                 timeout=args.refresh_interval * 3))
+        elapsed = time.perf_counter() - started
+        requests = server.request_count + server.watch_request_count - requests_before
+    finally:
+        updater.cancel()
+        await asyncio.gather(updater, return_exceptions=True)
+        await client.close()
+        await server.stop()
+
+    return {
+        "propagation_ms": latency_summary(propagation),
+        "route_server_requests": requests,
+        "requests_per_minute": round(requests / elapsed * 60, 3) if elapsed else 0.0,
+        "fetch_stats": client.get_fetch_stats(),
+    }
+
+async def run_benchmark(args) -> dict:
+    results = {}
+    for mode in args.modes:
+        results[mode] = await measure_mode(mode, args)
+    return build_report("routing_propagation", {
+        "changes": args.changes,
+        "refresh_interval_seconds": args.refresh_interval,
+        "modes": args.modes,
+    }, results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--changes", type=int, default=5, help="Rule add/remove pairs per mode")
+    parser.add_argument("--refresh-interval", type=int, default=2, help="Polling interval in seconds")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Route-server load and propagation with a node-local shared routing cache.
+
+Starts the stub route server and several local processes, each with its own
+RoutesAPIClient, first polling independently and then with
+ROUTES_API_CACHE_MODE=shared (one elected fetcher publishing to a memory-mapped
+snapshot that the others read). Midway through each run a routing rule is added;
+every process reports when its cache saw it.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.shared_cache --processes 8 --duration 10 --output shared_cache.json
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from platform_sdk import RoutesAPIClient
+from shared_routing_cache import shared_cache_feed
+
+from benchmarks.harness import build_report, latency_summary, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+NEW_KEY = "shared-cache-new-key"
+
+async def _run_client(address: str, shared: bool, snapshot_path: str, duration: float) -> dict:
+    client = RoutesAPIClient(sandbox_name="", route_server_addr=address)
+    feed = shared_cache_feed(client, snapshot_path) if shared else client._periodic_cache_updater()
+    task = asyncio.create_task(feed)
+    seen_at = None
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        if seen_at is None and NEW_KEY in client._routing_keys_cache:
+            seen_at = time.time()
+        await asyncio.sleep(0.005)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await client.close()
+    return {"seen_at": seen_at, "fetches": client.fetch_stats.total_fetches}
+
+def _child(address: str, shared: bool, snapshot_path: str, duration: float, results) -> None:
+    results.put(asyncio.run(_run_client(address, shared, snapshot_path, duration)))
+
+async def measure(shared: bool, args) -> dict:
+    server = StubRouteServer()
+    await server.start()
+    server.set_rule("existing-key", "sandbox-a")
+    snapshot_path = os.path.join(tempfile.mkdtemp(), "routing.snapshot")
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=_child, args=(server.address, shared, snapshot_path, args.duration, results))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        await asyncio.sleep(args.duration / 2)
+        changed_at = time.time()
+        server.set_rule(NEW_KEY, "sandbox-a")
+        reports = [await asyncio.to_thread(results.get) for _ in processes]
+    finally:
+        for process in processes:
+            await asyncio.to_thread(process.join)
+        await server.stop()
+
+    propagation = [report["seen_at"] - changed_at for report in reports if report["seen_at"] is not None]
+    return {
+        "route_server_requests": server.request_count,
+        "requests_per_process_per_minute": round(server.request_count / args.processes / args.duration * 60, 2),
+        "processes_that_saw_change": len(propagation),
+        "propagation_ms": latency_summary(propagation),
+    }
+
+async def run_benchmark(args) -> dict:
+    return build_report("shared_cache", {
+        "processes": args.processes,
+        "duration_seconds": args.duration,
+        "refresh_interval_seconds": args.refresh_interval,
+    }, {
+        "independent": await measure(False, args),
+        "shared": await measure(True, args),
+    })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=8, help="Processes sharing the node")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--refresh-interval", type=int, default=1, help="Polling interval in seconds")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # Inherited by the spawned processes
+    os.environ["ROUTES_API_REFRESH_INTERVAL_SECONDS"] = str(args.refresh_interval)
+    os.environ.setdefault("ROUTES_API_SHARED_CACHE_POLL_MS", "20")
+    write_report(asyncio.run(run_benchmark(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+
+ROUTING_RULES_PATH = "/api/v1/workloads/routing-rules"
+ROUTING_RULES_WATCH_PATH = "/api/v1/workloads/routing-rules/watch"
+
+class StubRouteServer:
+    """
+    Local stand-in for the Signadot route server's routing-rules endpoint.
+
+    Rules map a routing key to the sandbox that should receive it. Requests that
+    pass `destinationSandboxName` only see that sandbox's rules, like the real API.
+    Responses carry an ETag and honor If-None-Match with a 304.
+
+    The watch endpoint streams server-sent events: a `snapshot` of the rules on
+    connect, then `add`/`remove` deltas as rules change, with heartbeat comments
+    in between. Set `supports_watch=False` to emulate a server without it.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, supports_watch: bool = True,
+                 heartbeat_interval: float = 15.0):
+        self.host = host
+        self.port = port
+        self.supports_watch = supports_watch
+        self.heartbeat_interval = heartbeat_interval
+        self.rules: Dict[str, str] = {} # routing key -> destination sandbox name
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.watch_request_count = 0
+        self._watchers: List[Tuple[Optional[str], asyncio.Queue]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def address(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def set_rule(self, routing_key: str, sandbox_name: str) -> None:
+        previous = self.rules.get(routing_key)
+        self.rules[routing_key] = sandbox_name
+        if previous is not None and previous != sandbox_name:
+            self._publish("remove", routing_key, previous)
+        if previous != sandbox_name:
+            self._publish("add", routing_key, sandbox_name)
+
+    def remove_rule(self, routing_key: str) -> None:
+        previous = self.rules.pop(routing_key, None)
+        if previous is not None:
+            self._publish("remove", routing_key, previous)
+
+    def _publish(self, event_type: str, routing_key: str, sandbox_name: str) -> None:
+        for sandbox_filter, queue in self._watchers:
+            if not sandbox_filter or sandbox_filter == sandbox_name:
+                queue.put_nowait((event_type, {"routingKey": routing_key, "destinationSandboxName": sandbox_name}))
+
+    def _rules_for(self, sandbox_name: Optional[str]) -> list:
+        return [
+            {"routingKey": routing_key, "destinationSandboxName": destination}
+            for routing_key, destination in sorted(self.rules.items())
+            if not sandbox_name or destination == sandbox_name
+        ]
+
+    async def _handle_routing_rules(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        sandbox_name = request.query.get("destinationSandboxName")
+        body = json.dumps({"routingRules": self._rules_for(sandbox_name)})
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified_count += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="application/json", headers={"ETag": etag})
+
+    async def _handle_watch(self, request: web.Request) -> web.StreamResponse:
+        if not self.supports_watch:
+            return web.Response(status=404)
+        self.watch_request_count += 1
+        sandbox_name = request.query.get("destinationSandboxName")
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(event_type: str, payload: dict) -> None:
+            await response.write(f"event: {event_type}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        watcher = (sandbox_name, asyncio.Queue())
+        self._watchers.append(watcher)
+        try:
+            await send("snapshot", {"routingRules": self._rules_for(sandbox_name)})
+            while True:
+                try:
+                    event = await asyncio.wait_for(watcher[1].get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    await response.write(b": heartbeat\n\n")
+                    continue
+                if event is None: # Server shutting down
+                    break
+                await send(*event)
+        except ConnectionResetError:
+            pass # Client went away
+        finally:
+            self._watchers.remove(watcher)
+        return response
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get(ROUTING_RULES_PATH, self._handle_routing_rules)
+        app.router.add_get(ROUTING_RULES_WATCH_PATH, self._handle_watch)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Resolve the ephemeral port when started with port=0
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        for _, queue in self._watchers:
+            queue.put_nowait(None)
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def _serve_forever(port: int, rules: list) -> None:
+    server = StubRouteServer(host="0.0.0.0", port=port)
+    for rule in rules:
+        routing_key, _, sandbox_name = rule.partition("=")
+        server.set_rule(routing_key, sandbox_name)
+    await server.start()
+    print(f"Stub route server listening on {server.address}{ROUTING_RULES_PATH}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve static routing rules for local testing")
+    parser.add_argument("--port", type=int, default=7778)
+    parser.add_argument("--rule", action="append", default=[], metavar="ROUTING_KEY=SANDBOX",
+                        help="Route ROUTING_KEY to SANDBOX (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(_serve_forever(args.port, args.rule))
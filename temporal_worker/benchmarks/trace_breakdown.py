@@ -0,0 +1,160 @@
+"""
+Per-stage latency of money transfers, from OpenTelemetry traces.
+
+Boots a local Temporal dev server and a stub route server, runs the worker from
+main.build_worker with TRACING_EXPORTER=file, and drives transfers through a
+client with the tracing interceptor, each under a root span that stands in for
+the HTTP request. Then reads the spans back from `--traces` and reports:
+
+  - latency per span name (the request, routing decisions, the activities and
+    the simulated processing and balance updates inside them),
+  - queue time per step: from a workflow or activity being started
+    (StartWorkflow/StartActivity) to a worker running it (RunWorkflow/RunActivity),
+  - each stage's mean share of the end-to-end trace time.
+
+Workflow spans are instants, since workflow code can't hold a span open; the
+gaps between them are the time spent in Temporal. With `--analyze-only` the
+benchmark only reads `--traces`, e.g. a file written by deployed services with
+TRACING_EXPORTER=file.
+
+Run from the temporal_worker directory:
+
+    python -m benchmarks.trace_breakdown --workflows 200 --traces traces.jsonl --output trace_breakdown.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+from temporalio.testing import WorkflowEnvironment
+
+from main import build_worker
+from models import PaymentDetails
+from tracing import configure_tracing, get_tracer, shutdown_tracing, tracing_interceptors
+
+from benchmarks.harness import build_report, latency_summary, wait_for_routes, write_report
+from benchmarks.stub_route_server import StubRouteServer
+
+# Prefixes of the spans temporalio's tracing interceptor creates, paired as "started" -> "running"
+QUEUE_STAGES = (("StartWorkflow:", "RunWorkflow:"), ("StartActivity:", "RunActivity:"))
+
+async def run_transfers(args) -> dict:
+    route_server = StubRouteServer()
+    await route_server.start()
+    # Read by build_worker
+    os.environ["TASK_QUEUE"] = task_queue = f"bench-trace-{uuid.uuid4()}"
+    tracer = get_tracer("benchmarks.trace_breakdown")
+    try:
+        async with await WorkflowEnvironment.start_local(interceptors=tracing_interceptors()) as env:
+            worker = build_worker(sandbox_name="", client=env.client, route_server_addr=route_server.address)
+            worker_task = asyncio.create_task(worker.run())
+            try:
+                await wait_for_routes([worker])
+                in_flight = asyncio.Semaphore(args.concurrency)
+                completed = 0
+
+                async def drive_one(index: int) -> None:
+                    nonlocal completed
+                    payment = PaymentDetails(from_account="acc_001", to_account="acc_003", amount="0.01",
+                                             reference=f"trace-{index}")
+                    async with in_flight:
+                        with tracer.start_as_current_span("POST /api/start-workflow"):
+                            handle = await env.client.start_workflow(
+                                "MoneyTransferWorkflow", payment, id=f"trace-{index}-{uuid.uuid4()}", task_queue=task_queue)
+                        result = await handle.result()
+                    if result.startswith("Transfer complete"):
+                        completed += 1
+
+                started = time.perf_counter()
+                await asyncio.gather(*(drive_one(index) for index in range(args.workflows)))
+                wall_seconds = time.perf_counter() - started
+            finally:
+                worker_task.cancel()
+                await asyncio.gather(worker_task, return_exceptions=True)
+    finally:
+        await route_server.stop()
+        # Flushes the remaining spans to the file
+        shutdown_tracing()
+    return {"completed": completed, "wall_seconds": round(wall_seconds, 3)}
+
+def load_spans(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def analyze(spans: List[dict]) -> dict:
+    by_name: Dict[str, List[float]] = defaultdict(list)
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    for span in spans:
+        by_name[span["name"]].append(span["duration_ms"] / 1000)
+        traces[span["trace_id"]].append(span)
+
+    queue_times: Dict[str, List[float]] = defaultdict(list)
+    shares: Dict[str, List[float]] = defaultdict(list)
+    end_to_end: List[float] = []
+    for trace_spans in traces.values():
+        trace_start = min(span["start_ns"] for span in trace_spans)
+        trace_end = max(span["start_ns"] + span["duration_ms"] * 1e6 for span in trace_spans)
+        total_ns = trace_end - trace_start
+        if total_ns <= 0:
+            continue
+        end_to_end.append(total_ns / 1e9)
+        starts: Dict[str, int] = {}
+        for span in sorted(trace_spans, key=lambda span: span["start_ns"]):
+            for started_prefix, running_prefix in QUEUE_STAGES:
+                if span["name"].startswith(started_prefix):
+                    starts.setdefault(span["name"][len(started_prefix):], span["start_ns"])
+                elif span["name"].startswith(running_prefix):
+                    target = span["name"][len(running_prefix):]
+                    if target in starts:
+                        # Retries run again from the same start; count the first run only
+                        queue_times[f"queued:{target}"].append((span["start_ns"] - starts.pop(target)) / 1e9)
+        stage_ns: Dict[str, float] = defaultdict(float)
+        for span in trace_spans:
+            stage_ns[span["name"]] += span["duration_ms"] * 1e6
+        for name, ns in stage_ns.items():
+            if ns > 0:
+                shares[name].append(ns / total_ns)
+
+    return {
+        "traces": len(traces),
+        "spans": len(spans),
+        "end_to_end_ms": latency_summary(end_to_end),
+        "span_ms": {name: latency_summary(samples) for name, samples in sorted(by_name.items())},
+        "queue_ms": {name: latency_summary(samples) for name, samples in sorted(queue_times.items())},
+        # Overlapping spans (a parent and its children) each count their full duration
+        "share_of_trace": {name: round(sum(values) / len(traces), 3) for name, values in
+                           sorted(shares.items(), key=lambda item: -sum(item[1]))},
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, default=100, help="Transfers to run and trace")
+    parser.add_argument("--concurrency", type=int, default=50, help="Workflows in flight at once")
+    parser.add_argument("--traces", default="traces.jsonl", help="Span file written by TRACING_EXPORTER=file")
+    parser.add_argument("--analyze-only", action="store_true", help="Only read --traces; run no transfers")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    run = None
+    if not args.analyze_only:
+        os.environ.setdefault("METRICS_PORT", "0")
+        os.environ.pop("ROUTES_API_SNAPSHOT_PATH", None)
+        os.environ.update({"TRACING_EXPORTER": "file", "TRACING_FILE": args.traces, "TRACING_SAMPLE_RATIO": "1.0"})
+        if os.path.exists(args.traces):
+            os.remove(args.traces)
+        # The worker and the client share this process, and so one tracer provider
+        configure_tracing("trace-breakdown")
+        run = asyncio.run(run_transfers(args))
+    write_report(build_report("trace_breakdown", {
+        "workflows": 0 if args.analyze_only else args.workflows,
+        "concurrency": args.concurrency,
+        "traces_file": args.traces,
+        "activity_mode": os.getenv("BANKING_ACTIVITY_MODE", "remote"),
+    }, {"run": run, **analyze(load_spans(args.traces))}), args.output)
+
+if __name__ == "__main__":
+    main()
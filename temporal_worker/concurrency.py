@@ -0,0 +1,152 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Optional
+
+from temporalio.worker import Interceptor
+from temporalio.worker._interceptor import ActivityInboundInterceptor, ExecuteActivityInput
+
+from metrics import ACTIVITY_CONCURRENCY_LIMIT, ACTIVITIES_IN_FLIGHT, ACTIVITY_SLOT_WAIT
+from structured_logging import get_logger
+
+DEFAULT_MIN_LIMIT = 4
+DEFAULT_TARGET_LATENCY_MS = 2000
+DEFAULT_MAX_ERROR_RATE = 0.05
+DEFAULT_WINDOW = 20 # completions per adjustment
+DEFAULT_DECREASE_FACTOR = 0.7
+
+log = get_logger("concurrency")
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on concurrently running activities.
+
+    A slot is taken before an activity starts and released when it completes. Completions are evaluated in windows of `window`. If a window's mean
+    latency exceeds the target or its error rate exceeds `max_error_rate`, the limit is cut
+    multiplicatively; otherwise, if callers waited for a slot during the window
+    or are still waiting, it grows by one. The limit stays within [min_limit, max_limit].
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, target_latency: float,
+                 max_error_rate: float = DEFAULT_MAX_ERROR_RATE, window: int = DEFAULT_WINDOW,
+                 decrease_factor: float = DEFAULT_DECREASE_FACTOR, initial_limit: Optional[int] = None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.window = max(1, window)
+        self.decrease_factor = decrease_factor
+        initial = (self.min_limit + self.max_limit) // 2 if initial_limit is None else initial_limit
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._samples = 0
+        self._errors = 0
+        self._latency_total = 0.0
+        self._saturated = False
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        self._saturated = True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we were cancelled; hand it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: float, error: bool) -> None:
+        self.in_flight -= 1
+        self._samples += 1
+        self._errors += int(error)
+        self._latency_total += latency
+        if self._samples >= self.window:
+            self._adjust()
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adjust(self) -> None:
+        mean_latency = self._latency_total / self._samples
+        error_rate = self._errors / self._samples
+        previous = self.limit
+        if mean_latency > self.target_latency or error_rate > self.max_error_rate:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        elif self._saturated or self._waiters:
+            self.limit = min(self.max_limit, self.limit + 1)
+        if self.limit != previous:
+            log.info("Activity concurrency limit changed", event="concurrency.adjusted", limit=self.limit,
+                     previous=previous, mean_latency_ms=round(mean_latency * 1000, 1), error_rate=round(error_rate, 3))
+        self._samples = self._errors = 0
+        self._latency_total = 0.0
+        self._saturated = False
+
+class AdaptiveConcurrencyInterceptor(Interceptor):
+    """
+    Runs activities under an AdaptiveConcurrencyLimiter: each activity takes a slot before
+    it starts and frees it when it finishes. Activities that raise, and banking activities
+    that return success=False, count as errors.
+    """
+
+    def __init__(self, limiter: AdaptiveConcurrencyLimiter, sandbox_name: str = ""):
+        self.limiter = limiter
+        label = sandbox_name or "baseline"
+        ACTIVITY_CONCURRENCY_LIMIT.set_function(lambda: self.limiter.limit, sandbox=label)
+        ACTIVITIES_IN_FLIGHT.set_function(lambda: self.limiter.in_flight, sandbox=label)
+        self.label = label
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _LimitedActivityInboundInterceptor(next, self)
+
+class _LimitedActivityInboundInterceptor(ActivityInboundInterceptor):
+
+    def __init__(self, next: ActivityInboundInterceptor, outer: AdaptiveConcurrencyInterceptor):
+        super().__init__(next)
+        self.outer = outer
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        limiter = self.outer.limiter
+        waited = time.perf_counter()
+        await limiter.acquire()
+        started = time.perf_counter()
+        ACTIVITY_SLOT_WAIT.observe(started - waited, sandbox=self.outer.label)
+        error = True
+        try:
+            result = await self.next.execute_activity(input)
+            error = getattr(result, "success", True) is False
+            return result
+        finally:
+            limiter.release(time.perf_counter() - started, error)
+
+def create_adaptive_limiter(max_limit: int) -> Optional[AdaptiveConcurrencyLimiter]:
+    """
+    Limiter configured from the environment, or None unless WORKER_ADAPTIVE_CONCURRENCY=true:
+      WORKER_ADAPTIVE_MIN_ACTIVITIES      lower bound of the limit (default 4)
+      WORKER_ADAPTIVE_TARGET_LATENCY_MS   mean activity latency above which the limit is cut (default 2000)
+      WORKER_ADAPTIVE_MAX_ERROR_RATE      error rate above which the limit is cut (default 0.05)
+      WORKER_ADAPTIVE_WINDOW              completions per adjustment (default 20)
+    The upper bound is the worker's max concurrent activities.
+    """
+    if os.getenv("WORKER_ADAPTIVE_CONCURRENCY", "false").lower() != "true":
+        return None
+    return AdaptiveConcurrencyLimiter(
+        min_limit=int(os.getenv("WORKER_ADAPTIVE_MIN_ACTIVITIES", str(DEFAULT_MIN_LIMIT))),
+        max_limit=max_limit,
+        target_latency=float(os.getenv("WORKER_ADAPTIVE_TARGET_LATENCY_MS", str(DEFAULT_TARGET_LATENCY_MS))) / 1000,
+        max_error_rate=float(os.getenv("WORKER_ADAPTIVE_MAX_ERROR_RATE", str(DEFAULT_MAX_ERROR_RATE))),
+        window=int(os.getenv("WORKER_ADAPTIVE_WINDOW", str(DEFAULT_WINDOW))),
+    )
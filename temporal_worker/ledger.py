@@ -0,0 +1,207 @@
+import os
+import time
+import zlib
+import asyncio
+from dataclasses import dataclass, asdict, field
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+
+from account_store import AccountStore, BalanceUpdate, create_account_store
+from metrics import LEDGER_LOCK_WAIT, LEDGER_CONTENDED, DEPOSIT_BATCH_SIZE
+
+# Off by default: the stores apply each update atomically, and holding a shard lock across
+# the round trip only serializes a hot account's updates (see benchmarks/ledger_contention.py)
+DEFAULT_LEDGER_SHARDS = 0
+DEFAULT_COALESCE_WINDOW_MS = 0 # deposit coalescing is off unless a window is configured
+DEFAULT_COALESCE_MAX_ITEMS = 100
+
+@dataclass
+class ShardStats:
+    """Lock statistics for one shard"""
+    acquisitions: int = 0
+    contended: int = 0 # acquisitions that had to wait for another holder
+    wait_seconds: float = 0.0
+    max_waiters: int = 0
+
+class _Shard:
+
+    def __init__(self, index: int):
+        self.label = str(index)
+        self.lock = asyncio.Lock()
+        self.waiters = 0
+        self.stats = ShardStats()
+
+class ShardedLedger(AccountStore):
+    """
+    Serializes balance updates per account without a global lock.
+
+    Accounts are spread over shards by a stable hash of the account ID, and each shard
+    has its own asyncio lock, held for the whole store round trip. Updates to different
+    accounts proceed in parallel; only updates to accounts in the same shard wait for
+    each other. With one shard this degenerates to a global lock.
+    """
+
+    def __init__(self, store: AccountStore, shards: int = 64):
+        self.store = store
+        self._shards = [_Shard(index) for index in range(max(1, shards))]
+
+    def _shard(self, account_id: str) -> _Shard:
+        return self._shards[zlib.crc32(account_id.encode("utf-8")) % len(self._shards)]
+
+    async def _locked(self, account_id: str, operation, *args):
+        shard = self._shard(account_id)
+        stats = shard.stats
+        if not shard.lock.locked() and not shard.waiters:
+            async with shard.lock:
+                stats.acquisitions += 1
+                return await operation(account_id, *args)
+
+        shard.waiters += 1
+        stats.max_waiters = max(stats.max_waiters, shard.waiters)
+        started = time.perf_counter()
+        try:
+            await shard.lock.acquire()
+        finally:
+            shard.waiters -= 1
+        waited = time.perf_counter() - started
+        stats.acquisitions += 1
+        stats.contended += 1
+        stats.wait_seconds += waited
+        LEDGER_CONTENDED.inc(shard=shard.label)
+        LEDGER_LOCK_WAIT.observe(waited, shard=shard.label)
+        try:
+            return await operation(account_id, *args)
+        finally:
+            shard.lock.release()
+
+    async def get_balance(self, account_id: str) -> Decimal:
+        # Reads don't need the lock; the store returns a committed balance
+        return await self.store.get_balance(account_id)
+
+    async def withdraw(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        return await self._locked(account_id, self.store.withdraw, amount)
+
+    async def deposit(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        return await self._locked(account_id, self.store.deposit, amount)
+
+    def check_amount(self, amount: Decimal) -> None:
+        self.store.check_amount(amount)
+
+    async def close(self) -> None:
+        await self.store.close()
+
+    def shard_stats(self) -> List[Dict]:
+        """Per-shard lock statistics, for shards that have been used."""
+        return [dict(asdict(shard.stats), shard=index) for index, shard in enumerate(self._shards)
+                if shard.stats.acquisitions]
+
+@dataclass
+class _DepositBatch:
+    items: List[Tuple[Decimal, "asyncio.Future[BalanceUpdate]"]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+    flushing: bool = False
+    writing: bool = False # the total is computed; deposits can no longer leave the batch
+
+class DepositCoalescer(AccountStore):
+    """
+    Merges concurrent deposits to the same account into one store write.
+
+    The first deposit to an account opens a batch; deposits arriving within
+    `window_ms`, up to `max_items`, join it. The batch is written as a single
+    deposit of the total, and each caller gets the balance as if the deposits had
+    been applied one by one in arrival order. Withdrawals pass straight through.
+    Each amount is checked before it joins a batch, so one bad deposit can't fail the others.
+    """
+
+    def __init__(self, store: AccountStore, window_ms: float, max_items: int = DEFAULT_COALESCE_MAX_ITEMS):
+        self.store = store
+        self.window = window_ms / 1000
+        self.max_items = max(1, max_items)
+        self._pending: Dict[str, _DepositBatch] = {}
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def get_balance(self, account_id: str) -> Decimal:
+        return await self.store.get_balance(account_id)
+
+    async def withdraw(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        return await self.store.withdraw(account_id, amount)
+
+    async def deposit(self, account_id: str, amount: Decimal) -> BalanceUpdate:
+        self.store.check_amount(amount)
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(account_id)
+        if batch is None:
+            batch = self._pending[account_id] = _DepositBatch()
+            batch.timer = loop.call_later(self.window, self._start_flush, account_id, batch)
+        item = (amount, loop.create_future())
+        batch.items.append(item)
+        if len(batch.items) >= self.max_items:
+            self._start_flush(account_id, batch)
+        while True:
+            try:
+                # Shielded, so cancelling the caller leaves the batch's own future to the write
+                return await asyncio.shield(item[1])
+            except asyncio.CancelledError:
+                if not batch.writing:
+                    # Left out of the batch, whose total isn't computed yet
+                    batch.items.remove(item)
+                    item[1].cancel()
+                    raise
+                # The write includes this deposit; report its outcome, or a retry would deposit it twice
+
+    def _start_flush(self, account_id: str, batch: _DepositBatch) -> None:
+        if batch.flushing:
+            return
+        batch.flushing = True
+        batch.timer.cancel()
+        if self._pending.get(account_id) is batch:
+            del self._pending[account_id]
+        task = asyncio.ensure_future(self._flush(account_id, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def check_amount(self, amount: Decimal) -> None:
+        self.store.check_amount(amount)
+
+    async def _flush(self, account_id: str, batch: _DepositBatch) -> None:
+        if not batch.items:
+            return
+        batch.writing = True
+        total = sum((amount for amount, _ in batch.items), Decimal(0))
+        try:
+            update = await self.store.deposit(account_id, total)
+        except Exception as e:
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        DEPOSIT_BATCH_SIZE.observe(len(batch.items))
+        balance = update.balance - total
+        for amount, future in batch.items:
+            balance += amount
+            if not future.done():
+                future.set_result(BalanceUpdate(success=True, balance=balance))
+
+    async def close(self) -> None:
+        for account_id, batch in list(self._pending.items()):
+            self._start_flush(account_id, batch)
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.store.close()
+
+def create_ledger() -> AccountStore:
+    """
+    Wraps the configured account store for the banking activities:
+      LEDGER_SHARDS                  shards of the ShardedLedger (default 0, which uses the store directly)
+      DEPOSIT_COALESCE_WINDOW_MS     merge deposits to one account arriving within this window (default 0, off)
+      DEPOSIT_COALESCE_MAX_ITEMS     write a batch early once it holds this many deposits (default 100)
+    """
+    store = create_account_store()
+    shards = int(os.getenv("LEDGER_SHARDS", str(DEFAULT_LEDGER_SHARDS)))
+    if shards > 0:
+        store = ShardedLedger(store, shards)
+    window_ms = float(os.getenv("DEPOSIT_COALESCE_WINDOW_MS", str(DEFAULT_COALESCE_WINDOW_MS)))
+    if window_ms > 0:
+        # Outside the ledger, if any, so deposits batch up while an earlier write holds the shard lock
+        store = DepositCoalescer(store, window_ms,
+                                 int(os.getenv("DEPOSIT_COALESCE_MAX_ITEMS", str(DEFAULT_COALESCE_MAX_ITEMS))))
+    return store
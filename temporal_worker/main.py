@@ -2,12 +2,59 @@ import asyncio
 import os
 import sys
 from platform_sdk import SandboxAwareWorker
-from workflows import MoneyTransferWorkflow
-from activities import BankingActivities
+from structured_logging import configure_logging
+from tracing import configure_tracing, shutdown_tracing
+from workflows import (
+    MoneyTransferWorkflow, LocalActivityMoneyTransferWorkflow, AccountActorMoneyTransferWorkflow,
+    AccountWorkflow, BatchTransferWorkflow,
+)
+from activities import DEFAULT_OPERATIONS_PER_RUN, AccountActorActivities, BankingActivities, load_transfer_page
+
+ACTIVITY_MODES = {
+    "remote": MoneyTransferWorkflow,
+    "local": LocalActivityMoneyTransferWorkflow,
+    "actor": AccountActorMoneyTransferWorkflow,
+}
+
+def build_worker(**options) -> SandboxAwareWorker:
+    """Builds the money-transfer worker from the environment; `options` are passed to SandboxAwareWorker."""
+    # "remote" (default) schedules withdraw/deposit through the server; "local" runs them as local
+    # activities; "actor" sends them to the accounts' AccountWorkflows
+    activity_mode = os.getenv("BANKING_ACTIVITY_MODE", "remote").lower()
+    if activity_mode not in ACTIVITY_MODES:
+        raise ValueError(f"unknown BANKING_ACTIVITY_MODE '{activity_mode}', expected one of {', '.join(ACTIVITY_MODES)}")
+    task_queue = os.getenv("TASK_QUEUE", "money-transfer")
+
+    # Create banking activities instance
+    banking_activities = BankingActivities()
+    # Starts account workflows with the worker's own client, once it has connected
+    actor_activities = AccountActorActivities(
+        client_factory=lambda: worker.connect(),
+        task_queue=task_queue,
+        operations_per_run=int(os.getenv("ACCOUNT_ACTOR_OPERATIONS_PER_RUN", str(DEFAULT_OPERATIONS_PER_RUN))),
+    )
+
+    # Create the sandbox-aware worker using the platform SDK
+    worker = SandboxAwareWorker(
+        task_queue=task_queue,
+        workflows=[ACTIVITY_MODES[activity_mode], AccountWorkflow, BatchTransferWorkflow],
+        activities=[
+            banking_activities.withdraw,
+            banking_activities.deposit,
+            banking_activities.load_balance,
+            actor_activities.send_account_operation,
+            load_transfer_page,
+        ],
+        **options,
+    )
+    return worker
 
 async def main():
     """Main entry point for the Temporal worker"""
     
+    configure_logging("temporal-worker")
+    configure_tracing("temporal-worker")
+
     print("=" * 60)
     print("TEMPORAL MONEY TRANSFER WORKER - BASELINE VERSION")
     print("=" * 60)
@@ -15,27 +62,18 @@ async def main():
     # Get configuration from environment variables
     task_queue = os.getenv("TASK_QUEUE", "money-transfer")
     sandbox_name = os.getenv("SANDBOX_NAME", "")
+    activity_mode = os.getenv("BANKING_ACTIVITY_MODE", "remote").lower()
     
     print(f"Configuration:")
     print(f"  Task Queue: {task_queue}")
     print(f"  Sandbox Name: {sandbox_name or 'baseline'}")
+    print(f"  Activity Mode: {activity_mode}")
     print(f"  Temporal Server: {os.getenv('TEMPORAL_SERVER_URL', 'temporal-server:7233')}")
     print(f"  Routes API: {os.getenv('ROUTES_API_URL', 'http://routes-api:8081')}")
     print()
     
     try:
-        # Create banking activities instance
-        banking_activities = BankingActivities()
-        
-        # Create the sandbox-aware worker using the platform SDK
-        worker = SandboxAwareWorker(
-            task_queue=task_queue,
-            workflows=[MoneyTransferWorkflow],
-            activities=[
-                banking_activities.withdraw,
-                banking_activities.deposit,
-            ]
-        )
+        worker = build_worker()
         
         print("Starting worker... Press Ctrl+C to stop")
         print("=" * 60)
@@ -48,6 +86,8 @@ async def main():
     except Exception as e:
         print(f"Fatal error: {e}")
         sys.exit(1)
+    finally:
+        shutdown_tracing()
 
 if __name__ == "__main__":
     # Run the main function
@@ -0,0 +1,251 @@
+import os
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from aiohttp import web
+from structured_logging import get_logger
+
+DEFAULT_METRICS_PORT = 8082
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # seconds
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+OVERHEAD_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01) # seconds
+
+LabelValues = Tuple[str, ...]
+
+log = get_logger("metrics")
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _sample_lines(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._sample_lines())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _sample_lines(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    """Gauge whose series are either set explicitly or computed by a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], Optional[float]]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, fn: Callable[[], Optional[float]], **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def _sample_lines(self) -> List[str]:
+        values = dict(self._values)
+        for key, fn in self._functions.items():
+            value = fn()
+            if value is not None: # None means "no sample yet"
+                values[key] = value
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: [count per bucket..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next((index for index, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = series
+            counts[index] += 1
+            total[0] += value
+
+    def _sample_lines(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in Prometheus text format.
+
+    Routing metrics are also updated from workflow activation threads, so each
+    metric locks its updates and its rendering.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Routing
+ROUTING_DECISIONS = REGISTRY.counter(
+    "worker_routing_decisions_total", "Routing decisions by sandbox, routing key and outcome",
+    ("sandbox", "routing_key", "decision"))
+ROUTING_CACHE_SIZE = REGISTRY.gauge(
+    "worker_routing_cache_keys", "Number of routing keys in the routing cache", ("sandbox",))
+ROUTING_CACHE_AGE = REGISTRY.gauge(
+    "worker_routing_cache_age_seconds", "Seconds since the routing cache was last confirmed current", ("sandbox",))
+ROUTE_FETCH_DURATION = REGISTRY.histogram(
+    "worker_route_fetch_duration_seconds", "Routing-rule fetch latency by HTTP status", ("sandbox", "status"))
+ROUTE_FETCH_ERRORS = REGISTRY.counter(
+    "worker_route_fetch_errors_total", "Failed routing-rule fetches", ("sandbox",))
+INTERCEPTOR_OVERHEAD = REGISTRY.histogram(
+    "worker_routing_interceptor_seconds", "Time spent making routing decisions in the interceptor",
+    ("kind",), buckets=OVERHEAD_BUCKETS)
+
+# Activities
+ACTIVITY_DURATION = REGISTRY.histogram(
+    "worker_activity_duration_seconds", "Activity execution latency", ("activity", "outcome"))
+
+# Concurrency
+ACTIVITY_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "worker_activity_concurrency_limit", "Current adaptive limit on concurrently running activities", ("sandbox",))
+ACTIVITIES_IN_FLIGHT = REGISTRY.gauge(
+    "worker_activities_in_flight", "Activities holding an adaptive concurrency slot", ("sandbox",))
+ACTIVITY_SLOT_WAIT = REGISTRY.histogram(
+    "worker_activity_slot_wait_seconds", "Time activities waited for an adaptive concurrency slot", ("sandbox",))
+
+# Ledger
+LEDGER_CONTENDED = REGISTRY.counter(
+    "worker_ledger_lock_contended_total", "Ledger updates that waited for another update in the same shard", ("shard",))
+LEDGER_LOCK_WAIT = REGISTRY.histogram(
+    "worker_ledger_lock_wait_seconds", "Time contended ledger updates waited for their shard lock", ("shard",))
+DEPOSIT_BATCH_SIZE = REGISTRY.histogram(
+    "worker_deposit_batch_size", "Deposits merged into each coalesced store write", buckets=BATCH_SIZE_BUCKETS)
+
+# name -> check; /readyz succeeds once every registered check returns True
+_readiness_checks: Dict[str, Callable[[], bool]] = {}
+
+def register_readiness_check(name: str, check: Callable[[], bool]) -> None:
+    _readiness_checks[name] = check
+
+def unregister_readiness_check(name: str) -> None:
+    _readiness_checks.pop(name, None)
+
+class MetricsServer:
+    """Serves the registry at /metrics, and readiness at /readyz, on a local HTTP port."""
+
+    def __init__(self, port: int, registry: MetricsRegistry = REGISTRY):
+        self.port = port
+        self.registry = registry
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self._handle_metrics)
+        self.app.router.add_get("/readyz", self._handle_ready)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.registry.render().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def _handle_ready(self, request: web.Request) -> web.Response:
+        checks = {name: bool(check()) for name, check in list(_readiness_checks.items())}
+        ready = bool(checks) and all(checks.values())
+        return web.json_response({"ready": ready, "checks": checks}, status=200 if ready else 503)
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "0.0.0.0", self.port).start()
+        log.info("Serving Prometheus metrics", event="metrics.serving", port=self.port, path="/metrics")
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+_server: Optional[MetricsServer] = None
+
+async def start_metrics_server(port: Optional[int] = None) -> Optional[MetricsServer]:
+    """Starts the process-wide metrics server once; METRICS_PORT=0 disables it."""
+    global _server
+    if _server is None:
+        port = int(os.getenv("METRICS_PORT", str(DEFAULT_METRICS_PORT))) if port is None else port
+        if port <= 0:
+            return None
+        server = MetricsServer(port)
+        await server.start()
+        _server = server
+    return _server
@@ -1,5 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
+from typing import List, Optional
 
 @dataclass
 class PaymentDetails:
@@ -48,4 +49,76 @@ class DepositResponse:
     amount: str
     balance_after: str
     success: bool
-    message: str = ""
\ No newline at end of file
+    message: str = ""
+
+@dataclass
+class BatchTransferSummary:
+    """Aggregate outcome of a batch, carried across continue-as-new"""
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    failure_samples: List[str] = field(default_factory=list) # first few failure messages only
+
+@dataclass
+class BatchTransferRequest:
+    """
+    Batch workflow input. Transfers are given inline, at most `transfers_per_run`
+    of them, or as `transfers_ref`: an NDJSON file of transfers under the workers'
+    BATCH_TRANSFERS_DIR, for batches too large for a workflow payload.
+    """
+    transfers: List[PaymentDetails] = field(default_factory=list)
+    transfers_ref: str = ""
+    max_parallel: int = 20
+    transfers_per_run: int = 500 # children per run before continuing as new
+    offset: int = 0 # position of the next transfer in transfers_ref
+    min_run_seconds: float = 0.0 # a continued run starts no sooner than this after the previous one started
+    summary: BatchTransferSummary = field(default_factory=BatchTransferSummary)
+
+@dataclass
+class TransferPageRequest:
+    """load_transfer_page activity input"""
+    transfers_ref: str
+    offset: int
+    limit: int
+
+@dataclass
+class AccountOperation:
+    """
+    An operation sent to an AccountWorkflow; its outcome is signalled back to reply_workflow_id.
+    Kinds: "debit" and "credit" change the balance; "cancel" stops target_operation_id from
+    being applied, or returns its outcome if it already was; "ack" tells the account workflow
+    that the sender is done, so the outcomes of its operations can be dropped.
+    """
+    operation_id: str # unique within the sender's run; resends reuse it, so an operation is applied at most once
+    account_id: str
+    kind: str
+    amount: str = "0"
+    reference: str = ""
+    sender_run_id: str = ""
+    reply_workflow_id: str = ""
+    target_operation_id: str = "" # for "cancel"
+
+@dataclass
+class AccountOperationResult:
+    """Outcome of an AccountOperation, signalled to the workflow that sent it"""
+    operation_id: str
+    success: bool
+    balance_after: str
+    message: str = ""
+    cancelled: bool = False # the operation will never be applied
+
+@dataclass
+class SenderOutcomes:
+    """Outcomes of one sender run's operations on an account, kept until the sender acknowledges them"""
+    sender_run_id: str
+    first_applied_at: float # workflow time, seconds since the epoch
+    results: List[AccountOperationResult] = field(default_factory=list)
+
+@dataclass
+class AccountState:
+    """AccountWorkflow input, carried across continue-as-new"""
+    account_id: str
+    balance: Optional[str] = None # loaded from the account store when None
+    pending: List[AccountOperation] = field(default_factory=list) # received, not yet applied
+    outcomes: List[SenderOutcomes] = field(default_factory=list) # not yet acknowledged, for deduplication
+    operations_per_run: int = 1000 # operations applied before continuing as new
@@ -0,0 +1,134 @@
+import os
+import json
+import zlib
+import dataclasses
+from typing import Any, List, Optional, Sequence
+
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter, PayloadCodec
+
+try:
+    import msgpack
+except ImportError: # Optional: without it payloads stay JSON and are only compressed
+    msgpack = None
+
+# Shared by temporal_worker and py_client; keep both copies identical.
+
+ENCODING = b"binary/compact"
+DEFAULT_COMPRESS_THRESHOLD = 128 # bytes of encoded body above which zlib is tried; account operations are just above it
+
+# Payload data is: version byte, flags byte, body
+FLAG_ZLIB = 0x01
+FLAG_MSGPACK = 0x02 # body is msgpack with interned keys, else the original JSON
+
+# Object keys replaced by their index in msgpack bodies. A version's table never
+# changes once released: new keys go into a new version that extends the last
+# table, and every version stays decodable so old histories replay.
+KEY_TABLES = {
+    1: (
+        "from_account", "to_account", "amount", "currency", "reference",
+        "account_id", "transaction_id", "balance_after", "success", "message",
+        "total", "completed", "failed", "skipped", "failure_samples",
+        "transfers", "transfers_ref", "max_parallel", "transfers_per_run", "offset",
+        "summary", "limit",
+    ),
+    # v1 plus the account actor's state and messages, and batch pacing
+    2: (
+        "from_account", "to_account", "amount", "currency", "reference",
+        "account_id", "transaction_id", "balance_after", "success", "message",
+        "total", "completed", "failed", "skipped", "failure_samples",
+        "transfers", "transfers_ref", "max_parallel", "transfers_per_run", "offset",
+        "summary", "limit",
+        "operation_id", "kind", "sender_run_id", "reply_workflow_id", "target_operation_id",
+        "cancelled", "first_applied_at", "results", "balance", "pending", "outcomes",
+        "operations_per_run", "min_run_seconds",
+    ),
+}
+CURRENT_VERSION = max(KEY_TABLES)
+_KEY_INDEXES = {version: {key: index for index, key in enumerate(table)} for version, table in KEY_TABLES.items()}
+
+def _intern(value: Any, indexes: dict) -> Any:
+    if isinstance(value, dict):
+        return {indexes.get(key, key): _intern(item, indexes) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_intern(item, indexes) for item in value]
+    return value
+
+def _restore(value: Any, table: tuple) -> Any:
+    if isinstance(value, dict):
+        # JSON keys are always strings, so an int key can only be an interned one
+        return {table[key] if isinstance(key, int) else key: _restore(item, table) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore(item, table) for item in value]
+    return value
+
+class CompactPayloadCodec(PayloadCodec):
+    """
+    Re-encodes JSON payloads as msgpack with interned object keys, compressing
+    bodies larger than `compress_threshold` when zlib makes them smaller.
+
+    Decoding accepts every version in KEY_TABLES and passes other payloads through,
+    so the codec can be installed with `encode=False` everywhere before any worker
+    or client starts writing compact payloads, and switched off again safely.
+    """
+
+    def __init__(self, encode: bool = True, compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+                 version: int = CURRENT_VERSION):
+        if version not in KEY_TABLES:
+            raise ValueError(f"Unsupported compact payload version {version}")
+        self.encode_enabled = encode
+        self.compress_threshold = compress_threshold
+        self.version = version
+
+    def _encode_one(self, payload: Payload) -> Payload:
+        if payload.metadata.get("encoding") != b"json/plain" or len(payload.metadata) != 1:
+            return payload # Only plain JSON is re-encoded; anything else keeps its own encoding
+        body, flags = payload.data, 0
+        if msgpack is not None:
+            try:
+                body = msgpack.packb(_intern(json.loads(body), _KEY_INDEXES[self.version]), use_bin_type=True)
+                flags |= FLAG_MSGPACK
+            except (OverflowError, ValueError):
+                pass # e.g. integers outside 64 bits; keep the JSON
+        if len(body) > self.compress_threshold:
+            compressed = zlib.compress(body)
+            if len(compressed) < len(body):
+                body, flags = compressed, flags | FLAG_ZLIB
+        return Payload(metadata={"encoding": ENCODING}, data=bytes((self.version, flags)) + body)
+
+    def _decode_one(self, payload: Payload) -> Payload:
+        if payload.metadata.get("encoding") != ENCODING:
+            return payload
+        version, flags, body = payload.data[0], payload.data[1], payload.data[2:]
+        if version not in KEY_TABLES:
+            raise ValueError(f"Unsupported compact payload version {version}")
+        if flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        if flags & FLAG_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("Compact payload needs msgpack to decode; install it")
+            value = _restore(msgpack.unpackb(body, raw=False, strict_map_key=False), KEY_TABLES[version])
+            body = json.dumps(value, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        return Payload(metadata={"encoding": b"json/plain"}, data=body)
+
+    async def encode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        if not self.encode_enabled:
+            return list(payloads)
+        return [self._encode_one(payload) for payload in payloads]
+
+    async def decode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        return [self._decode_one(payload) for payload in payloads]
+
+def data_converter_from_env(encode: Optional[bool] = None) -> DataConverter:
+    """
+    Data converter for clients and workers. Compact payloads are always decoded;
+    they are written only with PAYLOAD_CODEC=compact (or `encode=True`).
+    PAYLOAD_CODEC_COMPRESS_THRESHOLD sets the compression threshold in bytes, and
+    PAYLOAD_CODEC_VERSION the version written (default the latest), to hold back a new
+    version until every client and worker can decode it.
+    """
+    if encode is None:
+        encode = os.getenv("PAYLOAD_CODEC", "json").lower() == "compact"
+    threshold = int(os.getenv("PAYLOAD_CODEC_COMPRESS_THRESHOLD", str(DEFAULT_COMPRESS_THRESHOLD)))
+    version = int(os.getenv("PAYLOAD_CODEC_VERSION", str(CURRENT_VERSION)))
+    return dataclasses.replace(DataConverter.default, payload_codec=CompactPayloadCodec(encode, threshold, version))
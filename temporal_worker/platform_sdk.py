@@ -1,24 +1,49 @@
 import os
 import asyncio
+import concurrent.futures
+import json
+import logging
+import random
+import threading
 import time # For monotonic time
 import aiohttp
-from typing import List, Any, Optional, Set, Dict, Type
+from collections import OrderedDict
+from datetime import timedelta
+from dataclasses import dataclass, asdict
+from typing import List, Any, Awaitable, Callable, Mapping, NoReturn, Optional, Set, Dict, Type, Union
 from temporalio.api.common.v1 import Payload
 from urllib.parse import urlencode, urlunparse, urlparse, ParseResult
 
 from temporalio.worker import Worker, Interceptor
 from temporalio.client import Client
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
 from temporalio.worker._interceptor import (
+    ContinueAsNewInput,
     ExecuteActivityInput,
     ExecuteWorkflowInput,
+    StartActivityInput,
+    StartChildWorkflowInput,
+    StartLocalActivityInput,
     WorkflowInboundInterceptor,
+    WorkflowOutboundInterceptor,
     ActivityInboundInterceptor,
     WorkflowInterceptorClassInput
 )
 from temporalio.exceptions import ApplicationError # For non-retryable errors
+from temporalio import activity
 import temporalio.workflow as workflow # For accessing workflow context
-from opentelemetry import baggage
-from opentelemetry.baggage.propagation import W3CBaggagePropagator
+from temporalio.contrib.opentelemetry import workflow as traced_workflow
+from baggage import extract_routing_key
+from structured_logging import get_logger
+from concurrency import AdaptiveConcurrencyInterceptor, create_adaptive_limiter
+from shared_routing_cache import shared_cache_feed
+from payload_codec import data_converter_from_env
+from tracing import get_tracer, tracing_interceptors
+from metrics import (
+    ACTIVITY_DURATION, INTERCEPTOR_OVERHEAD, ROUTE_FETCH_DURATION, ROUTE_FETCH_ERRORS,
+    ROUTING_CACHE_AGE, ROUTING_CACHE_SIZE, ROUTING_DECISIONS, register_readiness_check, start_metrics_server,
+    unregister_readiness_check,
+)
 
 # Default config values mirroring the python example (can be overridden by env vars)
 DEFAULT_ROUTE_SERVER_ADDR = "http://localhost" # Default address for the routing rules API
@@ -26,15 +51,75 @@ DEFAULT_BASELINE_KIND = "Deployment"
 DEFAULT_BASELINE_NAMESPACE = "temporal"
 DEFAULT_BASELINE_NAME = "temporal-worker-baseline" # Placeholder, configure as needed
 DEFAULT_REFRESH_INTERVAL = 5 # seconds
-ROUTING_KEY = "sd-routing-key"
+DEFAULT_MAX_BACKOFF = 60 # seconds, upper bound for the retry delay after failed fetches
+DEFAULT_REQUEST_TIMEOUT = 10 # seconds
+DEFAULT_DECISION_CACHE_SIZE = 10000 # workflow runs whose routing decision is remembered for their activities
+DEFAULT_WATCH_IDLE_TIMEOUT = 60 # seconds without any bytes (events or heartbeats) before a watch is considered dead
+ROUTING_RULES_PATH = '/api/v1/workloads/routing-rules'
+ROUTING_RULES_WATCH_PATH = '/api/v1/workloads/routing-rules/watch'
+WATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+DEFAULT_SNAPSHOT_MAX_AGE = 86400 # seconds; older persisted snapshots are ignored at startup
+MIN_WATCH_STREAM_SECONDS = 10 # watch streams that end sooner count as failures and reconnect with backoff
+SNAPSHOT_REFRESH_INTERVAL = 60 # seconds; an unchanged snapshot is rewritten this often so its saved_at stays current
+DEFAULT_STARTUP_TIMEOUT = 30 # seconds a worker waits for routing rules before it starts polling anyway
+SNAPSHOT_FORMAT_VERSION = 1
+DEFAULT_MAX_CONCURRENT_ACTIVITIES = 100 # temporalio's default; also the adaptive limit's upper bound
+
+# "selective": every worker polls the task queue and skips tasks that aren't theirs.
+# "sandbox-queue": sandbox workers poll <task queue>@<sandbox>, where the client starts their workflows.
+ROUTING_MODES = ("selective", "sandbox-queue")
+SANDBOX_QUEUE_SEPARATOR = "@"
+
+# Worker tuning: env var -> (temporalio.worker.Worker argument, type). Unset vars keep the SDK defaults.
+WORKER_OPTION_ENV = {
+    "WORKER_MAX_CONCURRENT_ACTIVITIES": ("max_concurrent_activities", int),
+    "WORKER_MAX_CONCURRENT_LOCAL_ACTIVITIES": ("max_concurrent_local_activities", int),
+    "WORKER_MAX_CONCURRENT_WORKFLOW_TASKS": ("max_concurrent_workflow_tasks", int),
+    "WORKER_MAX_CACHED_WORKFLOWS": ("max_cached_workflows", int), # sticky cache size
+    "WORKER_MAX_CONCURRENT_WORKFLOW_TASK_POLLS": ("max_concurrent_workflow_task_polls", int),
+    "WORKER_MAX_CONCURRENT_ACTIVITY_TASK_POLLS": ("max_concurrent_activity_task_polls", int),
+    "WORKER_MAX_ACTIVITIES_PER_SECOND": ("max_activities_per_second", float),
+    "WORKER_MAX_TASK_QUEUE_ACTIVITIES_PER_SECOND": ("max_task_queue_activities_per_second", float),
+}
+
+def routing_mode_from_env() -> str:
+    mode = os.getenv("ROUTING_MODE", "selective").lower()
+    if mode not in ROUTING_MODES:
+        raise ValueError(f"unknown ROUTING_MODE '{mode}', expected 'selective' or 'sandbox-queue'")
+    return mode
+
+# Activity header naming the sandbox whose worker ran the scheduling workflow task ("" for the baseline)
+ROUTING_TARGET_HEADER = "sd-routing-target"
+
+def sandbox_task_queue(task_queue: str, sandbox_name: str) -> str:
+    """Task queue polled by a sandbox's workers in sandbox-queue mode. Must match the client's routing.py."""
+    return f"{task_queue}{SANDBOX_QUEUE_SEPARATOR}{sandbox_name}" if sandbox_name else task_queue
+
+tracer = get_tracer("platform_sdk")
+log = get_logger("platform_sdk")
+routing_log = get_logger("platform_sdk.routing") # per-task decisions; LOG_ROUTING_TRACE logs all of them
+
+@dataclass
+class FetchStats:
+    """Cost and outcome of routing-rule fetches, for observability"""
+    total_fetches: int = 0
+    not_modified: int = 0 # 304 responses, i.e. refreshes that cost no payload
+    errors: int = 0
+    consecutive_failures: int = 0
+    last_status: Optional[int] = None
+    last_duration_seconds: float = 0.0
+    total_duration_seconds: float = 0.0
+    last_error: str = ""
+    watch_events: int = 0 # deltas and snapshots applied from a watch stream
+    watch_reconnects: int = 0
 
 class RoutesAPIClient:
 
-    def __init__(self, sandbox_name: str):
+    def __init__(self, sandbox_name: str, route_server_addr: Optional[str] = None):
         self.sandbox_name = sandbox_name # Current sandbox name, empty for baseline
 
         # Configuration from environment variables or defaults
-        self.route_server_addr_base = os.getenv("ROUTES_API_ROUTE_SERVER_ADDR", DEFAULT_ROUTE_SERVER_ADDR)
+        self.route_server_addr_base = route_server_addr or os.getenv("ROUTES_API_ROUTE_SERVER_ADDR", DEFAULT_ROUTE_SERVER_ADDR)
         parsed_addr = urlparse(self.route_server_addr_base)
         self.route_server_scheme = parsed_addr.scheme or "http"
         self.route_server_netloc = parsed_addr.netloc
@@ -44,14 +129,128 @@ class RoutesAPIClient:
         self.baseline_name = os.getenv("ROUTES_API_BASELINE_NAME", DEFAULT_BASELINE_NAME)
         
         self.refresh_interval = int(os.getenv("ROUTES_API_REFRESH_INTERVAL_SECONDS", str(DEFAULT_REFRESH_INTERVAL)))
+        self.max_backoff = int(os.getenv("ROUTES_API_MAX_BACKOFF_SECONDS", str(DEFAULT_MAX_BACKOFF)))
+        self.request_timeout = int(os.getenv("ROUTES_API_REQUEST_TIMEOUT_SECONDS", str(DEFAULT_REQUEST_TIMEOUT)))
+        # Watch mode holds a streaming connection open and applies deltas as they arrive,
+        # falling back to polling when the route server has no watch endpoint.
+        self.watch_enabled = os.getenv("ROUTES_API_WATCH_ENABLED", "false").lower() == "true"
+        self.watch_idle_timeout = int(os.getenv("ROUTES_API_WATCH_IDLE_TIMEOUT_SECONDS", str(DEFAULT_WATCH_IDLE_TIMEOUT)))
+        self._watch_failures = 0
+
+        # One keep-alive session for the lifetime of the client, created lazily on the running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Validators from the last 200 response, replayed so an unchanged rule set costs a 304
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self.fetch_stats = FetchStats()
 
         self._routing_keys_cache: Set[str] = set()
         self._cache_update_lock = asyncio.Lock() # Lock for initiating an update
         self._cache_updated_event = asyncio.Event() # Event to signal update completion
         self._last_successful_update_time: float = 0.0 # Using time.monotonic()
         self._is_first_update_done = False # Tracks if the first fetch attempt has completed        
+        # Called with the routing keys whenever the cache is confirmed current, e.g. to share one fetch between processes
+        self._listeners: List[Callable[[Set[str]], None]] = []
+
+        self._metrics_label = self.sandbox_name or "baseline"
+        ROUTING_CACHE_SIZE.set_function(lambda: len(self._routing_keys_cache), sandbox=self._metrics_label)
+        ROUTING_CACHE_AGE.set_function(self.cache_age_seconds, sandbox=self._metrics_label)
+
+        # Last known routing keys, kept on disk so a restarted worker routes correctly before its first fetch
+        self.snapshot_path = os.getenv("ROUTES_API_SNAPSHOT_PATH", "")
+        self.snapshot_max_age = float(os.getenv("ROUTES_API_SNAPSHOT_MAX_AGE_SECONDS", str(DEFAULT_SNAPSHOT_MAX_AGE)))
+        self._persisted_keys: Optional[Set[str]] = None
+        self._persisted_at = 0.0 # wall-clock saved_at of the snapshot on disk
+        if self.snapshot_path:
+            self.load_persisted_snapshot()
+            self.add_listener(self._persist_snapshot)
+
+    def add_listener(self, listener: Callable[[Set[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify_listeners(self) -> None:
+        for listener in self._listeners:
+            try:
+                listener(self._routing_keys_cache)
+            except Exception as e:
+                log.warning("Routing cache listener failed", event="routes.listener_error", error=repr(e))
+
+    def apply_snapshot(self, routing_keys: Set[str], age_seconds: float = 0.0) -> None:
+        """Installs routing keys fetched elsewhere, for clients that don't fetch themselves (see SandboxAwareWorker routes_feed)."""
+        self._routing_keys_cache = set(routing_keys)
+        self._is_first_update_done = True
+        self.mark_current(age_seconds)
+
+    def mark_current(self, age_seconds: float = 0.0) -> None:
+        """Records that the cache was confirmed current `age_seconds` ago."""
+        self._last_successful_update_time = time.monotonic() - age_seconds
+
+    def load_persisted_snapshot(self) -> bool:
+        """Installs the snapshot at snapshot_path if it was written for the same routing-rules query and isn't too old."""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            log.warning("Could not read routing snapshot", event="routes.snapshot_error", path=self.snapshot_path, error=str(e))
+            return False
+        age = max(0.0, time.time() - float(snapshot.get("saved_at", 0)))
+        if snapshot.get("version") != SNAPSHOT_FORMAT_VERSION or snapshot.get("routes_url") != self._build_routes_url():
+            log.info("Ignoring routing snapshot for another query", event="routes.snapshot_ignored", path=self.snapshot_path)
+            return False
+        if age > self.snapshot_max_age:
+            log.info("Ignoring stale routing snapshot", event="routes.snapshot_ignored", path=self.snapshot_path,
+                     age_seconds=round(age, 1))
+            return False
+        self._persisted_keys = set(snapshot.get("routing_keys", []))
+        self._persisted_at = float(snapshot["saved_at"])
+        self.apply_snapshot(self._persisted_keys, age_seconds=age)
+        log.info("Loaded routing snapshot", event="routes.snapshot_loaded", path=self.snapshot_path,
+                 key_count=len(self._persisted_keys), age_seconds=round(age, 1))
+        return True
+
+    def _persist_snapshot(self, routing_keys: Set[str]) -> None:
+        """
+        Listener writing the routing keys to snapshot_path when they change, and at least every
+        SNAPSHOT_REFRESH_INTERVAL while they're confirmed current, so a long-unchanged snapshot
+        isn't rejected as stale at startup. The rename makes the update atomic.
+        """
+        now = time.time()
+        if routing_keys == self._persisted_keys and now - self._persisted_at < SNAPSHOT_REFRESH_INTERVAL:
+            return
+        snapshot = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "routes_url": self._build_routes_url(),
+            "saved_at": now,
+            "routing_keys": sorted(routing_keys),
+        }
+        temp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.snapshot_path)
+            self._persisted_keys = set(routing_keys)
+            self._persisted_at = now
+        except OSError as e:
+            log.warning("Could not persist routing snapshot", event="routes.snapshot_error", path=self.snapshot_path, error=str(e))
+
+    async def wait_until_populated(self, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for the cache to hold routing rules, from a snapshot or a fetch."""
+        deadline = time.monotonic() + timeout
+        while not self._is_first_update_done:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
 
-    def _build_routes_url(self) -> str:
+    def cache_age_seconds(self) -> Optional[float]:
+        """Seconds since the routing cache was last confirmed current, or None before the first update."""
+        if not self._is_first_update_done:
+            return None
+        return time.monotonic() - self._last_successful_update_time
+
+    def _build_routes_url(self, path: str = ROUTING_RULES_PATH) -> str:
         
         query_params = {
             'baselineKind': self.baseline_kind,
@@ -61,8 +260,6 @@ class RoutesAPIClient:
         if self.sandbox_name:
             query_params['destinationSandboxName'] = self.sandbox_name
         
-        path = '/api/v1/workloads/routing-rules'
-        
         url_parts = ParseResult(
             scheme=self.route_server_scheme,
             netloc=self.route_server_netloc,
@@ -73,32 +270,192 @@ class RoutesAPIClient:
         )
         return urlunparse(url_parts)
 
-    async def _perform_fetch_and_update(self) -> None:
-        
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                # Room for a watch stream plus a fallback fetch
+                connector=aiohttp.TCPConnector(limit=2, keepalive_timeout=max(30, self.refresh_interval * 3)),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
+
+    def _parse_routing_keys(self, data: Any) -> Set[str]:
+        new_routing_keys = set()
+        if isinstance(data, dict) and 'routingRules' in data and isinstance(data['routingRules'], list):
+            for rule in data['routingRules']:
+                if isinstance(rule, dict) and 'routingKey' in rule and rule['routingKey'] is not None:
+                    new_routing_keys.add(str(rule['routingKey']))
+        return new_routing_keys
+
+    def _record_fetch(self, started: float, status: Optional[int], error: str = "") -> None:
+        stats = self.fetch_stats
+        duration = time.monotonic() - started
+        stats.total_fetches += 1
+        stats.last_status = status
+        stats.last_duration_seconds = duration
+        stats.total_duration_seconds += duration
+        ROUTE_FETCH_DURATION.observe(duration, sandbox=self._metrics_label, status=str(status) if status else "error")
+        if error:
+            ROUTE_FETCH_ERRORS.inc(sandbox=self._metrics_label)
+            stats.errors += 1
+            stats.consecutive_failures += 1
+            stats.last_error = error
+        else:
+            stats.consecutive_failures = 0
+            if status == 304:
+                stats.not_modified += 1
+
+    async def _perform_fetch_and_update(self) -> bool:
+        """Fetches the routing rules once, returning whether the cache is now current."""
         url = self._build_routes_url()
-        print(f"RoutesAPIClient: Fetching routes from {url}")
+        log.debug("Fetching routes", event="routes.fetch", url=url)
+        started = time.monotonic()
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        new_routing_keys = set()                        
-                        if isinstance(data, dict) and 'routingRules' in data and isinstance(data['routingRules'], list):
-                            for rule in data['routingRules']:
-                                if isinstance(rule, dict) and 'routingKey' in rule and rule['routingKey'] is not None:
-                                    new_routing_keys.add(str(rule['routingKey']))
-                        
-                        self._routing_keys_cache = new_routing_keys
-                        self._last_successful_update_time = time.monotonic()
-                        self._is_first_update_done = True
-                        print(f"RoutesAPIClient: Routing keys updated: {list(self._routing_keys_cache)}")
-                    else:
-                        print(f"RoutesAPIClient: Error fetching routes. Status: {response.status}, Body: {await response.text()}")
+            async with self._get_session().get(url, headers=self._conditional_headers()) as response:
+                if response.status == 304:
+                    self._last_successful_update_time = time.monotonic()
+                    self._record_fetch(started, response.status)
+                    log.debug("Routing rules unchanged", event="routes.not_modified",
+                              duration_ms=round(self.fetch_stats.last_duration_seconds * 1000, 1))
+                    self._notify_listeners()
+                    return True
+                if response.status == 200:
+                    data = await response.json()
+                    self._routing_keys_cache = self._parse_routing_keys(data)
+                    self._etag = response.headers.get('ETag')
+                    self._last_modified = response.headers.get('Last-Modified')
+                    self._last_successful_update_time = time.monotonic()
+                    self._is_first_update_done = True
+                    self._record_fetch(started, response.status)
+                    log.info("Routing keys updated", event="routes.updated", sandbox=self._metrics_label,
+                             key_count=len(self._routing_keys_cache),
+                             duration_ms=round(self.fetch_stats.last_duration_seconds * 1000, 1))
+                    routing_log.debug("Routing key set", event="routing.keys", routing_keys=sorted(self._routing_keys_cache))
+                    self._notify_listeners()
+                    return True
+                body = await response.text()
+                self._record_fetch(started, response.status, error=f"HTTP {response.status}")
+                log.warning("Error fetching routes", event="routes.fetch_error", status=response.status, body=body[:512])
         except aiohttp.ClientError as e:
-            print(f"RoutesAPIClient: HTTP client error fetching routes: {e}")
+            self._record_fetch(started, None, error=str(e) or type(e).__name__)
+            log.warning("HTTP client error fetching routes", event="routes.fetch_error", error=str(e))
         except Exception as e:
-            print(f"RoutesAPIClient: Error during route fetch/parse: {e}")
+            self._record_fetch(started, None, error=str(e) or type(e).__name__)
+            log.warning("Error during route fetch/parse", event="routes.fetch_error", error=str(e))
+        return False
+
+    def _backoff_delay(self, failures: int) -> float:
+        """Jittered exponential backoff, capped at max_backoff."""
+        backoff = min(self.max_backoff, self.refresh_interval * (2 ** min(failures, 16)))
+        return random.uniform(backoff / 2, backoff)
+
+    def _next_refresh_delay(self) -> float:
+        """Regular interval while healthy; jittered exponential backoff after failures."""
+        failures = self.fetch_stats.consecutive_failures
+        if failures == 0:
+            return self.refresh_interval
+        return self._backoff_delay(failures)
+
+    def _apply_watch_event(self, event_type: str, data: str) -> None:
+        """Applies one watch event. The cache set is replaced, never mutated, so readers see consistent sets."""
+        payload = json.loads(data) if data else {}
+        if event_type == 'snapshot':
+            self._routing_keys_cache = self._parse_routing_keys(payload)
+            self._is_first_update_done = True
+        elif event_type == 'add' and payload.get('routingKey') is not None:
+            self._routing_keys_cache = self._routing_keys_cache | {str(payload['routingKey'])}
+        elif event_type == 'remove' and payload.get('routingKey') is not None:
+            self._routing_keys_cache = self._routing_keys_cache - {str(payload['routingKey'])}
+        else:
+            log.warning("Ignoring unknown watch event", event="routes.watch_unknown", watch_event=event_type)
+            return
+        self._last_successful_update_time = time.monotonic()
+        self.fetch_stats.watch_events += 1
+        log.info("Watch event applied", event="routes.watch_event", watch_event=event_type,
+                 routing_key=payload.get('routingKey'), key_count=len(self._routing_keys_cache))
+        self._notify_listeners()
+
+    async def _watch_routes(self) -> bool:
+        """
+        Holds a server-sent events stream open and applies routing-rule deltas until it ends.
+        Returns False if the route server does not support watching.
+        """
+        url = self._build_routes_url(path=ROUTING_RULES_WATCH_PATH)
+        log.info("Watching routes", event="routes.watch", url=url)
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.request_timeout, sock_read=self.watch_idle_timeout)
+        async with self._get_session().get(url, headers={'Accept': 'text/event-stream'}, timeout=timeout) as response:
+            if response.status in WATCH_UNSUPPORTED_STATUSES:
+                return False
+            if response.status != 200:
+                raise RuntimeError(f"Watch request failed with status {response.status}")
+
+            event_type, data_lines = 'message', []
+            async for raw_line in response.content:
+                line = raw_line.decode('utf-8').rstrip('\r\n')
+                if not line: # A blank line terminates an event
+                    if data_lines:
+                        self._apply_watch_event(event_type, '\n'.join(data_lines))
+                    event_type, data_lines = 'message', []
+                elif line.startswith(':'): # Heartbeat comment: the stream, and so the cache, is still live
+                    self._last_successful_update_time = time.monotonic()
+                    if self._is_first_update_done:
+                        self._notify_listeners()
+                else:
+                    field, _, value = line.partition(':')
+                    value = value[1:] if value.startswith(' ') else value
+                    if field == 'event':
+                        event_type = value
+                    elif field == 'data':
+                        data_lines.append(value)
+        return True
+
+    async def _watch_cache_updater(self) -> None:
+        """Keeps a watch stream open, reconnecting with backoff. Returns once watching turns out to be unsupported."""
+        while True:
+            opened = time.monotonic()
+            error = None
+            try:
+                if not await self._watch_routes():
+                    log.warning("Route server does not support watching, falling back to polling", event="routes.watch_unsupported")
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            lasted = time.monotonic() - opened >= MIN_WATCH_STREAM_SECONDS
+            if lasted:
+                self._watch_failures = 0
+            if error is None and lasted:
+                log.info("Watch stream ended, reconnecting", event="routes.watch_ended")
+            else:
+                # Errors, and streams that end right away (e.g. cut by a proxy), back off instead of reconnecting in a loop
+                self._watch_failures += 1
+                log.warning("Watch stream error" if error else "Watch stream ended early", event="routes.watch_error",
+                            error=repr(error) if error else None, failures=self._watch_failures)
+                # Keep the cache fresh by polling while the stream is down
+                await self._ensure_cache_fresh()
+                await asyncio.sleep(self._backoff_delay(self._watch_failures))
+            self.fetch_stats.watch_reconnects += 1
+
+    def get_fetch_stats(self) -> Dict[str, Any]:
+        stats = asdict(self.fetch_stats)
+        stats['cache_age_seconds'] = self.cache_age_seconds()
+        stats['routing_key_count'] = len(self._routing_keys_cache)
+        return stats
 
     async def _ensure_cache_fresh(self) -> None:
 
@@ -107,9 +464,7 @@ class RoutesAPIClient:
                        (current_time - self._last_successful_update_time > self.refresh_interval)
         if needs_update:
             if self._cache_update_lock.locked():
-                print("RoutesAPIClient: Update in progress by another task, waiting...")
                 await self._cache_updated_event.wait()
-                print("RoutesAPIClient: Update completed by another task or wait timed out.")
             else:
                 async with self._cache_update_lock:
                     current_time_after_lock = time.monotonic() # Re-check time after acquiring lock
@@ -121,22 +476,22 @@ class RoutesAPIClient:
                             await self._perform_fetch_and_update()
                         finally:
                             self._cache_updated_event.set()
-                            print("RoutesAPIClient: Cache update cycle finished, event set.")
                     else:
                         # Cache was updated by another task while this one was waiting for the lock
                         if not self._cache_updated_event.is_set(): self._cache_updated_event.set()
 
     async def _periodic_cache_updater(self):
-        print("RoutesAPIClient: Starting periodic cache updater...")
+        log.info("Starting cache updater", event="routes.updater_started", sandbox=self._metrics_label, watch=self.watch_enabled)
         try:
+            if self.watch_enabled:
+                await self._watch_cache_updater()
             while True:
-                print(f"RoutesAPIClient: Periodic cache updater triggering refresh for sandbox '{self.sandbox_name or 'baseline'}'.")
                 await self._ensure_cache_fresh()
-                await asyncio.sleep(self.refresh_interval)
+                await asyncio.sleep(self._next_refresh_delay())
         except asyncio.CancelledError:
-            print(f"RoutesAPIClient: Periodic cache updater for sandbox '{self.sandbox_name or 'baseline'}' cancelled.")
+            log.info("Cache updater cancelled", event="routes.updater_stopped", sandbox=self._metrics_label)
         except Exception as e:
-            print(f"RoutesAPIClient: Periodic cache updater for sandbox '{self.sandbox_name or 'baseline'}' error: {e}")
+            log.exception("Cache updater failed", event="routes.updater_error", sandbox=self._metrics_label)
             # Depending on the error, you might want to add retry logic or stop
 
     async def should_process(self, routing_key: Optional[str]) -> bool:
@@ -145,44 +500,120 @@ class RoutesAPIClient:
         current_cached_keys = self._routing_keys_cache
 
         if self.sandbox_name: # This is a sandboxed workload
-            if routing_key is None:
-                print(f"RoutesAPIClient (Sandbox: {self.sandbox_name}): Skipping task, no routing key provided.")
-                return False
-            
-            should = routing_key in current_cached_keys
-            log_action = "Processing" if should else "Skipping"
-            print(f"RoutesAPIClient (Sandbox: {self.sandbox_name}): {log_action} task with routing key '{routing_key}'. Key in cache: {should}. Cache: {list(current_cached_keys)}.")
-            return should
+            # Only tasks whose routing key targets this sandbox
+            should = routing_key is not None and routing_key in current_cached_keys
         else: # This is a baseline workload
-            if routing_key is None:
-                print(f"RoutesAPIClient (Baseline): Processing task, no routing key provided.")
-                return True 
-            
-            should = routing_key not in current_cached_keys
-            log_action = "Processing" if should else "Skipping"
-            print(f"RoutesAPIClient (Baseline): {log_action} task with routing key '{routing_key}'. Key in cache: {not should}. Cache: {list(current_cached_keys)}.")
-            return should       
+            # Everything except tasks routed to a sandbox
+            should = routing_key is None or routing_key not in current_cached_keys
+
+        decision = "processed" if should else "skipped"
+        ROUTING_DECISIONS.inc(sandbox=self._metrics_label, routing_key=routing_key or "none", decision=decision)
+        routing_log.log(logging.DEBUG if should else logging.INFO, "Routing decision", event=f"routing.{decision}",
+                        sandbox=self._metrics_label, routing_key=routing_key)
+        return should
 
 class SkipExecutionError(Exception):
     """Exception to skip execution of tasks not meant for this worker"""
     pass
 
+class _SkippedTaskLogFilter(logging.Filter):
+    """
+    Drops temporalio's "Failed activation" warning, with its traceback, for workflow tasks
+    skipped with SkipExecutionError; the skip is already logged, rate limited, as routing.skipped.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        error = record.exc_info[1] if record.exc_info else None
+        # Matched by name: the workflow sandbox may load its own copy of this module
+        return type(error).__name__ != SkipExecutionError.__name__
+
+# Logs the activation failure of every workflow task a worker fails
+WORKFLOW_ACTIVATION_LOGGER = "temporalio.worker._workflow_instance"
+_skipped_task_log_filter = _SkippedTaskLogFilter()
+
+class RoutingDecisionCache:
+    """
+    Bounded LRU of routing decisions keyed by workflow run ID. Workflow decisions
+    are made on workflow activation threads, so access is locked.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_DECISION_CACHE_SIZE):
+        self.max_size = max_size
+        self._decisions: "OrderedDict[str, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, run_id: str) -> Optional[bool]:
+        with self._lock:
+            decision = self._decisions.get(run_id)
+            if decision is not None:
+                self._decisions.move_to_end(run_id)
+            return decision
+
+    def put(self, run_id: str, decision: bool) -> None:
+        with self._lock:
+            self._decisions[run_id] = decision
+            self._decisions.move_to_end(run_id)
+            if len(self._decisions) > self.max_size:
+                self._decisions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
 class SelectiveTaskInterceptor(Interceptor):
     
-    def __init__(self, routes_client: RoutesAPIClient):
+    def __init__(self, routes_client: RoutesAPIClient, enforce: bool = True, activity_task_queue: Optional[str] = None):
         super().__init__() 
-        self.sandbox_name = os.getenv("SANDBOX_NAME", "")
+        self.sandbox_name = routes_client.sandbox_name
         self.routes_client = routes_client
+        # Without enforcement every task is processed; baggage propagation and activity metrics remain
+        self.enforce = enforce
+        # Activities of workflows run here are scheduled on this queue, which only this sandbox polls;
+        # the activity guard below is a backstop for misconfigured queues
+        self.activity_task_queue = activity_task_queue
+        self.decision_cache = RoutingDecisionCache(
+            int(os.getenv("ROUTING_DECISION_CACHE_SIZE", str(DEFAULT_DECISION_CACHE_SIZE)))
+        )
 
-    def extract_routing_key_from_baggage(self, baggage_header_value: str) -> str :
+    def extract_routing_key_from_baggage(self, baggage_header_value: Union[str, bytes]) -> Optional[str]:
+        # Memoized fast path; accepts the raw header payload bytes without decoding
+        return extract_routing_key(baggage_header_value)
 
-        if not baggage_header_value:
-            return None
-        
-        carrier ={'baggage': baggage_header_value}
-        ctx = W3CBaggagePropagator().extract(carrier=carrier)
+    async def decide(self, run_id: str, headers: Mapping[str, Payload]) -> bool:
+        """
+        Routing decision for a workflow run. Only decisions to process are cached: a run
+        skipped here is decided again on its next task, so a routing rule that arrives
+        later takes effect instead of the skip sticking for the whole run.
+        """
+        if not self.enforce:
+            return True
+        if self.decision_cache.get(run_id):
+            return True
+        routing_key = self.extract_routing_key_from_baggage(headers["baggage"].data) if "baggage" in headers else None
+        decision = await self.routes_client.should_process(routing_key)
+        if decision:
+            self.decision_cache.put(run_id, decision)
+        return decision
+
+    async def activity_allowed(self, run_id: str, headers: Mapping[str, Payload]) -> bool:
+        """
+        Whether an activity belongs here. The scheduling workflow's decision travels in the
+        routing target header, so it holds on every worker; without the header the run's
+        cached decision, or its baggage, is used.
+        """
+        if not self.enforce:
+            return True
+        if ROUTING_TARGET_HEADER in headers:
+            return headers[ROUTING_TARGET_HEADER].data.decode() == (self.sandbox_name or "")
+        return await self.timed_decide("activity", run_id, headers)
+
+    async def timed_decide(self, kind: str, run_id: str, headers: Mapping[str, Payload]) -> bool:
+        started = time.perf_counter()
+        decision = await self.decide(run_id, headers)
+        INTERCEPTOR_OVERHEAD.observe(time.perf_counter() - started, kind=kind)
+        return decision
 
-        return baggage.get_baggage(ROUTING_KEY, ctx)
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _SelectiveActivityInboundInterceptor(next, self)
 
     def workflow_interceptor_class(self, input: WorkflowInterceptorClassInput) -> Optional[Type[WorkflowInboundInterceptor]]:
 
@@ -196,43 +627,199 @@ class SelectiveTaskInterceptor(Interceptor):
                 self.sandbox_name = outer_self.sandbox_name
                 self.outer = outer_self
 
+            def init(self, outbound: WorkflowOutboundInterceptor) -> None:
+                super().init(_BaggageWorkflowOutboundInterceptor(
+                    outbound, outer_self.activity_task_queue, outer_self.sandbox_name if outer_self.enforce else None,
+                ))
+
             async def execute_workflow(self, input: ExecuteWorkflowInput) -> Any:
-                
-                try:           
-                    
-                    workflow_info = workflow.info()
-                    headers = workflow_info.headers if hasattr(workflow_info, 'headers') else {}
-
-                    baggage = headers.get("baggage").data.decode('utf-8') if "baggage" in headers else ""
-                    # Get routing key from baggage header
-                    routing_key = self.outer.extract_routing_key_from_baggage(baggage) if baggage else ""
-                    
-                    # Check if we should process this workflow
-                    if self.routes_client and not await self.routes_client.should_process(routing_key):
-                        print(f"Skipping workflow with routing key {routing_key} (sandbox: {self.sandbox_name})")
-                        raise SkipExecutionError(f"Workflow not for sandbox {self.sandbox_name}")
-                    
-                    # Process the workflow
-                    
-                    return await self.next.execute_workflow(input)
-                except Exception as e:
-                    print(f"DEBUG: Error accessing workflow context: {e}")
+                workflow_info = workflow.info()
+                headers = workflow_info.headers if hasattr(workflow_info, 'headers') else {}
+
+                # Check if we should process this workflow; positive decisions are cached for its later tasks
+                if workflow.unsafe.is_replaying():
+                    decision = await self.outer.decide(workflow_info.run_id, headers)
+                else:
+                    started = time.perf_counter()
+                    decision = await self.outer.timed_decide("workflow", workflow_info.run_id, headers)
+                    # Workflow code can't hold a span open; record the decision as a finished span under RunWorkflow
+                    traced_workflow.completed_span("RoutingDecision", attributes={
+                        "routing.sandbox": self.sandbox_name or "baseline",
+                        "routing.process": decision,
+                        "routing.decision_ms": round((time.perf_counter() - started) * 1000, 3),
+                    })
+                if self.routes_client and not decision:
+                    # Fails this workflow task so the server retries it, instead of completing the run here
+                    raise SkipExecutionError(f"Workflow not for sandbox {self.sandbox_name}")
+
+                return await self.next.execute_workflow(input)
 
         return _SelectiveWorkflowInboundInterceptor
 
+class _BaggageWorkflowOutboundInterceptor(WorkflowOutboundInterceptor):
+    """
+    Copies the workflow's baggage onto its activities, child workflows and next run so any worker can route them.
+    With an `activity_task_queue`, activities that don't name a queue are scheduled there.
+    With a `routing_target`, activities carry it so the worker that runs them can check it.
+    """
+
+    def __init__(self, next: WorkflowOutboundInterceptor, activity_task_queue: Optional[str] = None,
+                 routing_target: Optional[str] = None):
+        super().__init__(next)
+        self.activity_task_queue = activity_task_queue
+        self.routing_target = routing_target
+
+    def _with_baggage(self, headers: Mapping[str, Payload]) -> Mapping[str, Payload]:
+        workflow_headers = workflow.info().headers
+        if "baggage" in workflow_headers and "baggage" not in headers:
+            return {**headers, "baggage": workflow_headers["baggage"]}
+        return headers
+
+    def _with_routing_target(self, headers: Mapping[str, Payload]) -> Mapping[str, Payload]:
+        if self.routing_target is None:
+            return headers
+        return {**headers, ROUTING_TARGET_HEADER: Payload(data=self.routing_target.encode())}
+
+    def start_activity(self, input: StartActivityInput) -> workflow.ActivityHandle:
+        input.headers = self._with_routing_target(self._with_baggage(input.headers))
+        if self.activity_task_queue and not input.task_queue:
+            input.task_queue = self.activity_task_queue
+        return super().start_activity(input)
+
+    def start_local_activity(self, input: StartLocalActivityInput) -> workflow.ActivityHandle:
+        input.headers = self._with_routing_target(self._with_baggage(input.headers))
+        return super().start_local_activity(input)
+
+    async def start_child_workflow(self, input: StartChildWorkflowInput) -> workflow.ChildWorkflowHandle:
+        input.headers = self._with_baggage(input.headers)
+        return await super().start_child_workflow(input)
+
+    def continue_as_new(self, input: ContinueAsNewInput) -> NoReturn:
+        input.headers = self._with_baggage(input.headers)
+        super().continue_as_new(input)
+
+class _SelectiveActivityInboundInterceptor(ActivityInboundInterceptor):
+    """
+    Records activity durations and rejects activities that don't belong to this worker before
+    they run. Task queues already keep activities on the right worker, so this only catches
+    misconfiguration. Temporal can't hand an activity task back, so a rejection always uses up
+    an attempt; it is non-retryable because a retry would land on the same queue.
+    """
+
+    def __init__(self, next: ActivityInboundInterceptor, selective: SelectiveTaskInterceptor):
+        super().__init__(next)
+        self.selective = selective
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        if not await self.selective.activity_allowed(info.workflow_run_id, input.headers):
+            ACTIVITY_DURATION.observe(0.0, activity=info.activity_type, outcome="rejected")
+            raise ApplicationError(
+                f"Activity {info.activity_type} of run {info.workflow_run_id} not for sandbox {self.selective.sandbox_name}",
+                type="MisroutedActivity", non_retryable=True,
+            )
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            result = await self.next.execute_activity(input)
+            outcome = "completed"
+            return result
+        finally:
+            ACTIVITY_DURATION.observe(time.perf_counter() - started, activity=info.activity_type, outcome=outcome)
+
 
 class SandboxAwareWorker:
     
-    def __init__(self, task_queue: str, workflows: List[Any], activities: List[Any]):
+    def __init__(
+        self,
+        task_queue: str,
+        workflows: List[Any],
+        activities: List[Any],
+        sandbox_name: Optional[str] = None,
+        client: Optional[Client] = None,
+        route_server_addr: Optional[str] = None,
+        interceptors: Optional[List[Interceptor]] = None,
+        worker_options: Optional[Dict[str, Any]] = None,
+        routes_feed: Optional[Callable[[RoutesAPIClient], Awaitable[None]]] = None,
+    ):
         self.task_queue = task_queue
         self.workflows = workflows
         self.activities = activities
-        self.sandbox_name = os.getenv("SANDBOX_NAME", "")
-        self.routes_client = RoutesAPIClient(sandbox_name=self.sandbox_name)
+        # Explicit arguments override the environment, which lets several workers share a process
+        self.sandbox_name = os.getenv("SANDBOX_NAME", "") if sandbox_name is None else sandbox_name
+        self.client = client
+        self.routing_mode = routing_mode_from_env()
+        # In sandbox-queue mode a sandbox polls only its own queue, so it never sees other tasks
+        self.poll_task_queue = sandbox_task_queue(task_queue, self.sandbox_name) \
+            if self.routing_mode == "sandbox-queue" else task_queue
+        # In selective mode a sandbox shares the workflow queue but takes its activities on its
+        # own queue, so no other worker can pick them up and it never picks up anyone else's
+        self.activity_task_queue = sandbox_task_queue(task_queue, self.sandbox_name) \
+            if self.routing_mode == "selective" and self.sandbox_name else None
+        self.extra_interceptors = interceptors or []
+        # temporalio.worker.Worker keyword arguments; explicit options override the WORKER_* environment
+        self.worker_options = {**self._worker_options_from_env(), **(worker_options or {})}
+        self.routes_client = RoutesAPIClient(sandbox_name=self.sandbox_name, route_server_addr=route_server_addr)
+        # Keeps routes_client current in place of its own fetching, e.g. from a supervisor process
+        if routes_feed is None and os.getenv("ROUTES_API_CACHE_MODE", "local").lower() == "shared":
+            routes_feed = shared_cache_feed
+        self.routes_feed = routes_feed
+        self.startup_timeout = float(os.getenv("ROUTES_API_STARTUP_TIMEOUT_SECONDS", str(DEFAULT_STARTUP_TIMEOUT)))
+        self._polling = False
+        self._readiness_name = f"worker:{self.poll_task_queue}"
         self._cache_updater_task: Optional[asyncio.Task] = None    
 
+    @staticmethod
+    def _worker_options_from_env() -> Dict[str, Any]:
+        options: Dict[str, Any] = {}
+        for env_name, (option, parse) in WORKER_OPTION_ENV.items():
+            value = os.getenv(env_name, "")
+            if value:
+                options[option] = parse(value)
+        threads = int(os.getenv("WORKER_ACTIVITY_EXECUTOR_THREADS", "0"))
+        if threads > 0:
+            # Only used by synchronous (non-async) activities
+            options["activity_executor"] = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        grace = os.getenv("WORKER_GRACEFUL_SHUTDOWN_SECONDS", "")
+        if grace:
+            options["graceful_shutdown_timeout"] = timedelta(seconds=float(grace))
+        return options
+
+    def _build_interceptors(self) -> List[Interceptor]:
+        # Tracing is outermost so its spans cover routing; routing runs next
+        interceptors: List[Interceptor] = tracing_interceptors() + [
+            SelectiveTaskInterceptor(self.routes_client, enforce=self.routing_mode == "selective",
+                                     activity_task_queue=self.activity_task_queue)
+        ]
+        limiter = create_adaptive_limiter(
+            self.worker_options.get("max_concurrent_activities", DEFAULT_MAX_CONCURRENT_ACTIVITIES))
+        if limiter is not None:
+            interceptors.append(AdaptiveConcurrencyInterceptor(limiter, self.sandbox_name))
+        return interceptors + self.extra_interceptors
+
+    def is_ready(self) -> bool:
+        """Polling Temporal, with routing rules to decide by when this mode needs them."""
+        return self._polling and (self.routing_mode != "selective" or self.routes_client._is_first_update_done)
+
+    def _build_runtime(self) -> Optional[Runtime]:
+        """Runtime exporting Temporal's own SDK metrics, when TEMPORAL_METRICS_BIND_ADDRESS is set."""
+        bind_address = os.getenv("TEMPORAL_METRICS_BIND_ADDRESS", "")
+        if not bind_address:
+            return None
+        return Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=bind_address)))
+
+    async def connect(self) -> Client:
+        """The worker's Temporal client, connecting on first use; activities that start workflows share it."""
+        if self.client is None:
+            temporal_url = os.getenv("TEMPORAL_SERVER_URL", "temporal-server:7233")
+            self.client = await Client.connect(temporal_url, runtime=self._build_runtime(),
+                                               data_converter=data_converter_from_env())
+            log.info("Connected to Temporal server", event="worker.connected", temporal_url=temporal_url)
+        return self.client
+
     async def run(self):
-        print(f"Sandbox Name: {self.sandbox_name or 'baseline'}")
+        log.info("Starting worker", event="worker.starting", sandbox=self.sandbox_name or "baseline",
+                 task_queue=self.poll_task_queue, routing_mode=self.routing_mode)
         workflow_names = []
         for w in self.workflows:
             if hasattr(w, '__name__'):
@@ -243,23 +830,54 @@ class SandboxAwareWorker:
                  workflow_names.append(str(w))
 
         try:
-            self._cache_updater_task = asyncio.create_task(self.routes_client._periodic_cache_updater())
-            temporal_url = os.getenv("TEMPORAL_SERVER_URL", "temporal-server:7233")
-            client = await Client.connect(temporal_url)
-            print(f"Connected to Temporal server: {temporal_url}")
+            register_readiness_check(self._readiness_name, self.is_ready)
+            activation_logger = logging.getLogger(WORKFLOW_ACTIVATION_LOGGER)
+            if _skipped_task_log_filter not in activation_logger.filters:
+                activation_logger.addFilter(_skipped_task_log_filter)
+            await start_metrics_server()
+            if self.routes_feed is not None:
+                self._cache_updater_task = asyncio.create_task(self.routes_feed(self.routes_client))
+            elif self.routing_mode == "selective":
+                self._cache_updater_task = asyncio.create_task(self.routes_client._periodic_cache_updater())
+            # In sandbox-queue mode nothing here reads the routing rules; the client resolves queues
+            client = await self.connect()
             
-            worker = Worker(
+            interceptors = self._build_interceptors()
+            workers = [Worker(
                 client,
-                task_queue=self.task_queue,
+                task_queue=self.poll_task_queue,
                 workflows=self.workflows,
                 activities=self.activities,
-                interceptors=[SelectiveTaskInterceptor(self.routes_client)] 
-            )
+                interceptors=interceptors,
+                # Activities stay registered for local activities, but remote ones are polled on the activity queue
+                **({**self.worker_options, "no_remote_activities": True} if self.activity_task_queue else self.worker_options),
+            )]
+            if self.activity_task_queue and self.activities:
+                workers.append(Worker(
+                    client,
+                    task_queue=self.activity_task_queue,
+                    activities=self.activities,
+                    interceptors=interceptors,
+                    **self.worker_options,
+                ))
             
-            print(f"Worker created successfully. Starting to poll for tasks...")
-            await worker.run()
+            # Polling with an empty cache would misroute: the baseline would take sandbox tasks
+            # and a sandbox would skip everything. Wait for rules, but not forever.
+            if self.routing_mode == "selective" and not await self.routes_client.wait_until_populated(self.startup_timeout):
+                log.warning("No routing rules before the startup deadline, polling anyway", event="worker.routes_timeout",
+                            timeout_seconds=self.startup_timeout)
+
+            log.info("Worker created, polling for tasks", event="worker.polling", activity_task_queue=self.activity_task_queue)
+            self._polling = True
+            await asyncio.gather(*(worker.run() for worker in workers))
             
         except Exception as e:
-            print(f"Error running worker: {e}")
+            log.exception("Error running worker", event="worker.error")
             raise
+        finally:
+            self._polling = False
+            unregister_readiness_check(self._readiness_name)
+            if self._cache_updater_task:
+                self._cache_updater_task.cancel()
+            await self.routes_client.close()
 
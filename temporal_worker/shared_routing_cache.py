@@ -0,0 +1,139 @@
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import asyncio
+import hashlib
+import tempfile
+from typing import List, Optional, Set, Tuple
+
+from structured_logging import get_logger
+
+DEFAULT_CAPACITY = 1024 * 1024 # bytes of routing keys a snapshot can hold
+DEFAULT_POLL_INTERVAL_MS = 100
+DEFAULT_SHARED_CACHE_DIR = "/dev/shm"
+READ_ATTEMPTS = 100 # a reader gives up for this poll if a write stays in progress
+
+# seq (odd while a write is in progress), version, updated_at (wall clock), payload length
+_HEADER = struct.Struct("<QQdI")
+
+log = get_logger("shared_routing_cache")
+
+class SharedRoutingSnapshot:
+    """
+    Routing keys in a memory-mapped file, shared by every process on a node.
+
+    A single writer publishes snapshots under a sequence lock: it makes `seq` odd,
+    writes, then makes it even again. Readers never lock; they retry if `seq` was
+    odd or changed while they read. `version` only changes when the keys do, so a
+    reader can check it on every poll and parse the payload only after a change.
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = _HEADER.size + capacity
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._last_keys: Optional[List[str]] = None
+
+    def write(self, routing_keys: Set[str]) -> None:
+        """Publishes a snapshot. Only the elected writer may call this."""
+        keys = sorted(routing_keys)
+        seq, version, _, length = _HEADER.unpack_from(self._map, 0)
+        seq += seq % 2 # A previous writer died mid-write
+        if keys != self._last_keys:
+            payload = json.dumps(keys, separators=(",", ":")).encode("utf-8")
+            if len(payload) > self.capacity:
+                log.error("Routing snapshot exceeds shared cache capacity", event="routes.shared_overflow",
+                          size=len(payload), capacity=self.capacity)
+                return
+            version, length = version + 1, len(payload)
+        else:
+            payload = None # Unchanged keys: only confirm the snapshot is current
+        _HEADER.pack_into(self._map, 0, seq + 1, version, time.time(), length)
+        if payload is not None:
+            self._map[_HEADER.size:_HEADER.size + length] = payload
+            self._last_keys = keys
+        _HEADER.pack_into(self._map, 0, seq + 2, version, time.time(), length)
+
+    def read_header(self) -> Optional[Tuple[int, float]]:
+        """
+        Returns a consistent (version, updated_at), where version 0 means nothing has
+        been published yet, or None if a write was in progress throughout.
+        """
+        for _ in range(READ_ATTEMPTS):
+            seq, version, updated_at, _ = _HEADER.unpack_from(self._map, 0)
+            if seq % 2 == 0 and _HEADER.unpack_from(self._map, 0)[0] == seq:
+                return version, updated_at
+        return None
+
+    def read(self) -> Optional[Tuple[int, float, Set[str]]]:
+        """Returns a consistent (version, updated_at, routing keys), or None like read_header."""
+        for _ in range(READ_ATTEMPTS):
+            seq, version, updated_at, length = _HEADER.unpack_from(self._map, 0)
+            if seq % 2:
+                continue
+            payload = bytes(self._map[_HEADER.size:_HEADER.size + length])
+            if _HEADER.unpack_from(self._map, 0)[0] == seq:
+                return version, updated_at, set(json.loads(payload)) if version else set()
+        return None
+
+    def close(self) -> None:
+        self._map.close()
+
+def default_snapshot_path(routes_url: str) -> str:
+    """One snapshot per routing-rules query, so baseline and each sandbox share only with their own kind."""
+    directory = os.getenv("ROUTES_API_SHARED_CACHE_DIR", "")
+    if not directory:
+        directory = DEFAULT_SHARED_CACHE_DIR if os.path.isdir(DEFAULT_SHARED_CACHE_DIR) else tempfile.gettempdir()
+    digest = hashlib.sha1(routes_url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"temporal-routing-{digest}.snapshot")
+
+def _try_lock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+async def shared_cache_feed(routes_client, path: Optional[str] = None) -> None:
+    """
+    routes_feed that shares one routing-rules fetch between all processes on a node.
+
+    Processes race for an flock on the snapshot's lock file. The holder fetches as
+    usual and publishes every refresh to the shared snapshot; the others poll the
+    snapshot's version and install the keys when it changes. The kernel releases
+    the lock if the fetcher dies, and the next reader to try takes over.
+    """
+    path = path or default_snapshot_path(routes_client._build_routes_url())
+    snapshot = SharedRoutingSnapshot(path, int(os.getenv("ROUTES_API_SHARED_CACHE_BYTES", str(DEFAULT_CAPACITY))))
+    poll_interval = float(os.getenv("ROUTES_API_SHARED_CACHE_POLL_MS", str(DEFAULT_POLL_INTERVAL_MS))) / 1000
+    lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    seen_version = 0
+    try:
+        while True:
+            if _try_lock(lock_fd):
+                log.info("Elected routing-rules fetcher", event="routes.shared_elected", path=path, pid=os.getpid())
+                routes_client.add_listener(snapshot.write)
+                await routes_client._periodic_cache_updater()
+                return
+            header = snapshot.read_header()
+            if header and header[0] != seen_version:
+                current = snapshot.read()
+                if current:
+                    seen_version, updated_at, routing_keys = current
+                    routes_client.apply_snapshot(routing_keys, age_seconds=max(0.0, time.time() - updated_at))
+            elif header and header[0]:
+                routes_client.mark_current(age_seconds=max(0.0, time.time() - header[1]))
+            await asyncio.sleep(poll_interval)
+    finally:
+        os.close(lock_fd) # Releases the lock, if held
+        snapshot.close()
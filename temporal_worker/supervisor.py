@@ -0,0 +1,292 @@
+"""
+Multi-process worker supervisor.
+
+Runs WORKER_PROCESSES worker processes (default: the CPU count), each with its own
+SandboxAwareWorker and event loop, so a pod uses all of its cores. The supervisor
+fetches routing rules once and pushes every update to the children over pipes;
+children never poll the route server themselves. Crashed children are restarted
+with backoff, SIGTERM/SIGINT are forwarded as SIGTERM for a graceful drain, and
+/healthz reports the aggregate health of all children.
+
+    python supervisor.py
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import functools
+import multiprocessing
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Optional, Set
+
+from aiohttp import web
+
+from main import build_worker
+from metrics import DEFAULT_METRICS_PORT, register_readiness_check, start_metrics_server
+from platform_sdk import RoutesAPIClient
+from shared_routing_cache import shared_cache_feed
+from structured_logging import configure_logging, get_logger
+from tracing import configure_tracing, shutdown_tracing
+
+DEFAULT_HEALTH_PORT = 8083
+DEFAULT_HEARTBEAT_INTERVAL = 5 # seconds between child heartbeats
+DEFAULT_SHUTDOWN_TIMEOUT = 30 # seconds children get to drain before they are killed
+DEFAULT_MAX_RESTART_BACKOFF = 30 # seconds
+STABLE_AFTER = 60 # seconds a child must run before its restart backoff resets
+
+log = get_logger("supervisor")
+
+# Child process
+
+async def _pipe_feed(conn: Connection, routes_client: RoutesAPIClient) -> None:
+    """routes_feed for children: applies routing snapshots from the supervisor and sends heartbeats back."""
+    loop = asyncio.get_running_loop()
+    messages: asyncio.Queue = asyncio.Queue()
+
+    def on_readable() -> None:
+        try:
+            messages.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            loop.remove_reader(conn.fileno())
+            messages.put_nowait(None)
+
+    async def heartbeat() -> None:
+        interval = float(os.getenv("SUPERVISOR_HEARTBEAT_INTERVAL_SECONDS", str(DEFAULT_HEARTBEAT_INTERVAL)))
+        while True:
+            conn.send(("heartbeat", {
+                "pid": os.getpid(),
+                "routing_keys": len(routes_client._routing_keys_cache),
+                "cache_age_seconds": routes_client.cache_age_seconds(),
+            }))
+            await asyncio.sleep(interval)
+
+    loop.add_reader(conn.fileno(), on_readable)
+    heartbeats = asyncio.create_task(heartbeat())
+    try:
+        while True:
+            message = await messages.get()
+            if message is None:
+                # The supervisor is gone; drain like on SIGTERM rather than run unsupervised
+                log.error("Supervisor connection lost, shutting down", event="supervisor.orphaned")
+                signal.raise_signal(signal.SIGTERM)
+                return
+            kind, payload = message
+            if kind == "routes":
+                routes_client.apply_snapshot(set(payload))
+    finally:
+        heartbeats.cancel()
+
+async def _run_child(conn: Connection) -> None:
+    worker = build_worker(routes_feed=functools.partial(_pipe_feed, conn))
+    run = asyncio.create_task(worker.run())
+    # Cancelling Worker.run shuts the Temporal worker down gracefully
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, run.cancel)
+    try:
+        await run
+    except asyncio.CancelledError:
+        log.info("Worker drained", event="worker.drained")
+
+def _child_main(index: int, conn: Connection) -> None:
+    # Ctrl+C reaches the whole process group; children wait for the supervisor's SIGTERM instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Each child serves its own metrics on the next port up from the supervisor's
+    base_port = int(os.getenv("METRICS_PORT", str(DEFAULT_METRICS_PORT)))
+    os.environ["METRICS_PORT"] = str(base_port + 1 + index) if base_port > 0 else "0"
+    if index > 0:
+        # Only one process can bind the Temporal SDK metrics address
+        os.environ.pop("TEMPORAL_METRICS_BIND_ADDRESS", None)
+    configure_logging(f"temporal-worker-{index}")
+    configure_tracing("temporal-worker")
+    try:
+        asyncio.run(_run_child(conn))
+    finally:
+        shutdown_tracing()
+
+# Supervisor
+
+@dataclass
+class _Child:
+    index: int
+    process: multiprocessing.Process
+    conn: Connection
+    restarts: int = 0
+    started: float = field(default_factory=time.monotonic)
+    restart_at: Optional[float] = None
+    last_heartbeat: Optional[float] = None
+    status: Dict[str, Any] = field(default_factory=dict)
+
+class WorkerSupervisor:
+
+    def __init__(self, processes: Optional[int] = None, health_port: Optional[int] = None):
+        self.processes = processes or int(os.getenv("WORKER_PROCESSES", "0")) or os.cpu_count() or 1
+        self.health_port = int(os.getenv("SUPERVISOR_HEALTH_PORT", str(DEFAULT_HEALTH_PORT))) if health_port is None else health_port
+        self.heartbeat_interval = float(os.getenv("SUPERVISOR_HEARTBEAT_INTERVAL_SECONDS", str(DEFAULT_HEARTBEAT_INTERVAL)))
+        self.shutdown_timeout = float(os.getenv("SUPERVISOR_SHUTDOWN_TIMEOUT_SECONDS", str(DEFAULT_SHUTDOWN_TIMEOUT)))
+        # The one routing-rules fetch shared by all children
+        self.routes_client = RoutesAPIClient(sandbox_name=os.getenv("SANDBOX_NAME", ""))
+        self.routes_client.add_listener(self._broadcast_routes)
+        self._context = multiprocessing.get_context("spawn")
+        self._children: Dict[int, _Child] = {}
+        self._stopping: Optional[asyncio.Event] = None
+        self._health_runner: Optional[web.AppRunner] = None
+
+    def _spawn(self, index: int, restarts: int = 0) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_child_main, args=(index, child_conn), name=f"temporal-worker-{index}")
+        process.start()
+        child_conn.close()
+        child = _Child(index=index, process=process, conn=parent_conn, restarts=restarts)
+        self._children[index] = child
+        asyncio.get_running_loop().add_reader(parent_conn.fileno(), self._on_child_message, child)
+        if self.routes_client._is_first_update_done:
+            self._send(child, ("routes", sorted(self.routes_client._routing_keys_cache)))
+        log.info("Started worker process", event="supervisor.child_started", index=index, pid=process.pid, restarts=restarts)
+
+    def _send(self, child: _Child, message: Any) -> None:
+        try:
+            child.conn.send(message)
+        except (BrokenPipeError, OSError):
+            pass # The monitor restarts the child
+
+    def _broadcast_routes(self, routing_keys: Set[str]) -> None:
+        message = ("routes", sorted(routing_keys))
+        for child in self._children.values():
+            self._send(child, message)
+
+    def _on_child_message(self, child: _Child) -> None:
+        try:
+            kind, payload = child.conn.recv()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(child.conn.fileno())
+            return
+        if kind == "heartbeat":
+            child.last_heartbeat = time.monotonic()
+            child.status = payload
+
+    def _reap(self, child: _Child) -> None:
+        if child.conn.closed:
+            return
+        asyncio.get_running_loop().remove_reader(child.conn.fileno())
+        child.conn.close()
+        child.process.join(timeout=0)
+
+    async def _monitor(self) -> None:
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            for child in list(self._children.values()):
+                if child.process.is_alive():
+                    continue
+                if child.restart_at is None:
+                    self._reap(child)
+                    # Back off on crash loops; a child that ran for a while restarts immediately
+                    restarts = 0 if now - child.started > STABLE_AFTER else child.restarts + 1
+                    delay = min(DEFAULT_MAX_RESTART_BACKOFF, 2 ** restarts - 1)
+                    child.restarts, child.restart_at = restarts, now + delay
+                    log.warning("Worker process exited", event="supervisor.child_exited", index=child.index,
+                                exitcode=child.process.exitcode, restart_in_seconds=delay)
+                if now >= child.restart_at:
+                    self._spawn(child.index, child.restarts)
+            await asyncio.sleep(1)
+
+    def health(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        children = []
+        for child in sorted(self._children.values(), key=lambda c: c.index):
+            heartbeat_age = None if child.last_heartbeat is None else now - child.last_heartbeat
+            # A fresh child gets a few intervals to report in
+            reference_age = now - child.started if heartbeat_age is None else heartbeat_age
+            children.append({
+                "index": child.index,
+                "pid": child.process.pid,
+                "alive": child.process.is_alive(),
+                "restarts": child.restarts,
+                "heartbeat_age_seconds": None if heartbeat_age is None else round(heartbeat_age, 3),
+                "healthy": child.process.is_alive() and reference_age < self.heartbeat_interval * 3,
+                **child.status,
+            })
+        return {
+            "healthy": self.routes_client._is_first_update_done and all(child["healthy"] for child in children),
+            "processes": self.processes,
+            "routes": self.routes_client.get_fetch_stats(),
+            "children": children,
+        }
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        health = self.health()
+        return web.Response(status=200 if health["healthy"] else 503, content_type="application/json",
+                            text=json.dumps(health, default=str))
+
+    async def _start_health_server(self) -> None:
+        if self.health_port <= 0:
+            return
+        app = web.Application()
+        app.router.add_get("/healthz", self._handle_health)
+        self._health_runner = web.AppRunner(app)
+        await self._health_runner.setup()
+        await web.TCPSite(self._health_runner, "0.0.0.0", self.health_port).start()
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _drain(self) -> None:
+        """Forwards SIGTERM to every child and waits for them to drain, killing stragglers."""
+        children = [child for child in self._children.values() if child.process.is_alive()]
+        for child in children:
+            child.process.terminate()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for child in children:
+            await asyncio.to_thread(child.process.join, max(0.0, deadline - time.monotonic()))
+            if child.process.is_alive():
+                log.warning("Worker process did not drain in time, killing it", event="supervisor.child_killed",
+                            index=child.index, pid=child.process.pid)
+                child.process.kill()
+                await asyncio.to_thread(child.process.join)
+        for child in self._children.values():
+            self._reap(child)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.stop)
+
+        log.info("Starting supervisor", event="supervisor.starting", processes=self.processes)
+        register_readiness_check("supervisor", lambda: self.health()["healthy"])
+        await start_metrics_server()
+        await self._start_health_server()
+        if os.getenv("ROUTES_API_CACHE_MODE", "local").lower() == "shared":
+            # Supervisors on the same node elect one fetcher between them
+            updater = asyncio.create_task(shared_cache_feed(self.routes_client))
+        else:
+            updater = asyncio.create_task(self.routes_client._periodic_cache_updater())
+        for index in range(self.processes):
+            self._spawn(index)
+        monitor = asyncio.create_task(self._monitor())
+        try:
+            await self._stopping.wait()
+            log.info("Draining worker processes", event="supervisor.draining")
+        finally:
+            monitor.cancel()
+            await self._drain()
+            updater.cancel()
+            await asyncio.gather(updater, monitor, return_exceptions=True)
+            await self.routes_client.close()
+            if self._health_runner is not None:
+                await self._health_runner.cleanup()
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(signum)
+
+def main() -> None:
+    configure_logging("temporal-worker-supervisor")
+    try:
+        asyncio.run(WorkerSupervisor().run())
+    except Exception:
+        log.exception("Supervisor failed", event="supervisor.fatal")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The worker's modules are flat, imported from the temporal_worker directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+import workflows
+from models import AccountOperation
+from workflows import AccountWorkflow
+
+@pytest.fixture
+def account(monkeypatch) -> AccountWorkflow:
+    # _handle only needs workflow time from the workflow context
+    monkeypatch.setattr(workflows.workflow, "now", lambda: datetime(2026, 1, 1, tzinfo=timezone.utc))
+    account = AccountWorkflow()
+    account._balance = Decimal("100")
+    return account
+
+def operation(operation_id: str, kind: str, amount: str = "0", sender_run_id: str = "run-1",
+              target_operation_id: str = "") -> AccountOperation:
+    return AccountOperation(operation_id=operation_id, account_id="acc", kind=kind, amount=amount,
+                            sender_run_id=sender_run_id, target_operation_id=target_operation_id)
+
+def test_resent_operation_is_applied_once(account):
+    first = account._handle(operation("run-1-debit", "debit", "10"))
+    again = account._handle(operation("run-1-debit", "debit", "10"))
+    assert again == first
+    assert account._balance == Decimal("90")
+
+def test_cancel_before_apply_stops_late_delivery(account):
+    cancel = account._handle(operation("run-1-debit-cancel", "cancel", target_operation_id="run-1-debit"))
+    late = account._handle(operation("run-1-debit", "debit", "10"))
+    assert cancel.cancelled and late.cancelled
+    assert account._balance == Decimal("100")
+
+def test_cancel_after_apply_returns_outcome(account):
+    account._handle(operation("run-1-debit", "debit", "10"))
+    cancel = account._handle(operation("run-1-debit-cancel", "cancel", target_operation_id="run-1-debit"))
+    assert cancel.success and not cancel.cancelled
+    assert cancel.operation_id == "run-1-debit-cancel"
+    assert account._balance == Decimal("90")
+
+def test_ack_drops_only_that_senders_outcomes(account):
+    account._handle(operation("run-1-debit", "debit", "10"))
+    account._handle(operation("run-2-debit", "debit", "10", sender_run_id="run-2"))
+    assert account._handle(operation("run-1-ack", "ack")) is None
+    assert list(account._outcomes) == ["run-2"]
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from temporalio.worker._interceptor import ActivityInboundInterceptor, ExecuteActivityInput
+
+from concurrency import AdaptiveConcurrencyInterceptor, AdaptiveConcurrencyLimiter
+
+class FakeActivity(ActivityInboundInterceptor):
+    def __init__(self, result=None, error: bool = False):
+        super().__init__(None)
+        self.result = result
+        self.error = error
+        self.running = 0
+        self.gate = asyncio.Event()
+
+    async def execute_activity(self, input: ExecuteActivityInput):
+        self.running += 1
+        await self.gate.wait()
+        if self.error:
+            raise RuntimeError("activity failed")
+        return self.result
+
+def limited(limiter: AdaptiveConcurrencyLimiter, activity: FakeActivity) -> ActivityInboundInterceptor:
+    interceptor = AdaptiveConcurrencyInterceptor(limiter, sandbox_name="test")
+    return interceptor.intercept_activity(activity)
+
+def execute(interceptor: ActivityInboundInterceptor):
+    return interceptor.execute_activity(ExecuteActivityInput(fn=lambda: None, args=[], executor=None, headers={}))
+
+def test_activities_wait_for_a_free_slot():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1, target_latency=10, window=100)
+        activity = FakeActivity(result="done")
+        interceptor = limited(limiter, activity)
+        first = asyncio.create_task(execute(interceptor))
+        second = asyncio.create_task(execute(interceptor))
+        await asyncio.sleep(0.01)
+        assert activity.running == 1 # the second activity waits for the slot
+        activity.gate.set()
+        assert await asyncio.gather(first, second) == ["done", "done"]
+        assert activity.running == 2 and limiter.in_flight == 0
+    asyncio.run(run())
+
+def test_returned_failure_counts_as_error():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, target_latency=10, window=1, initial_limit=8)
+        activity = FakeActivity(result=SimpleNamespace(success=False))
+        activity.gate.set()
+        await execute(limited(limiter, activity))
+        assert limiter.limit < 8 and limiter.in_flight == 0
+    asyncio.run(run())
+
+def test_raised_error_counts_and_frees_the_slot():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, target_latency=10, window=1, initial_limit=8)
+        activity = FakeActivity(error=True)
+        activity.gate.set()
+        with pytest.raises(RuntimeError):
+            await execute(limited(limiter, activity))
+        assert limiter.limit < 8 and limiter.in_flight == 0
+    asyncio.run(run())
+
+def test_cancelled_activity_frees_its_slot():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1, target_latency=10, window=100)
+        activity = FakeActivity(result="done")
+        interceptor = limited(limiter, activity)
+        running = asyncio.create_task(execute(interceptor))
+        waiting = asyncio.create_task(execute(interceptor))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        await asyncio.sleep(0.01)
+        assert activity.running == 2 # the waiting activity got the slot
+        activity.gate.set()
+        assert await waiting == "done" and limiter.in_flight == 0
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from account_store import InMemoryAccountStore, SQLiteAccountStore
+from ledger import DepositCoalescer
+
+def test_invalid_deposit_is_refused_without_failing_its_batch(tmp_path):
+    async def run():
+        store = SQLiteAccountStore(path=str(tmp_path / "accounts.db"), balances={"acc": Decimal("0")})
+        coalescer = DepositCoalescer(store, window_ms=20)
+        valid = asyncio.ensure_future(coalescer.deposit("acc", Decimal("1.00")))
+        with pytest.raises(ValueError):
+            await coalescer.deposit("acc", Decimal("0.005"))
+        other = asyncio.ensure_future(coalescer.deposit("acc", Decimal("2.00")))
+        results = await asyncio.gather(valid, other)
+        balance = await coalescer.get_balance("acc")
+        await coalescer.close()
+        return results, balance
+    results, balance = asyncio.run(run())
+    assert [r.balance for r in results] == [Decimal("1.00"), Decimal("3.00")]
+    assert balance == Decimal("3.00")
+
+def test_deposit_cancelled_before_the_write_is_left_out():
+    async def run():
+        store = InMemoryAccountStore(balances={"acc": Decimal("0")}, latency_ms=0)
+        coalescer = DepositCoalescer(store, window_ms=20, max_items=3)
+        kept = asyncio.ensure_future(coalescer.deposit("acc", Decimal("1")))
+        cancelled = asyncio.ensure_future(coalescer.deposit("acc", Decimal("5")))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        # Fills the batch and starts its flush before the cancellation reaches the caller
+        last = await coalescer.deposit("acc", Decimal("2"))
+        await kept
+        await coalescer.close()
+        return last, cancelled.cancelled(), await store.get_balance("acc")
+    update, was_cancelled, balance = asyncio.run(run())
+    assert was_cancelled
+    assert update.balance == Decimal("3") and balance == Decimal("3")
+
+def test_deposit_cancelled_during_the_write_reports_it():
+    async def run():
+        # The write takes 50ms; the caller is cancelled in the middle of it
+        store = InMemoryAccountStore(balances={"acc": Decimal("0")}, latency_ms=50)
+        coalescer = DepositCoalescer(store, window_ms=1)
+        deposit = asyncio.ensure_future(coalescer.deposit("acc", Decimal("5")))
+        await asyncio.sleep(0.02)
+        deposit.cancel()
+        update = await deposit
+        await coalescer.close()
+        return update, await store.get_balance("acc")
+    update, balance = asyncio.run(run())
+    assert update.success and update.balance == Decimal("5")
+    assert balance == Decimal("5")
@@ -0,0 +1,20 @@
+import threading
+
+from metrics import Counter, Histogram
+
+def run_threads(target, threads: int = 8) -> None:
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def test_counter_is_exact_across_threads():
+    counter = Counter("test_total", "test", ("kind",))
+    run_threads(lambda: [counter.inc(kind="workflow") for _ in range(10000)])
+    assert counter.value(kind="workflow") == 80000
+
+def test_histogram_counts_every_observation_across_threads():
+    histogram = Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+    run_threads(lambda: [histogram.observe(0.5) for _ in range(10000)])
+    assert "test_seconds_count 80000" in histogram.render()
@@ -0,0 +1,43 @@
+import asyncio
+import dataclasses
+
+import models
+from models import AccountOperation, AccountOperationResult, AccountState, SenderOutcomes
+from payload_codec import CURRENT_VERSION, KEY_TABLES, CompactPayloadCodec, data_converter_from_env
+
+def test_latest_table_extends_the_previous_one():
+    for version in KEY_TABLES:
+        if version > 1:
+            previous = KEY_TABLES[version - 1]
+            assert KEY_TABLES[version][:len(previous)] == previous
+
+def test_latest_table_covers_every_model_field():
+    fields = {field.name for model in vars(models).values()
+              if isinstance(model, type) and dataclasses.is_dataclass(model) for field in dataclasses.fields(model)}
+    assert fields <= set(KEY_TABLES[CURRENT_VERSION])
+
+def test_account_state_round_trips():
+    state = AccountState(account_id="acc_001", balance="10.00", pending=[
+        AccountOperation(operation_id="run-debit", account_id="acc_001", kind="debit", amount="1.00",
+                         sender_run_id="run", reply_workflow_id="transfer"),
+    ], outcomes=[SenderOutcomes(sender_run_id="run", first_applied_at=1.5, results=[
+        AccountOperationResult(operation_id="run-debit", success=True, balance_after="9.00"),
+    ])])
+    converter = data_converter_from_env(encode=True)
+    payloads = asyncio.run(converter.encode([state]))
+    assert payloads[0].data[0] == CURRENT_VERSION
+    # Only interned keys: no field name is left in the body
+    assert b"operation_id" not in payloads[0].data and b"sender_run_id" not in payloads[0].data
+    assert asyncio.run(converter.decode(payloads, [AccountState])) == [state]
+
+def test_version_1_payloads_still_decode():
+    operation = AccountOperation(operation_id="run-credit", account_id="acc_002", kind="credit", amount="3.00")
+    written = dataclasses.replace(data_converter_from_env(encode=True), payload_codec=CompactPayloadCodec(version=1))
+    payloads = asyncio.run(written.encode([operation]))
+    assert payloads[0].data[0] == 1
+    assert asyncio.run(data_converter_from_env(encode=False).decode(payloads, [AccountOperation])) == [operation]
+
+def test_payload_codec_version_pins_the_written_version(monkeypatch):
+    monkeypatch.setenv("PAYLOAD_CODEC_VERSION", "1")
+    payloads = asyncio.run(data_converter_from_env(encode=True).encode([{"amount": "1.00"}]))
+    assert payloads[0].data[0] == 1
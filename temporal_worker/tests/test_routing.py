@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+
+import pytest
+from temporalio.api.common.v1 import Payload
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import ActivityEnvironment
+from temporalio.worker._interceptor import ActivityInboundInterceptor, ExecuteActivityInput
+
+from platform_sdk import (
+    ROUTING_TARGET_HEADER, SNAPSHOT_REFRESH_INTERVAL, WORKFLOW_ACTIVATION_LOGGER, RoutesAPIClient, RoutingDecisionCache,
+    SelectiveTaskInterceptor, SkipExecutionError, _BaggageWorkflowOutboundInterceptor,
+    _SkippedTaskLogFilter, sandbox_task_queue,
+)
+
+def routes_client(sandbox_name: str, routing_keys) -> RoutesAPIClient:
+    client = RoutesAPIClient(sandbox_name=sandbox_name, route_server_addr="http://routes.invalid")
+    client.apply_snapshot(set(routing_keys))
+    return client
+
+def baggage(routing_key: str) -> dict:
+    return {"baggage": Payload(data=f"sd-routing-key={routing_key}".encode())}
+
+def decide(interceptor: SelectiveTaskInterceptor, run_id: str, headers: dict) -> bool:
+    return asyncio.run(interceptor.decide(run_id, headers))
+
+def test_cache_evicts_least_recently_used():
+    cache = RoutingDecisionCache(max_size=2)
+    cache.put("a", True)
+    cache.put("b", True)
+    assert cache.get("a") is True # "a" is now the most recently used
+    cache.put("c", True)
+    assert cache.get("b") is None
+    assert cache.get("a") is True and cache.get("c") is True
+    assert len(cache) == 2
+
+def test_cache_miss_returns_none():
+    assert RoutingDecisionCache().get("unknown") is None
+
+def test_baseline_processes_unrouted_and_skips_routed_keys():
+    interceptor = SelectiveTaskInterceptor(routes_client("", {"key-a"}))
+    assert decide(interceptor, "run-1", {}) is True
+    assert decide(interceptor, "run-2", baggage("key-b")) is True
+    assert decide(interceptor, "run-3", baggage("key-a")) is False
+
+def test_sandbox_processes_only_its_routed_keys():
+    interceptor = SelectiveTaskInterceptor(routes_client("sandbox-a", {"key-a"}))
+    assert decide(interceptor, "run-1", baggage("key-a")) is True
+    assert decide(interceptor, "run-2", baggage("key-b")) is False
+    assert decide(interceptor, "run-3", {}) is False
+
+def test_positive_decision_is_cached_for_the_run():
+    client = routes_client("sandbox-a", {"key-a"})
+    interceptor = SelectiveTaskInterceptor(client)
+    assert decide(interceptor, "run-1", baggage("key-a")) is True
+    client.apply_snapshot(set()) # the rule is removed mid-run
+    assert decide(interceptor, "run-1", baggage("key-a")) is True
+
+def test_skip_is_not_cached_so_a_later_rule_applies():
+    client = routes_client("sandbox-a", set())
+    interceptor = SelectiveTaskInterceptor(client)
+    assert decide(interceptor, "run-1", baggage("key-a")) is False
+    client.apply_snapshot({"key-a"})
+    assert decide(interceptor, "run-1", baggage("key-a")) is True
+
+def test_without_enforcement_everything_is_processed():
+    interceptor = SelectiveTaskInterceptor(routes_client("sandbox-a", set()), enforce=False)
+    assert decide(interceptor, "run-1", baggage("key-b")) is True
+    assert len(interceptor.decision_cache) == 0
+
+class RecordingActivityInbound(ActivityInboundInterceptor):
+    def __init__(self):
+        super().__init__(None)
+        self.executed = 0
+
+    async def execute_activity(self, input: ExecuteActivityInput):
+        self.executed += 1
+        return "done"
+
+def run_activity(interceptor: SelectiveTaskInterceptor, headers: dict) -> RecordingActivityInbound:
+    inner = RecordingActivityInbound()
+    guarded = interceptor.intercept_activity(inner)
+    input = ExecuteActivityInput(fn=lambda: None, args=[], executor=None, headers=headers)
+    asyncio.run(ActivityEnvironment().run(guarded.execute_activity, input))
+    return inner
+
+def test_baseline_workflow_activity_never_runs_on_a_sandbox_worker():
+    # The baseline schedules on the shared queue, which a sandbox's activity worker doesn't poll
+    outbound = _BaggageWorkflowOutboundInterceptor(None, activity_task_queue=None, routing_target="")
+    headers = outbound._with_routing_target(baggage("key-b"))
+    assert sandbox_task_queue("money-transfer", "sandbox-a") != "money-transfer"
+    # Should it arrive anyway, the sandbox rejects it before it runs, and for good
+    sandbox = SelectiveTaskInterceptor(routes_client("sandbox-a", {"key-a"}))
+    for activity_headers in (headers, baggage("key-b"), {}):
+        with pytest.raises(ApplicationError) as raised:
+            run_activity(sandbox, activity_headers)
+        assert raised.value.non_retryable and raised.value.type == "MisroutedActivity"
+    assert run_activity(sandbox, {**baggage("key-a"), ROUTING_TARGET_HEADER: Payload(data=b"sandbox-a")}).executed == 1
+
+def test_activity_follows_its_workflow_decision_not_a_later_rule():
+    # The baseline ran the workflow before key-a was routed; its activity still runs there
+    baseline = SelectiveTaskInterceptor(routes_client("", {"key-a"}))
+    headers = {**baggage("key-a"), ROUTING_TARGET_HEADER: Payload(data=b"")}
+    assert run_activity(baseline, headers).executed == 1
+
+def test_unchanged_snapshot_is_refreshed(tmp_path, monkeypatch):
+    path = tmp_path / "routing-snapshot.json"
+    monkeypatch.setenv("ROUTES_API_SNAPSHOT_PATH", str(path))
+    client = routes_client("", {"key-a"})
+    client._notify_listeners()
+    first = json.loads(path.read_text())["saved_at"]
+    client._persisted_at -= SNAPSHOT_REFRESH_INTERVAL
+    client._notify_listeners()
+    assert json.loads(path.read_text())["saved_at"] > first
+
+def test_skipped_task_warning_is_filtered():
+    def record(error: Exception) -> logging.LogRecord:
+        return logging.LogRecord(WORKFLOW_ACTIVATION_LOGGER, logging.WARNING, "", 0, "Failed activation", (),
+                                 (type(error), error, None))
+    log_filter = _SkippedTaskLogFilter()
+    assert not log_filter.filter(record(SkipExecutionError("not for this sandbox")))
+    assert log_filter.filter(record(RuntimeError("real failure")))
+
+def test_watch_stream_ending_early_backs_off(monkeypatch):
+    client = routes_client("", {"key-a"})
+    delays = []
+
+    async def ends_at_once() -> bool:
+        if len(delays) == 3:
+            raise asyncio.CancelledError
+        return True
+
+    async def no_op() -> None:
+        pass
+
+    async def record_sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr(client, "_watch_routes", ends_at_once)
+    monkeypatch.setattr(client, "_ensure_cache_fresh", no_op)
+    monkeypatch.setattr(asyncio, "sleep", record_sleep)
+    try:
+        asyncio.run(client._watch_cache_updater())
+    except asyncio.CancelledError:
+        pass
+    assert len(delays) == 3 and all(delay > 0 for delay in delays)
+    assert client._watch_failures == 3
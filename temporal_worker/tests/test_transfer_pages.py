@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+from activities import _read_transfer_page, resolve_transfers_ref
+
+@pytest.fixture
+def batches_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("BATCH_TRANSFERS_DIR", str(tmp_path))
+    transfers = [{"from_account": "a", "to_account": "b", "amount": str(index), "reference": f"r{index}"}
+                 for index in range(5)]
+    (tmp_path / "batch.ndjson").write_text("".join(json.dumps(item) + "\n" for item in transfers))
+    return tmp_path
+
+def test_reads_requested_page(batches_dir):
+    page = _read_transfer_page("batch.ndjson", offset=2, limit=2)
+    assert [transfer.amount for transfer in page] == ["2", "3"]
+
+@pytest.mark.parametrize("transfers_ref", ["../outside.ndjson", "/etc/passwd", "nested/../../outside.ndjson"])
+def test_rejects_paths_outside_base_dir(batches_dir, transfers_ref):
+    with pytest.raises(ValueError):
+        resolve_transfers_ref(transfers_ref)
+
+def test_json_array_is_rejected(batches_dir):
+    (batches_dir / "array.json").write_text('[\n{"from_account": "a"}\n]\n')
+    with pytest.raises(ValueError):
+        _read_transfer_page("array.json", offset=0, limit=10)
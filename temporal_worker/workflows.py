@@ -1,12 +1,41 @@
+import asyncio
+import dataclasses
 from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
 from temporalio import workflow
 from temporalio.common import RetryPolicy
-from models import PaymentDetails, WithdrawRequest, DepositRequest
-from activities import BankingActivities
+from temporalio.exceptions import ApplicationError
+from models import (
+    PaymentDetails, WithdrawRequest, DepositRequest,
+    BatchTransferRequest, BatchTransferSummary, TransferPageRequest,
+    WithdrawResponse, DepositResponse, AccountOperation, AccountOperationResult, AccountState, SenderOutcomes,
+)
+from activities import AccountActorActivities, BankingActivities, load_transfer_page
+
+# Shared by every activity mode, so a transfer behaves the same either way
+STEP_TIMEOUT = timedelta(seconds=30)
+STEP_RETRY_POLICY = RetryPolicy(
+    maximum_attempts=3,
+    backoff_coefficient=2.0,
+    maximum_interval=timedelta(seconds=10)
+)
+# How long an AccountWorkflow keeps a sender's outcomes that were never acknowledged
+ACCOUNT_OUTCOME_RETENTION = timedelta(days=7)
 
 @workflow.defn
 class MoneyTransferWorkflow:
     """Baseline money transfer workflow - 2 step process"""
+
+    # Run withdraw/deposit as local activities; see LocalActivityMoneyTransferWorkflow
+    use_local_activities = False
+
+    async def _execute_step(self, step, request):
+        if self.use_local_activities:
+            return await workflow.execute_local_activity(
+                step, request, start_to_close_timeout=STEP_TIMEOUT, retry_policy=STEP_RETRY_POLICY)
+        return await workflow.execute_activity(
+            step, request, start_to_close_timeout=STEP_TIMEOUT, retry_policy=STEP_RETRY_POLICY)
     
     @workflow.run
     async def run(self, payment_details: PaymentDetails) -> str:
@@ -23,16 +52,7 @@ class MoneyTransferWorkflow:
                 reference=payment_details.reference
             )
             
-            withdraw_result = await workflow.execute_activity(
-                BankingActivities.withdraw,
-                withdraw_request,
-                start_to_close_timeout=timedelta(seconds=30),
-                retry_policy=RetryPolicy(
-                    maximum_attempts=3,
-                    backoff_coefficient=2.0,
-                    maximum_interval=timedelta(seconds=10)
-                )
-            )
+            withdraw_result = await self._execute_step(BankingActivities.withdraw, withdraw_request)
             
             if not withdraw_result.success:
                 workflow.logger.error(f"Withdrawal failed: {withdraw_result.message}")
@@ -47,16 +67,7 @@ class MoneyTransferWorkflow:
                 reference=payment_details.reference
             )
             
-            deposit_result = await workflow.execute_activity(
-                BankingActivities.deposit,
-                deposit_request,
-                start_to_close_timeout=timedelta(seconds=30),
-                retry_policy=RetryPolicy(
-                    maximum_attempts=3,
-                    backoff_coefficient=2.0,
-                    maximum_interval=timedelta(seconds=10)
-                )
-            )
+            deposit_result = await self._execute_step(BankingActivities.deposit, deposit_request)
             
             if not deposit_result.success:
                 workflow.logger.error(f"Deposit failed: {deposit_result.message}")
@@ -71,4 +82,324 @@ class MoneyTransferWorkflow:
             
         except Exception as e:
             workflow.logger.error(f"Workflow failed with exception: {str(e)}")
-            return f"Transfer failed: {str(e)}"
\ No newline at end of file
+            return f"Transfer failed: {str(e)}"
+
+@workflow.defn(name="MoneyTransferWorkflow")
+class LocalActivityMoneyTransferWorkflow(MoneyTransferWorkflow):
+    """
+    MoneyTransferWorkflow that runs withdraw and deposit as local activities, in the
+    worker that runs the workflow task, skipping the schedule/poll/complete round
+    trip through the server for each step. Registered under the same workflow type,
+    selected per deployment with BANKING_ACTIVITY_MODE=local.
+
+    Histories differ between the modes, so every worker on a task queue must use the same one.
+    """
+
+    use_local_activities = True
+
+    @workflow.run
+    async def run(self, payment_details: PaymentDetails) -> str:
+        return await super().run(payment_details)
+
+@workflow.defn
+class AccountWorkflow:
+    """
+    One long-running workflow per account that owns its balance. Debits and
+    credits arrive as `apply` signals and are applied one at a time in arrival
+    order, so concurrent transfers on a busy account need no database lock.
+    Each outcome is signalled back to the sending workflow as `account_result`,
+    and the `balance` query answers from workflow state.
+
+    Outcomes are kept per sender run until the sender sends an "ack", so an
+    operation sent again is answered from its stored outcome, never applied
+    twice. A "cancel" answers with the target's outcome if it was applied, or
+    records it as cancelled so it never will be.
+
+    The balance is read from the account store once, when the account's first
+    workflow starts; after that the workflow's balance is authoritative. After
+    `operations_per_run` operations it continues as new with its balance, the
+    operations not yet handled and the unacknowledged outcomes.
+    """
+
+    def __init__(self) -> None:
+        self._pending: List[AccountOperation] = []
+        self._balance: Optional[Decimal] = None
+        self._outcomes: Dict[str, SenderOutcomes] = {}
+
+    @workflow.signal
+    def apply(self, operation: AccountOperation) -> None:
+        self._pending.append(operation)
+
+    @workflow.query
+    def balance(self) -> Optional[str]:
+        return None if self._balance is None else str(self._balance)
+
+    def _result(self, operation_id: str, success: bool, message: str, cancelled: bool = False) -> AccountOperationResult:
+        return AccountOperationResult(operation_id=operation_id, success=success,
+                                      balance_after=str(self._balance), message=message, cancelled=cancelled)
+
+    def _apply(self, operation: AccountOperation) -> AccountOperationResult:
+        amount = Decimal(operation.amount)
+        if operation.kind == "debit":
+            if self._balance < amount:
+                return self._result(operation.operation_id, False, "Insufficient funds")
+            self._balance -= amount
+            return self._result(operation.operation_id, True, "Withdrawal successful")
+        if operation.kind == "credit":
+            self._balance += amount
+            return self._result(operation.operation_id, True, "Deposit successful")
+        return self._result(operation.operation_id, False, f"Unknown operation '{operation.kind}'")
+
+    def _handle(self, operation: AccountOperation) -> Optional[AccountOperationResult]:
+        """Applies, answers or cancels one operation; returns the reply, if any"""
+        if operation.kind == "ack":
+            self._outcomes.pop(operation.sender_run_id, None)
+            return None
+        outcomes = self._outcomes.get(operation.sender_run_id)
+        if outcomes is None:
+            outcomes = self._outcomes[operation.sender_run_id] = SenderOutcomes(
+                sender_run_id=operation.sender_run_id, first_applied_at=workflow.now().timestamp())
+        known = {result.operation_id: result for result in outcomes.results}
+        if operation.operation_id in known:
+            return known[operation.operation_id]
+        if operation.kind == "cancel":
+            target = known.get(operation.target_operation_id)
+            if target is None:
+                # Recorded so the target is answered as cancelled if it arrives late
+                target = self._result(operation.target_operation_id, False, "Cancelled before it was applied", cancelled=True)
+                outcomes.results.append(target)
+            result = dataclasses.replace(target, operation_id=operation.operation_id)
+        else:
+            result = self._apply(operation)
+        outcomes.results.append(result)
+        return result
+
+    async def _reply(self, operation: AccountOperation, result: AccountOperationResult) -> None:
+        if not operation.reply_workflow_id:
+            return
+        try:
+            await workflow.get_external_workflow_handle(operation.reply_workflow_id).signal("account_result", result)
+        except Exception as e:
+            # The sender has finished; the operation stays applied
+            workflow.logger.warning(f"Could not reply to {operation.reply_workflow_id}: {e}")
+
+    @workflow.run
+    async def run(self, state: AccountState) -> None:
+        # Operations carried over from the previous run go before any signalled to this one
+        self._pending[:0] = state.pending
+        for outcomes in state.outcomes:
+            self._outcomes[outcomes.sender_run_id] = outcomes
+        if state.balance is None:
+            state.balance = await workflow.execute_local_activity(
+                BankingActivities.load_balance, state.account_id,
+                start_to_close_timeout=STEP_TIMEOUT, retry_policy=STEP_RETRY_POLICY)
+        self._balance = Decimal(state.balance)
+
+        # Replies go out concurrently; only the order of balance changes matters
+        replies: List[asyncio.Task] = []
+        handled = 0
+        while handled < state.operations_per_run:
+            await workflow.wait_condition(lambda: bool(self._pending))
+            while self._pending and handled < state.operations_per_run:
+                operation = self._pending.pop(0)
+                result = self._handle(operation)
+                handled += 1
+                if result is not None:
+                    replies.append(asyncio.create_task(self._reply(operation, result)))
+            replies = [reply for reply in replies if not reply.done()]
+
+        await asyncio.gather(*replies)
+        # Senders that never acknowledged, e.g. ones that were terminated
+        expired_before = (workflow.now() - ACCOUNT_OUTCOME_RETENTION).timestamp()
+        workflow.continue_as_new(AccountState(
+            account_id=state.account_id,
+            balance=str(self._balance),
+            pending=self._pending,
+            outcomes=[outcomes for outcomes in self._outcomes.values() if outcomes.first_applied_at >= expired_before],
+            operations_per_run=state.operations_per_run,
+        ))
+
+@workflow.defn(name="MoneyTransferWorkflow")
+class AccountActorMoneyTransferWorkflow(MoneyTransferWorkflow):
+    """
+    MoneyTransferWorkflow that debits and credits through AccountWorkflows instead
+    of the withdraw and deposit activities, selected with BANKING_ACTIVITY_MODE=actor.
+    Each step sends the operation with a local activity and waits for the account's
+    reply; an operation that gets no reply is sent again under the same ID, so it
+    is applied at most once. After the last resend the step cancels the operation,
+    and a cancelled credit refunds the debit. When the transfer ends it acknowledges
+    each account it used, so the accounts can drop its outcomes.
+
+    Histories differ between the modes, so every worker on a task queue must use the same one.
+    """
+
+    def __init__(self) -> None:
+        self._account_results: Dict[str, AccountOperationResult] = {}
+        self._accounts: List[str] = []
+        self._debit: Optional[AccountOperation] = None
+
+    @workflow.signal
+    def account_result(self, result: AccountOperationResult) -> None:
+        self._account_results[result.operation_id] = result
+
+    def _operation(self, name: str, kind: str, account_id: str, amount: str = "0",
+                   reference: str = "", target_operation_id: str = "") -> AccountOperation:
+        info = workflow.info()
+        return AccountOperation(
+            operation_id=f"{info.run_id}-{name}",
+            account_id=account_id,
+            kind=kind,
+            amount=amount,
+            reference=reference,
+            sender_run_id=info.run_id,
+            reply_workflow_id=info.workflow_id,
+            target_operation_id=target_operation_id,
+        )
+
+    async def _send(self, operation: AccountOperation) -> None:
+        if operation.account_id not in self._accounts:
+            self._accounts.append(operation.account_id)
+        await workflow.execute_local_activity(
+            AccountActorActivities.send_account_operation, operation,
+            start_to_close_timeout=STEP_TIMEOUT, retry_policy=STEP_RETRY_POLICY)
+
+    async def _request(self, operation: AccountOperation, attempts: Optional[int]) -> AccountOperationResult:
+        """Sends the operation until it's answered, at most `attempts` times (no limit when None)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._send(operation)
+            try:
+                await workflow.wait_condition(lambda: operation.operation_id in self._account_results, timeout=STEP_TIMEOUT)
+                return self._account_results.pop(operation.operation_id)
+            except asyncio.TimeoutError:
+                if attempts is not None and attempt >= attempts:
+                    raise
+
+    async def _execute_step(self, step, request):
+        kind = "debit" if isinstance(request, WithdrawRequest) else "credit"
+        operation = self._operation(kind, kind, request.account_id, request.amount, request.reference)
+        try:
+            result = await self._request(operation, STEP_RETRY_POLICY.maximum_attempts)
+        except asyncio.TimeoutError:
+            # Either stops a late delivery from being applied or returns the outcome it had
+            cancel = self._operation(f"{kind}-cancel", "cancel", request.account_id,
+                                     target_operation_id=operation.operation_id)
+            result = await self._request(cancel, None)
+            if result.cancelled:
+                message = f"No reply from account {request.account_id}; {kind} cancelled"
+                if kind == "credit" and self._debit is not None:
+                    await self._request(self._operation(
+                        "refund", "credit", self._debit.account_id, self._debit.amount, self._debit.reference), None)
+                    message += ", withdrawal refunded"
+                raise ApplicationError(message, non_retryable=True)
+        if kind == "debit" and result.success:
+            self._debit = operation
+        response_type = WithdrawResponse if kind == "debit" else DepositResponse
+        return response_type(
+            transaction_id=operation.operation_id if result.success else "",
+            account_id=request.account_id,
+            amount=request.amount,
+            balance_after=result.balance_after,
+            success=result.success,
+            message=result.message,
+        )
+
+    @workflow.run
+    async def run(self, payment_details: PaymentDetails) -> str:
+        try:
+            return await super().run(payment_details)
+        finally:
+            for account_id in self._accounts:
+                try:
+                    await self._send(self._operation("ack", "ack", account_id))
+                except Exception as e:
+                    # The account drops the outcomes after ACCOUNT_OUTCOME_RETENTION instead
+                    workflow.logger.warning(f"Could not acknowledge account {account_id}: {e}")
+
+# A missing or malformed transfers file fails the batch instead of being retried
+BATCH_PAGE_RETRY_POLICY = RetryPolicy(
+    maximum_attempts=5,
+    backoff_coefficient=2.0,
+    maximum_interval=timedelta(seconds=30),
+    non_retryable_error_types=["FileNotFoundError", "ValueError", "TypeError"],
+)
+# Failure messages kept in a batch summary
+MAX_FAILURE_SAMPLES = 20
+
+@workflow.defn
+class BatchTransferWorkflow:
+    """
+    Runs many transfers as child MoneyTransferWorkflows, at most `max_parallel` at
+    a time. A `transfers_ref` batch handles `transfers_per_run` transfers per run and
+    continues as new with only its offset, so no single history or input grows past
+    Temporal's limits. Inline transfers are limited to one run's worth.
+
+    Children inherit the batch's routing baggage, so a batch started with a
+    sandbox routing key is processed entirely by that sandbox.
+    """
+
+    @workflow.run
+    async def run(self, request: BatchTransferRequest) -> BatchTransferSummary:
+        per_run = max(1, request.transfers_per_run)
+        run_started = workflow.now()
+        if request.transfers_ref:
+            page = await workflow.execute_activity(
+                load_transfer_page,
+                TransferPageRequest(transfers_ref=request.transfers_ref, offset=request.offset, limit=per_run),
+                start_to_close_timeout=timedelta(seconds=60),
+                retry_policy=BATCH_PAGE_RETRY_POLICY,
+            )
+        elif len(request.transfers) > per_run:
+            raise ApplicationError(f"Inline batches are limited to {per_run} transfers; use transfers_ref",
+                                   non_retryable=True)
+        else:
+            page = request.transfers
+
+        workflow.logger.info(f"Batch transfers {request.summary.total}-{request.summary.total + len(page)}, parallelism {request.max_parallel}")
+
+        slots = asyncio.Semaphore(max(1, request.max_parallel))
+        batch_id = workflow.info().workflow_id
+        first_index = request.summary.total
+
+        async def transfer(index: int, payment: PaymentDetails) -> str:
+            async with slots:
+                try:
+                    return await workflow.execute_child_workflow(
+                        MoneyTransferWorkflow.run,
+                        payment,
+                        id=f"{batch_id}-{index}",
+                    )
+                except Exception as e:
+                    return f"Transfer failed: {e}"
+
+        results: List[str] = await asyncio.gather(
+            *(transfer(first_index + offset, payment) for offset, payment in enumerate(page))
+        )
+
+        summary = request.summary
+        for result in results:
+            summary.total += 1
+            if result.startswith("Transfer complete"):
+                summary.completed += 1
+            else:
+                summary.failed += 1
+                if len(summary.failure_samples) < MAX_FAILURE_SAMPLES:
+                    summary.failure_samples.append(result)
+
+        if request.transfers_ref and len(page) == per_run:
+            # Only the first run is charged by the client's admission; the rest keep to its rate
+            remaining = request.min_run_seconds - (workflow.now() - run_started).total_seconds()
+            if remaining > 0:
+                await asyncio.sleep(remaining) # a durable timer inside a workflow
+            workflow.continue_as_new(BatchTransferRequest(
+                transfers_ref=request.transfers_ref,
+                max_parallel=request.max_parallel,
+                transfers_per_run=request.transfers_per_run,
+                offset=request.offset + len(page),
+                min_run_seconds=request.min_run_seconds,
+                summary=summary,
+            ))
+
+        workflow.logger.info(f"Batch complete: {summary.completed}/{summary.total} transfers succeeded")
+        return summary